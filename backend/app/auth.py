@@ -3,7 +3,8 @@ from firebase_admin import credentials, auth as firebase_auth
 from fastapi import Depends, HTTPException, Request, status
 import os
 import json
-from .config import FIREBASE_CREDENTIALS_JSON, FIRESTORE_PROJECT
+from .config import FIREBASE_CREDENTIALS_JSON, FIRESTORE_PROJECT, STORAGE_BACKEND
+from .metrics import span
 
 # Initialize Firebase Admin SDK (only once)
 def initialize_firebase():
@@ -23,6 +24,13 @@ def initialize_firebase():
                 print(f"[INFO] Firebase initialized with credentials: {FIREBASE_CREDENTIALS_JSON}")
                 if FIRESTORE_PROJECT:
                     print(f"[INFO] Using Firestore project: {FIRESTORE_PROJECT}")
+            elif os.getenv("FIRESTORE_EMULATOR_HOST"):
+                # Local emulator (benchmarks/tests): no credentials needed
+                firebase_admin.initialize_app(options={"projectId": FIRESTORE_PROJECT or "demo-pace"})
+                print(f"[INFO] Firebase initialized for Firestore emulator at {os.getenv('FIRESTORE_EMULATOR_HOST')}")
+            elif STORAGE_BACKEND != "firestore":
+                # Storage does not use Firestore; only ID-token verification needs Firebase (rejected with 401)
+                print(f"[WARN] Firebase credentials not found; STORAGE_BACKEND={STORAGE_BACKEND}, so Firebase is not initialized and ID tokens cannot be verified")
             else:
                 raise FileNotFoundError(f"Firebase credentials not found in FIREBASE_SERVICE_ACCOUNT env or at: {FIREBASE_CREDENTIALS_JSON}")
         except Exception as e:
@@ -53,7 +61,8 @@ async def verify_firebase_token(request: Request):
     
     id_token = parts[1]
     try:
-        decoded = firebase_auth.verify_id_token(id_token)
+        with span("auth", "verify_id_token"):
+            decoded = firebase_auth.verify_id_token(id_token)
         # decoded contains 'uid', 'email', 'email_verified', 'exp', 'iat' etc.
         return decoded
     except Exception as e:
@@ -0,0 +1,37 @@
+# app/background.py
+"""
+Fire-and-forget background work for route handlers.
+
+spawn() runs a coroutine as a detached task in a fresh context, so it is not
+counted against the request that started it (latency, Firestore budgets) and
+does not delay the response. Tasks are strongly referenced until they finish,
+exceptions are logged, and drain() lets shutdown wait for in-flight work.
+"""
+import asyncio
+import contextvars
+from typing import Coroutine, Set
+
+_tasks: Set[asyncio.Task] = set()
+
+
+def _done(task: asyncio.Task):
+    _tasks.discard(task)
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        print(f"[WARN] Background task {task.get_name()} failed: {exc}")
+
+
+def spawn(coro: Coroutine, name: str | None = None) -> asyncio.Task:
+    task = asyncio.get_running_loop().create_task(coro, name=name, context=contextvars.Context())
+    _tasks.add(task)
+    task.add_done_callback(_done)
+    return task
+
+
+async def drain(timeout: float = 10.0):
+    """Wait (bounded) for outstanding background tasks, e.g. from a shutdown hook."""
+    pending = [t for t in _tasks if not t.done()]
+    if pending:
+        await asyncio.wait(pending, timeout=timeout)
@@ -0,0 +1,229 @@
+# app/calibration.py
+"""
+Offline Rasch calibration of banked question difficulty and learner ability.
+
+Online, proficiency is a per-session EMA and difficulty a fixed ±1 step; this job
+learns both from the responses collection instead. It streams every response that
+graded a banked question (responses carry bankId, uid, domain, topic and the score)
+into flat NumPy arrays and fits a fractional-response Rasch model
+
+    E[score] = sigmoid(theta[learner] - b[item])
+
+with learner = (uid, domain) and item = banked question, by joint maximum
+likelihood with a N(0, CALIBRATION_PRIOR_SD^2) prior on every parameter (keeps
+learners/items with all-perfect or all-zero scores finite). Each iteration is one
+diagonal Newton step for all abilities, then for all difficulties, computed with
+np.bincount over the response arrays, so a pass is O(responses) vectorized work and
+millions of responses fit in seconds; streaming the collection dominates the run.
+
+Write-back, for items/learners with at least CALIBRATION_MIN_RESPONSES responses:
+- question_bank/{id}: irt {b, se, n} and difficulty = 3 + round(b / CALIBRATION_LOGIT_STEP)
+  clipped to 1..5, with bank_key moved to that level so /next-question serves it there
+  (add_bank_questions keeps them there when seed() or bank() re-bank the question);
+- skill_state/{uid}_{domain}: proficiency = sigmoid(theta) (the expected score on an
+  average question), plus ability, se and n.
+
+    python -m app.calibration [--dry-run] [--page-size 1000]
+"""
+import argparse
+import os
+import time
+from array import array
+from typing import Dict, List, Tuple
+
+import numpy as np
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from .question_bank import bank_key
+
+CALIBRATION_MIN_RESPONSES = int(os.getenv("CALIBRATION_MIN_RESPONSES", "20"))
+CALIBRATION_PRIOR_SD = float(os.getenv("CALIBRATION_PRIOR_SD", "2.0"))
+CALIBRATION_LOGIT_STEP = float(os.getenv("CALIBRATION_LOGIT_STEP", "1.0"))
+_MAX_ITER = 100
+_TOLERANCE = 1e-4
+
+
+class ResponseArrays:
+    """Responses as parallel arrays of learner index, item index and score (0..1)."""
+
+    def __init__(self):
+        self.learners: Dict[Tuple[str, str], int] = {}
+        self.items: Dict[str, int] = {}
+        self.item_keys: Dict[str, Tuple[str, str]] = {}  # bank id -> (domain, topic)
+        self._learner = array("q")
+        self._item = array("q")
+        self._score = array("d")
+        self.skipped = 0
+
+    def add(self, response: dict):
+        bank_id, uid = response.get("bankId"), response.get("uid")
+        try:
+            score = float((response.get("evaluation") or {}).get("score"))
+        except (TypeError, ValueError):
+            score = None
+        if not bank_id or not uid or score is None:
+            self.skipped += 1
+            return
+        domain = response.get("domain") or "general"
+        learner = self.learners.setdefault((uid, domain), len(self.learners))
+        item = self.items.setdefault(bank_id, len(self.items))
+        self.item_keys.setdefault(bank_id, (domain, response.get("topic")))
+        self._learner.append(learner)
+        self._item.append(item)
+        self._score.append(min(1.0, max(0.0, score)))
+
+    def __len__(self) -> int:
+        return len(self._score)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return (
+            np.frombuffer(self._learner, dtype=np.int64),
+            np.frombuffer(self._item, dtype=np.int64),
+            np.frombuffer(self._score, dtype=np.float64),
+        )
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+def fit_rasch(learner: np.ndarray, item: np.ndarray, score: np.ndarray, n_learners: int, n_items: int,
+              prior_sd: float = CALIBRATION_PRIOR_SD, max_iter: int = _MAX_ITER, tol: float = _TOLERANCE) -> dict:
+    """
+    Fit E[score] = sigmoid(theta[learner] - b[item]) by penalized joint maximum likelihood.
+    Returns theta, b, their standard errors (from the final information), per-parameter
+    response counts, the number of iterations and whether it converged.
+    """
+    precision = 1.0 / (prior_sd * prior_sd)
+    theta = np.zeros(n_learners)
+    b = np.zeros(n_items)
+    converged = False
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        p = _sigmoid(theta[learner] - b[item])
+        resid = score - p
+        info = np.bincount(learner, weights=p * (1.0 - p), minlength=n_learners) + precision
+        step_theta = (np.bincount(learner, weights=resid, minlength=n_learners) - precision * theta) / info
+        theta += step_theta
+
+        p = _sigmoid(theta[learner] - b[item])
+        resid = score - p
+        info = np.bincount(item, weights=p * (1.0 - p), minlength=n_items) + precision
+        step_b = (-np.bincount(item, weights=resid, minlength=n_items) - precision * b) / info
+        b += step_b
+
+        change = max(np.abs(step_theta).max(initial=0.0), np.abs(step_b).max(initial=0.0))
+        if change < tol:
+            converged = True
+            break
+
+    w = _sigmoid(theta[learner] - b[item])
+    w = w * (1.0 - w)
+    return {
+        "theta": theta,
+        "b": b,
+        "theta_se": 1.0 / np.sqrt(np.bincount(learner, weights=w, minlength=n_learners) + precision),
+        "b_se": 1.0 / np.sqrt(np.bincount(item, weights=w, minlength=n_items) + precision),
+        "learner_n": np.bincount(learner, minlength=n_learners),
+        "item_n": np.bincount(item, minlength=n_items),
+        "iterations": iterations,
+        "converged": converged,
+    }
+
+
+def difficulty_level(b: np.ndarray) -> np.ndarray:
+    """Bank difficulty level (1..5) for item difficulties in logits."""
+    return np.clip(3 + np.rint(b / CALIBRATION_LOGIT_STEP), 1, 5).astype(int)
+
+
+def load_responses(page_size: int = 1000) -> ResponseArrays:
+    from .db import list_response_scores
+
+    data, last, pages = ResponseArrays(), None, 0
+    while True:
+        page = list_response_scores(start_after=last, limit=page_size)
+        if not page:
+            return data
+        for response in page:
+            data.add(response)
+        last = page[-1]["id"]
+        pages += 1
+        if pages % 100 == 0:
+            print(f"[INFO] Loaded {len(data)} responses")
+
+
+def calibration_documents(data: ResponseArrays, fit: dict) -> Tuple[List[Tuple[str, dict]], List[Tuple[str, str, dict]]]:
+    """(question_bank merge bodies, skill_state documents) for parameters with enough responses."""
+    levels = difficulty_level(fit["b"])
+    items = []
+    for bank_id, i in data.items.items():
+        if fit["item_n"][i] < CALIBRATION_MIN_RESPONSES:
+            continue
+        domain, topic = data.item_keys[bank_id]
+        items.append((bank_id, {
+            "difficulty": int(levels[i]),
+            "bank_key": bank_key(domain, topic, int(levels[i])),
+            "irt": {"b": float(fit["b"][i]), "se": float(fit["b_se"][i]), "n": int(fit["item_n"][i]), "calibratedAt": SERVER_TIMESTAMP},
+            "updatedAt": SERVER_TIMESTAMP,
+        }))
+    proficiency = _sigmoid(fit["theta"])
+    skills = []
+    for (uid, domain), j in data.learners.items():
+        if fit["learner_n"][j] < CALIBRATION_MIN_RESPONSES:
+            continue
+        skills.append(("skill_state", f"{uid}_{domain}", {
+            "userId": uid,
+            "skill": domain,
+            "proficiency": float(proficiency[j]),
+            "ability": float(fit["theta"][j]),
+            "se": float(fit["theta_se"][j]),
+            "n": int(fit["learner_n"][j]),
+            "source": "calibration",
+            "updatedAt": SERVER_TIMESTAMP,
+        }))
+    return items, skills
+
+
+def run(page_size: int = 1000, dry_run: bool = False) -> dict:
+    from .db import add_bank_questions, write_documents
+
+    start = time.perf_counter()
+    data = load_responses(page_size)
+    loaded = time.perf_counter()
+    print(f"[INFO] Loaded {len(data)} responses ({data.skipped} without a banked question or score), "
+          f"{len(data.learners)} learners, {len(data.items)} items in {loaded - start:.1f}s")
+    if not len(data):
+        return {"responses": 0}
+    fit = fit_rasch(*data.arrays(), len(data.learners), len(data.items))
+    fitted = time.perf_counter()
+    print(f"[INFO] Rasch fit: {fit['iterations']} iterations, converged={fit['converged']}, {fitted - loaded:.1f}s")
+    items, skills = calibration_documents(data, fit)
+    if not dry_run:
+        add_bank_questions(items)
+        write_documents(skills)
+    print(f"[INFO] {'Would write' if dry_run else 'Wrote'} {len(items)} question difficulties and "
+          f"{len(skills)} skill states in {time.perf_counter() - fitted:.1f}s")
+    return {
+        "responses": len(data),
+        "learners": len(data.learners),
+        "items": len(data.items),
+        "iterations": fit["iterations"],
+        "converged": fit["converged"],
+        "questions_written": len(items),
+        "skills_written": len(skills),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rasch calibration of question difficulty and learner proficiency")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="fit and report without writing")
+    args = parser.parse_args()
+    from .config import STORAGE_BACKEND
+    if STORAGE_BACKEND == "firestore":
+        from . import auth  # noqa: F401  (initializes Firebase)
+    run(args.page_size, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
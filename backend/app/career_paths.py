@@ -0,0 +1,93 @@
+# app/career_paths.py
+"""
+Precomputed career paths per counselling session.
+
+/counselling/save spawns precompute() so the Gemini call happens once, in the
+background, when the inputs change. The result is stored on the session
+document as career_paths = {careers, inputs_hash, model, generatedAt}.
+/career-paths serves it while inputs_hash still matches the session's
+counselling fields, waits for an in-flight precompute of the same inputs
+rather than starting a second one, and regenerates only on a mismatch or
+?refresh=true (which also bypasses the LLM response cache). If Gemini is
+unavailable, a stored result for older inputs is served with stale=true.
+"""
+import asyncio
+import hashlib
+import json
+from typing import Dict, Tuple
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from .background import spawn
+from .db_async import set_counselling_career_paths
+from .llm import DEFAULT_MODEL, LLMUnavailable
+from .llm import generate_career_paths as llm_generate_career_paths
+from .user_context import invalidate_user_context
+
+CAREER_INPUT_FIELDS = ("interests", "preferred_skills", "personality_traits", "chosen_domain", "difficulty_preference")
+
+# (uid, sessionId) -> (inputs_hash, task) for generations in flight in this worker
+_pending: Dict[Tuple[str, str], Tuple[str, asyncio.Task, bool]] = {}
+
+
+def career_inputs(context: dict | None) -> dict:
+    return {f: (context or {}).get(f) for f in CAREER_INPUT_FIELDS}
+
+
+def inputs_hash(inputs: dict) -> str:
+    material = json.dumps([DEFAULT_MODEL, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:32]
+
+
+def stored_career_paths(context: dict | None) -> dict | None:
+    """The stored result if it was generated from the session's current inputs."""
+    stored = (context or {}).get("career_paths") or {}
+    if stored.get("careers") and stored.get("inputs_hash") == inputs_hash(career_inputs(context)):
+        return {"careers": stored["careers"]}
+    return None
+
+
+async def _generate_and_store(uid: str, session_id: str | None, inputs: dict, digest: str, refresh: bool = False) -> dict:
+    data = await asyncio.to_thread(llm_generate_career_paths, **inputs, refresh=refresh)
+    if session_id and data.get("careers"):
+        await set_counselling_career_paths(uid, session_id, {
+            "careers": data["careers"],
+            "inputs_hash": digest,
+            "model": DEFAULT_MODEL,
+            "generatedAt": SERVER_TIMESTAMP,
+        })
+        invalidate_user_context(uid)
+    return data
+
+
+def precompute(uid: str, session_id: str | None, context: dict | None, refresh: bool = False) -> asyncio.Task:
+    """
+    Start (or join) generation for these inputs and return the task producing {"careers": [...]}.
+    refresh=True bypasses the LLM response cache, and only joins a pending generation that does too.
+    """
+    inputs = career_inputs(context)
+    digest = inputs_hash(inputs)
+    key = (uid, session_id or "")
+    pending = _pending.get(key)
+    if pending and pending[0] == digest and not pending[1].done() and (pending[2] or not refresh):
+        return pending[1]
+    task = spawn(_generate_and_store(uid, session_id, inputs, digest, refresh), name=f"career_paths:{uid}:{session_id}")
+    _pending[key] = (digest, task, refresh)
+    task.add_done_callback(lambda t: _pending.pop(key, None) if _pending.get(key, (None, None, False))[1] is t else None)
+    return task
+
+
+async def get_career_paths(uid: str, context: dict | None, refresh: bool = False) -> dict:
+    if not refresh:
+        stored = stored_career_paths(context)
+        if stored is not None:
+            return stored
+    task = precompute(uid, (context or {}).get("sessionId"), context, refresh=refresh)
+    try:
+        return await asyncio.shield(task)
+    except LLMUnavailable:
+        # Degraded: serve the last stored result even though it was built from older inputs
+        stale = ((context or {}).get("career_paths") or {}).get("careers")
+        if not stale:
+            raise
+        return {"careers": stale, "stale": True}
@@ -33,6 +33,10 @@ def _resolve_credentials() -> str:
 FIREBASE_CREDENTIALS_JSON = _resolve_credentials()
 FIRESTORE_PROJECT = os.getenv("FIRESTORE_PROJECT", "pace-36576")
 
+# Storage backend for app/db.py and app/db_async.py: firestore | sqlite (see app/storage.py)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").strip().lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", str(BASE_DIR / "data" / "pace.sqlite3"))
+
 # API Configuration
 PORT = int(os.getenv("PORT", "8000"))
 HOST = os.getenv("HOST", "0.0.0.0")
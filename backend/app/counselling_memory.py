@@ -0,0 +1,62 @@
+# app/counselling_memory.py
+"""
+Server-side memory for /counselling conversations.
+
+Turns are stored under users/{uid}/counselling_sessions/{conversationId} (see
+db.append_counselling_turns), so clients only send conversation_id instead of
+resending the whole history. The prompt gets the compacted summary plus the
+last COUNSELLING_VERBATIM_TURNS turns verbatim. Once more than
+COUNSELLING_COMPACT_AFTER turns are pending beyond that window, a background
+compaction folds the older ones into the summary, keeping prompt size bounded
+however long the conversation runs.
+"""
+import asyncio
+import os
+
+from .db import COUNSELLING_VERBATIM_TURNS, pending_counselling_turns
+from .db_async import get_counselling_session, update_counselling_summary
+from .llm import summarize_counselling as llm_summarize_counselling
+
+COUNSELLING_COMPACT_AFTER = int(os.getenv("COUNSELLING_COMPACT_AFTER", "4"))
+
+# (uid, conversation_id) pairs with a compaction in flight in this worker
+_compacting: set[tuple[str, str]] = set()
+
+
+def prompt_context(conversation: dict | None) -> tuple[str | None, list[dict]]:
+    """(summary, verbatim turns as {sender, content}) to pass to counselling_response."""
+    conv = conversation or {}
+    recent = pending_counselling_turns(conv)[-COUNSELLING_VERBATIM_TURNS:]
+    history = [{"sender": t.get("sender"), "content": t.get("content")} for t in recent]
+    return conv.get("summary") or None, history
+
+
+def needs_compaction(conversation: dict | None) -> bool:
+    return len(pending_counselling_turns(conversation)) > COUNSELLING_VERBATIM_TURNS + COUNSELLING_COMPACT_AFTER
+
+
+async def compact_conversation(user_id: str, conversation_id: str):
+    """Fold pending turns older than the verbatim window into the conversation summary."""
+    key = (user_id, conversation_id)
+    if key in _compacting:
+        return
+    _compacting.add(key)
+    try:
+        await _compact(user_id, conversation_id)
+    finally:
+        _compacting.discard(key)
+
+
+async def _compact(user_id: str, conversation_id: str):
+    doc = await get_counselling_session(user_id, conversation_id)
+    conv = (doc or {}).get("conversation") or {}
+    older = pending_counselling_turns(conv)[:-COUNSELLING_VERBATIM_TURNS]
+    if not older:
+        return
+    summary = await asyncio.to_thread(
+        llm_summarize_counselling,
+        previous_summary=conv.get("summary"),
+        turns=older,
+    )
+    if summary:
+        await update_counselling_summary(user_id, conversation_id, summary, older[-1]["idx"])
@@ -1,16 +1,23 @@
 # app/db.py
+import os
+import time
 import uuid
+from datetime import datetime
 from firebase_admin import firestore as admin_fs
 from google.cloud import firestore
+from google.api_core.exceptions import AlreadyExists
 from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+from .metrics import instrumented
+from .firestore_ops import track_client
 
-# Use Firebase Admin Firestore client (initialized via app/auth.py)
+# Use Firebase Admin Firestore client (initialized via app/auth.py).
+# Wrapped so every document read, write and query is counted against the current request.
 def _db():
-    return admin_fs.client()
+    return track_client(admin_fs.client())
 
 # Session helpers
-def create_session(session_id: str, user_id: str, domain: str, metadata: dict = None):
-    doc = {
+def _new_session_doc(session_id: str, user_id: str, domain: str, metadata: dict = None) -> dict:
+    return {
         "sessionId": session_id,
         "userId": user_id,
         "domain": domain,
@@ -27,30 +34,111 @@ def create_session(session_id: str, user_id: str, domain: str, metadata: dict =
         "updatedAt": SERVER_TIMESTAMP,
         "metadata": metadata or {}
     }
+
+@instrumented("firestore")
+def create_session(session_id: str, user_id: str, domain: str, metadata: dict = None):
+    doc = _new_session_doc(session_id, user_id, domain, metadata)
     _db().collection("sessions").document(session_id).set(doc)
     return doc
 
+@instrumented("firestore")
 def get_session(session_id: str):
     doc = _db().collection("sessions").document(session_id).get()
     return doc.to_dict() if doc.exists else None
 
+@instrumented("firestore")
 def update_session(session_id: str, updates: dict):
     updates["updatedAt"] = SERVER_TIMESTAMP
     _db().collection("sessions").document(session_id).update(updates)
 
 # Interactions (Q/A round)
-def store_interaction(session_id: str, interaction_id: str, payload: dict):
+# Each interaction write also merges a compact entry into sessions/{id}.recent_tail
+# (a map keyed by interaction id), so prompt builders get the latest turns from the
+# session document they already read instead of querying the interactions subcollection.
+RECENT_TAIL_SIZE = int(os.getenv("RECENT_TAIL_SIZE", "10"))
+_TAIL_TEXT_LIMIT = 1000
+
+def _tail_update(interaction_id: str, body: dict, new: bool, session: dict | None = None) -> dict:
+    """recent_tail merge for one interaction write. With the already-loaded `session`, the same
+    write also deletes the keys that have fallen out of its tail (see _stale_tail_keys)."""
+    entry = {}
+    if new:
+        created = body.get("createdAt")
+        entry["at"] = int((created.timestamp() if isinstance(created, datetime) else time.time()) * 1000)
+        entry["type"] = body.get("type") or "question"
+    question = body.get("question_text") or body.get("question")
+    if question:
+        entry["question_text"] = str(question)[:_TAIL_TEXT_LIMIT]
+    if body.get("answer_text"):
+        entry["answer_text"] = str(body["answer_text"])[:_TAIL_TEXT_LIMIT]
+    bank_id = (body.get("question_meta") or {}).get("bank_id")
+    if bank_id:
+        entry["bank_id"] = bank_id  # skip tracking for banked questions (app/question_bank.py)
+    ev = body.get("evaluator_result") or {}
+    if isinstance(ev, dict) and ("score" in ev or ev.get("feedback")):
+        entry["evaluator_result"] = {"score": ev.get("score"), "feedback": str(ev.get("feedback") or "")[:_TAIL_TEXT_LIMIT]}
+    tail = {k: firestore.DELETE_FIELD for k in _stale_tail_keys(session)}
+    tail[interaction_id] = entry
+    return {"recent_tail": tail}
+
+def recent_from_tail(session: dict | None, limit: int = RECENT_TAIL_SIZE) -> list[dict] | None:
+    """Last `limit` interactions (oldest first) from a session document's recent_tail, or None if it has none."""
+    tail = (session or {}).get("recent_tail") or {}
+    entries = [{**e, "id": iid} for iid, e in tail.items() if isinstance(e, dict) and e.get("at")]
+    if not entries:
+        return None
+    entries.sort(key=lambda e: e["at"])
+    return entries[-limit:] if limit else entries
+
+def _stale_tail_keys(session: dict | None) -> list[str]:
+    """Tail keys to drop once the map holds more than twice RECENT_TAIL_SIZE entries (pruned by
+    the next interaction write that is given the session, never by reads)."""
+    tail = (session or {}).get("recent_tail") or {}
+    if len(tail) <= RECENT_TAIL_SIZE * 2:
+        return []
+    ordered = sorted(tail.items(), key=lambda kv: (kv[1] or {}).get("at") or 0)
+    return [k for k, _ in ordered[:-RECENT_TAIL_SIZE]]
+
+def _write_interaction(session_id: str, interaction_id: str, body: dict, merge: bool = False, session: dict | None = None):
+    db = _db()
+    session_ref = db.collection("sessions").document(session_id)
+    batch = db.batch()
+    batch.set(session_ref.collection("interactions").document(interaction_id), body, merge=merge)
+    batch.set(session_ref, _tail_update(interaction_id, body, new=not merge, session=session), merge=True)
+    batch.commit()
+
+@instrumented("firestore")
+def create_interactions(session_id: str, interactions: list[tuple[str, dict]], documents: list[tuple[str, str, dict]] = (), session: dict | None = None):
+    """Create several interactions (full bodies, with type and createdAt) plus any other
+    (collection, doc_id, body) documents in one batch, with a single recent_tail merge."""
+    db = _db()
+    session_ref = db.collection("sessions").document(session_id)
+    batch = db.batch()
+    tail = {}
+    for interaction_id, body in interactions:
+        batch.set(session_ref.collection("interactions").document(interaction_id), body)
+        tail.update(_tail_update(interaction_id, body, new=True, session=session)["recent_tail"])
+    batch.set(session_ref, {"recent_tail": tail}, merge=True)
+    for collection, doc_id, body in documents:
+        batch.set(db.collection(collection).document(doc_id), body)
+    batch.commit()
+
+@instrumented("firestore")
+def store_interaction(session_id: str, interaction_id: str, payload: dict, session: dict | None = None):
     payload = {**payload, "createdAt": SERVER_TIMESTAMP}
-    _db().collection("sessions").document(session_id).collection("interactions").document(interaction_id).set(payload)
+    _write_interaction(session_id, interaction_id, payload, session=session)
 
+@instrumented("firestore")
 def get_interaction(session_id: str, interaction_id: str):
     doc = _db().collection("sessions").document(session_id).collection("interactions").document(interaction_id).get()
     return doc.to_dict() if doc.exists else None
 
+@instrumented("firestore")
 def update_interaction(session_id: str, interaction_id: str, updates: dict):
     updates["updatedAt"] = SERVER_TIMESTAMP
-    _db().collection("sessions").document(session_id).collection("interactions").document(interaction_id).set(updates, merge=True)
+    _write_interaction(session_id, interaction_id, updates, merge=True)
 
+@instrumented("firestore")
 def get_last_interaction(session_id: str):
     col = _db().collection("sessions").document(session_id).collection("interactions")
     docs = col.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(1).stream()
@@ -59,8 +147,7 @@ def get_last_interaction(session_id: str):
     return None
 
 # ----- Source logs (scraper audit) -----
-def create_source_log(payload: dict) -> str:
-    """Store a scraping/audit log in source_logs/{log:<uuid>} with basic truncation for raw_html."""
+def _source_log_body(payload: dict) -> dict:
     import uuid as _uuid
     log_id = payload.get("id") or f"log:{_uuid.uuid4()}"
     body = {
@@ -73,10 +160,18 @@ def create_source_log(payload: dict) -> str:
     if isinstance(raw_html, str) and len(raw_html) > 200000:
         body["raw_html"] = raw_html[:200000]
         body["raw_html_truncated"] = True
+    return body
+
+@instrumented("firestore")
+def create_source_log(payload: dict) -> str:
+    """Store a scraping/audit log in source_logs/{log:<uuid>} with basic truncation for raw_html."""
+    body = _source_log_body(payload)
+    log_id = body["id"]
     _db().collection("source_logs").document(log_id).set(body, merge=True)
     return log_id
 
 # ----- Session adaptive fields helpers -----
+@instrumented("firestore")
 def get_session_proficiency(session_id: str) -> float:
     s = get_session(session_id)
     if not s:
@@ -86,12 +181,14 @@ def get_session_proficiency(session_id: str) -> float:
     except Exception:
         return 0.5
 
+@instrumented("firestore")
 def set_session_proficiency(session_id: str, value: float):
     _db().collection("sessions").document(session_id).update({
         "proficiency": float(value),
         "updatedAt": SERVER_TIMESTAMP,
     })
 
+@instrumented("firestore")
 def get_session_difficulty(session_id: str) -> int:
     s = get_session(session_id)
     if not s:
@@ -101,12 +198,14 @@ def get_session_difficulty(session_id: str) -> int:
     except Exception:
         return 3
 
+@instrumented("firestore")
 def set_session_difficulty(session_id: str, level: int):
     _db().collection("sessions").document(session_id).update({
         "difficulty_level": int(level),
         "updatedAt": SERVER_TIMESTAMP,
     })
 
+@instrumented("firestore")
 def append_session_history(session_id: str, field: str, entry):
     # field is one of: scores, questions, answers, difficulty_progression
     path = f"history.{field}"
@@ -115,7 +214,40 @@ def append_session_history(session_id: str, field: str, entry):
         "updatedAt": SERVER_TIMESTAMP,
     })
 
+def _session_evaluation_updates(proficiency: float, difficulty: int, history: dict, many: bool = False) -> dict:
+    """Session update() for graded answers; history maps field -> entry (or -> list of entries if `many`)."""
+    updates = {
+        "proficiency": float(proficiency),
+        "difficulty_level": int(difficulty),
+        "updatedAt": SERVER_TIMESTAMP,
+    }
+    for field, entries in (history or {}).items():
+        updates[f"history.{field}"] = firestore.ArrayUnion(list(entries) if many else [entries])
+    return updates
+
+@instrumented("firestore")
+def record_session_evaluation(session_id: str, proficiency: float, difficulty: int, history: dict):
+    """Apply one graded answer in a single write: proficiency, difficulty and history entries keyed by field."""
+    _db().collection("sessions").document(session_id).update(_session_evaluation_updates(proficiency, difficulty, history))
+
+@instrumented("firestore")
+def record_session_evaluations(session_id: str, interactions: list[tuple[str, dict]], proficiency: float, difficulty: int, history: dict):
+    """Apply several graded answers in one batch: each (interaction_id, updates) merged into its
+    interaction (and recent_tail), then the final proficiency/difficulty and history entry lists."""
+    db = _db()
+    session_ref = db.collection("sessions").document(session_id)
+    batch = db.batch()
+    tail = {}
+    for interaction_id, updates in interactions:
+        updates = {**updates, "updatedAt": SERVER_TIMESTAMP}
+        batch.set(session_ref.collection("interactions").document(interaction_id), updates, merge=True)
+        tail.update(_tail_update(interaction_id, updates, new=False)["recent_tail"])
+    batch.set(session_ref, {"recent_tail": tail}, merge=True)
+    batch.update(session_ref, _session_evaluation_updates(proficiency, difficulty, history, many=True))
+    batch.commit()
+
 # Skill state
+@instrumented("firestore")
 def update_skill_state(user_id: str, skill: str, new_proficiency: float):
     key = f"{user_id}_{skill}"
     doc = {
@@ -128,6 +260,7 @@ def update_skill_state(user_id: str, skill: str, new_proficiency: float):
     return doc
 
 # User profile helpers (for users collection)
+@instrumented("firestore")
 def create_user_profile(user_id: str, profile_data: dict):
     """Create or update user profile in users/{uid}"""
     profile_data["updatedAt"] = SERVER_TIMESTAMP
@@ -137,12 +270,33 @@ def create_user_profile(user_id: str, profile_data: dict):
     _db().collection("users").document(user_id).set(profile_data, merge=True)
     return profile_data
 
+@instrumented("firestore")
 def get_user_profile(user_id: str):
     """Get user profile from users/{uid}"""
     doc = _db().collection("users").document(user_id).get()
     return doc.to_dict() if doc.exists else None
 
 # Additional helper functions
+@instrumented("firestore")
+def get_recent_interactions(session_id: str, limit: int = RECENT_TAIL_SIZE, session: dict | None = None) -> list[dict]:
+    """Latest `limit` interactions, oldest first. Served from the session's recent_tail (pass `session` if
+    already loaded); falls back to a newest-first query for sessions created before the tail existed."""
+    if session is None:
+        session = get_session(session_id)
+    recent = recent_from_tail(session, limit)
+    if recent is not None:
+        return recent
+    col = _db().collection("sessions").document(session_id).collection("interactions")
+    docs = col.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(limit).stream()
+    interactions = []
+    for doc in docs:
+        interaction_data = doc.to_dict()
+        interaction_data['id'] = doc.id
+        interactions.append(interaction_data)
+    interactions.reverse()
+    return interactions
+
+@instrumented("firestore")
 def get_session_interactions(session_id: str, limit: int = 50):
     """Get all interactions for a session, ordered by creation time"""
     col = _db().collection("sessions").document(session_id).collection("interactions")
@@ -154,6 +308,7 @@ def get_session_interactions(session_id: str, limit: int = 50):
         interactions.append(interaction_data)
     return interactions
 
+@instrumented("firestore")
 def get_user_sessions(user_id: str):
     """Get all sessions for a user"""
     sessions_ref = _db().collection("sessions").where("userId", "==", user_id)
@@ -165,6 +320,7 @@ def get_user_sessions(user_id: str):
         sessions.append(session_data)
     return sessions
 
+@instrumented("firestore")
 def get_skill_state(user_id: str, skill: str = None):
     """Get skill state for user. If skill is None, get all skills for user"""
     if skill:
@@ -183,36 +339,51 @@ def get_skill_state(user_id: str, skill: str = None):
         return skills
 
 # Responses collection for evaluations
+@instrumented("firestore")
 def store_response(response_id: str, payload: dict):
     payload = {**payload, "createdAt": SERVER_TIMESTAMP}
     _db().collection("responses").document(response_id).set(payload)
     return payload
 
 # Questions generated storage
+@instrumented("firestore")
 def store_generated_question(question_id: str, payload: dict):
     payload = {**payload, "createdAt": SERVER_TIMESTAMP}
     _db().collection("questions_generated").document(question_id).set(payload)
     return payload
 
-def create_question_interaction(session_id: str, interaction_id: str, question_payload: dict):
+# Batched writes of whole documents (write-behind flushes, see app/write_behind.py)
+_BATCH_LIMIT = 500
+
+@instrumented("firestore")
+def write_documents(docs: list[tuple[str, str, dict]]):
+    """set() each (collection, doc_id, body), committing in batches of up to 500 writes."""
+    db = _db()
+    for start in range(0, len(docs), _BATCH_LIMIT):
+        batch = db.batch()
+        for collection, doc_id, body in docs[start:start + _BATCH_LIMIT]:
+            batch.set(db.collection(collection).document(doc_id), body)
+        batch.commit()
+
+@instrumented("firestore")
+def get_generated_question(question_id: str) -> dict | None:
+    doc = _db().collection("questions_generated").document(question_id).get()
+    return doc.to_dict() if doc.exists else None
+
+@instrumented("firestore")
+def create_question_interaction(session_id: str, interaction_id: str, question_payload: dict, session: dict | None = None):
     # question_payload should include fields like: question_text, options/expected_answer, question_meta
     body = {
         **question_payload,
         "createdAt": SERVER_TIMESTAMP,
         "type": "question",
     }
-    _db().collection("sessions").document(session_id).collection("interactions").document(interaction_id).set(body)
+    _write_interaction(session_id, interaction_id, body, session=session)
     return body
 
 # ----- Opportunity Finder helpers -----
-def create_opportunity(doc_id: str | None, payload: dict) -> str:
-    """Upsert an opportunity at opportunities/{id}. Uses deterministic id if possible:
-    - If doc_id provided, use it
-    - Else if payload has source and source_id, use f"{source}:{source_id}"
-    - Else compute hash:sha256(title+company+location+apply_link)
-    """
-    import uuid as _uuid, hashlib as _hashlib
-    # Determine ID
+def _opportunity_doc_id(doc_id: str | None, payload: dict) -> str:
+    import hashlib as _hashlib
     if doc_id:
         oid = doc_id.strip()
     elif payload.get("id"):
@@ -228,6 +399,16 @@ def create_opportunity(doc_id: str | None, payload: dict) -> str:
         ])
         digest = _hashlib.sha256(base.encode("utf-8")).hexdigest()
         oid = f"hash:{digest}"
+    return oid
+
+@instrumented("firestore")
+def create_opportunity(doc_id: str | None, payload: dict) -> str:
+    """Upsert an opportunity at opportunities/{id}. Uses deterministic id if possible:
+    - If doc_id provided, use it
+    - Else if payload has source and source_id, use f"{source}:{source_id}"
+    - Else compute hash:sha256(title+company+location+apply_link)
+    """
+    oid = _opportunity_doc_id(doc_id, payload)
     # Normalize schema per spec
     body = {
         **payload,
@@ -238,9 +419,19 @@ def create_opportunity(doc_id: str | None, payload: dict) -> str:
     _db().collection("opportunities").document(oid).set(body, merge=True)
     return oid
 
+@instrumented("firestore")
 def list_opportunities(filters: dict = None, limit: int = 50, order_by: str | None = None, descending: bool = False, offset: int = 0) -> list[dict]:
     """List opportunities with common filters per schema: type, education_level (array-contains), domain (array-contains), skills_required (array-contains), location, country, source, deadline_from, posted_after, tags (array-contains), archived (default false)."""
-    col = _db().collection("opportunities")
+    q = _opportunities_query(_db().collection("opportunities"), filters, limit, order_by, descending, offset)
+    out = []
+    for d in q.stream():
+        item = d.to_dict() or {}
+        item["id"] = d.id
+        out.append(item)
+    return out
+
+def _opportunities_query(col, filters: dict = None, limit: int = 50, order_by: str | None = None, descending: bool = False, offset: int = 0):
+    """Apply list_opportunities filters/sorting/paging to a (sync or async) collection reference."""
     q = col
     f = filters or {}
     # Default: exclude archived unless explicitly requested
@@ -277,14 +468,9 @@ def list_opportunities(filters: dict = None, limit: int = 50, order_by: str | No
 
     if offset:
         q = q.offset(offset)
-    docs = q.limit(limit).stream()
-    out = []
-    for d in docs:
-        item = d.to_dict() or {}
-        item["id"] = d.id
-        out.append(item)
-    return out
+    return q.limit(limit)
 
+@instrumented("firestore")
 def get_opportunity_by_id(opportunity_id: str) -> dict | None:
     doc = _db().collection("opportunities").document(opportunity_id).get()
     if doc and doc.exists:
@@ -293,6 +479,7 @@ def get_opportunity_by_id(opportunity_id: str) -> dict | None:
         return data
     return None
 
+@instrumented("firestore")
 def save_opportunity_for_user(user_id: str, opportunity_id: str, status: str = "saved", notes: str | None = None, applied_at=None):
     body = {
         "opportunityId": opportunity_id,
@@ -305,9 +492,11 @@ def save_opportunity_for_user(user_id: str, opportunity_id: str, status: str = "
     _db().collection("users").document(user_id).collection("saved_opportunities").document(opportunity_id).set(body, merge=True)
     return body
 
+@instrumented("firestore")
 def unsave_opportunity_for_user(user_id: str, opportunity_id: str):
     _db().collection("users").document(user_id).collection("saved_opportunities").document(opportunity_id).delete()
 
+@instrumented("firestore")
 def list_saved_opportunities(user_id: str) -> list[dict]:
     docs = _db().collection("users").document(user_id).collection("saved_opportunities").order_by("savedAt", direction=firestore.Query.DESCENDING).stream()
     out = []
@@ -317,6 +506,7 @@ def list_saved_opportunities(user_id: str) -> list[dict]:
         out.append(item)
     return out
 
+@instrumented("firestore")
 def mark_applied_opportunity(user_id: str, opportunity_id: str, notes: str | None = None):
     body = {
         "opportunityId": opportunity_id,
@@ -329,6 +519,7 @@ def mark_applied_opportunity(user_id: str, opportunity_id: str, notes: str | Non
     save_opportunity_for_user(user_id, opportunity_id, status="applied", notes=notes, applied_at=SERVER_TIMESTAMP)
     return body
 
+@instrumented("firestore")
 def list_applied_opportunities(user_id: str) -> list[dict]:
     docs = _db().collection("users").document(user_id).collection("applied_opportunities").order_by("appliedAt", direction=firestore.Query.DESCENDING).stream()
     out = []
@@ -339,6 +530,7 @@ def list_applied_opportunities(user_id: str) -> list[dict]:
     return out
 
 # ----- Counselling sessions (per user) -----
+@instrumented("firestore")
 def save_counselling_session(user_id: str, payload: dict) -> str:
     """Create a new counselling session document under users/{uid}/counselling_sessions/{sessionId}."""
     import uuid as _uuid
@@ -352,6 +544,17 @@ def save_counselling_session(user_id: str, payload: dict) -> str:
     _db().collection("users").document(user_id).collection("counselling_sessions").document(session_id).set(doc)
     return session_id
 
+@instrumented("firestore")
+def get_counselling_session(user_id: str, session_id: str) -> dict | None:
+    """Fetch one counselling session by id."""
+    doc = _db().collection("users").document(user_id).collection("counselling_sessions").document(session_id).get()
+    if not doc.exists:
+        return None
+    data = doc.to_dict() or {}
+    data["sessionId"] = doc.id
+    return data
+
+@instrumented("firestore")
 def get_latest_counselling_session(user_id: str) -> dict | None:
     """Fetch the most recent counselling session for a user."""
     col = _db().collection("users").document(user_id).collection("counselling_sessions")
@@ -361,14 +564,248 @@ def get_latest_counselling_session(user_id: str) -> dict | None:
         data["sessionId"] = d.id
         return data
     return None
+
+@instrumented("firestore")
+def set_counselling_career_paths(user_id: str, session_id: str, career_paths: dict):
+    """Store precomputed career paths (with their inputs hash) on a counselling session."""
+    ref = _db().collection("users").document(user_id).collection("counselling_sessions").document(session_id)
+    ref.update({"career_paths": career_paths, "updatedAt": SERVER_TIMESTAMP})
+
+# Counselling conversations (server-side chat memory)
+# A conversation lives in users/{uid}/counselling_sessions/{conversationId}. Its
+# `conversation` map holds a compacted summary plus the turns not yet folded into it;
+# every turn is also kept verbatim under .../turns/{idx}. Conversation docs carry
+# startedAt instead of createdAt, so get_latest_counselling_session (ordered by
+# createdAt) keeps returning saved counselling outcomes only.
+COUNSELLING_VERBATIM_TURNS = int(os.getenv("COUNSELLING_VERBATIM_TURNS", "6"))
+_COUNSELLING_TURN_LIMIT = 4000
+
+def pending_counselling_turns(conversation: dict | None) -> list[dict]:
+    """Stored turns (oldest first) not yet folded into the conversation summary."""
+    conv = conversation or {}
+    through = conv.get("summarized_through", -1)
+    return [t for t in (conv.get("recent") or []) if isinstance(t, dict) and t.get("idx", -1) > through]
+
+def is_counselling_conversation(doc: dict | None) -> bool:
+    """Whether a counselling_sessions document is a /counselling conversation; saved counselling
+    outcomes (/counselling/save) share the collection but have no `conversation` map."""
+    return bool(doc) and isinstance(doc.get("conversation"), dict)
+
+def _stored_conversation(conversation_id: str, doc: dict | None) -> dict | None:
+    if doc is not None and not is_counselling_conversation(doc):
+        raise ValueError(f"counselling_sessions/{conversation_id} is not a counselling conversation")
+    return doc["conversation"] if doc else None
+
+def _counselling_turns_update(conversation: dict | None, messages: list[tuple[str, str]]) -> tuple[list[dict], dict]:
+    """New turn docs and the `conversation` fields to merge. At most 4x COUNSELLING_VERBATIM_TURNS
+    pending turns are kept on the document if compaction falls behind."""
+    start = (conversation or {}).get("turn_count", 0)
+    now = int(time.time() * 1000)
+    turns = [
+        {"idx": start + i, "sender": sender, "content": str(content)[:_COUNSELLING_TURN_LIMIT], "at": now}
+        for i, (sender, content) in enumerate(messages)
+    ]
+    pending = pending_counselling_turns(conversation) + turns
+    return turns, {"recent": pending[-COUNSELLING_VERBATIM_TURNS * 4:], "turn_count": start + len(turns)}
+
+def _counselling_conversation_body(user_id: str, fields: dict, new: bool) -> dict:
+    body = {"userId": user_id, "conversation": fields, "updatedAt": SERVER_TIMESTAMP}
+    if new:
+        body["startedAt"] = SERVER_TIMESTAMP
+    return body
+
+@instrumented("firestore")
+def append_counselling_turns(user_id: str, conversation_id: str, messages: list[tuple[str, str]]) -> dict:
+    """Append (sender, content) turns to a conversation in one transaction; returns the updated `conversation` fields.
+    Turn indexes and `recent` come from the document as read inside the transaction, so overlapping requests on
+    one conversation get consecutive indexes and keep each other's turns (Firestore retries the one that conflicts).
+    Raises ValueError if the document exists but is not a conversation."""
+    db = _db()
+    ref = db.collection("users").document(user_id).collection("counselling_sessions").document(conversation_id)
+
+    @firestore.transactional
+    def append(transaction):
+        snapshot = ref.get(transaction=transaction)
+        conversation = _stored_conversation(conversation_id, snapshot.to_dict() if snapshot.exists else None)
+        turns, fields = _counselling_turns_update(conversation, messages)
+        for t in turns:
+            transaction.create(ref.collection("turns").document(f"{t['idx']:06d}"), t)
+        transaction.set(ref, _counselling_conversation_body(user_id, fields, conversation is None), merge=True)
+        return {**(conversation or {}), **fields}
+
+    return append(db.transaction())
+
+@instrumented("firestore")
+def update_counselling_summary(user_id: str, conversation_id: str, summary: str, summarized_through: int):
+    """Store the compacted summary covering turns up to and including summarized_through."""
+    ref = _db().collection("users").document(user_id).collection("counselling_sessions").document(conversation_id)
+    ref.update({
+        "conversation.summary": summary,
+        "conversation.summarized_through": summarized_through,
+        "updatedAt": SERVER_TIMESTAMP,
+    })
  
-def create_answer_interaction(session_id: str, interaction_id: str, answer_payload: dict):
+@instrumented("firestore")
+def create_answer_interaction(session_id: str, interaction_id: str, answer_payload: dict, session: dict | None = None):
     # answer_payload should include fields like: answer_text (LLM answer), source: 'llm' | 'user'
     body = {
         **answer_payload,
         "createdAt": SERVER_TIMESTAMP,
         "type": "answer",
     }
-    _db().collection("sessions").document(session_id).collection("interactions").document(interaction_id).set(body)
+    _write_interaction(session_id, interaction_id, body, session=session)
+    return body
+
+# ----- Question bank (see app/question_bank.py) -----
+def _bank_stats_update(counts: dict) -> dict:
+    """Merge body adding `counts` ({"served": 1, "score_hist.2": 1, ...}) to question_bank/{id}.stats."""
+    stats: dict = {}
+    for path, n in counts.items():
+        *parents, leaf = path.split(".")
+        target = stats
+        for p in parents:
+            target = target.setdefault(p, {})
+        target[leaf] = firestore.Increment(n)
+    return {"stats": stats, "updatedAt": SERVER_TIMESTAMP}
+
+@instrumented("firestore")
+def list_bank_questions(bank_key: str, start_at: str | None = None, limit: int = 20) -> list[dict]:
+    """Banked questions for one bank_key in document id order, from `start_at` if given."""
+    q = _db().collection("question_bank").where("bank_key", "==", bank_key).order_by("__name__")
+    if start_at:
+        q = q.start_at({"__name__": start_at})
+    out = []
+    for doc in q.limit(limit).stream():
+        item = doc.to_dict()
+        item["id"] = doc.id
+        out.append(item)
+    return out
+
+def _keep_calibrated_level(body: dict, stored: dict | None) -> dict:
+    """`body` without bank_key/difficulty if the stored question is calibrated (has irt) and `body` is not
+    a calibration write: seed() and bank() derive them from the generation level, which would undo it."""
+    if "irt" in body or not (stored or {}).get("irt"):
+        return body
+    return {k: v for k, v in body.items() if k not in ("bank_key", "difficulty")}
+
+@instrumented("firestore")
+def add_bank_questions(questions: list[tuple[str, dict]]):
+    """Upsert (bank_id, body) questions with merge, so re-banking a question keeps its stats. Each chunk
+    is a transaction that first reads the stored questions, so re-banking keeps calibrated levels."""
+    db = _db()
+
+    @firestore.transactional
+    def add(transaction, chunk):
+        refs = {bank_id: db.collection("question_bank").document(bank_id) for bank_id, _ in chunk}
+        unchecked = [refs[bank_id] for bank_id, body in chunk if "irt" not in body]
+        stored = {s.id: s.to_dict() for s in db.get_all(unchecked, transaction=transaction) if s.exists} if unchecked else {}
+        for bank_id, body in chunk:
+            transaction.set(refs[bank_id], _keep_calibrated_level(body, stored.get(bank_id)), merge=True)
+
+    for start in range(0, len(questions), _BATCH_LIMIT):
+        add(db.transaction(), questions[start:start + _BATCH_LIMIT])
+
+@instrumented("firestore")
+def create_bank_question_interaction(session_id: str, interaction_id: str, question_payload: dict, bank_id: str, session: dict | None = None):
+    """create_question_interaction for a banked question; the same batch records it in the
+    session's bank_served list and counts the serve in question_bank/{bank_id}.stats."""
+    body = {
+        **question_payload,
+        "createdAt": SERVER_TIMESTAMP,
+        "type": "question",
+    }
+    db = _db()
+    session_ref = db.collection("sessions").document(session_id)
+    batch = db.batch()
+    batch.set(session_ref.collection("interactions").document(interaction_id), body)
+    batch.set(session_ref, {**_tail_update(interaction_id, body, new=True, session=session), "bank_served": firestore.ArrayUnion([bank_id])}, merge=True)
+    batch.set(db.collection("question_bank").document(bank_id), _bank_stats_update({"served": 1}), merge=True)
+    batch.commit()
     return body
 
+@instrumented("firestore")
+def increment_bank_stats(bank_id: str, counts: dict):
+    _db().collection("question_bank").document(bank_id).set(_bank_stats_update(counts), merge=True)
+
+@instrumented("firestore")
+def list_generated_questions(start_after: str | None = None, limit: int = 500) -> list[dict]:
+    """One page of questions_generated in document id order (for seeding the question bank)."""
+    q = _db().collection("questions_generated").order_by("__name__")
+    if start_after:
+        q = q.start_after({"__name__": start_after})
+    out = []
+    for doc in q.limit(limit).stream():
+        item = doc.to_dict()
+        item["id"] = doc.id
+        out.append(item)
+    return out
+
+# ----- Calibration (see app/calibration.py) -----
+_RESPONSE_SCORE_FIELDS = ["uid", "bankId", "domain", "topic", "evaluation.score"]
+
+@instrumented("firestore")
+def list_response_scores(start_after: str | None = None, limit: int = 1000) -> list[dict]:
+    """One page of responses in document id order, only the fields calibration reads."""
+    q = _db().collection("responses").select(_RESPONSE_SCORE_FIELDS).order_by("__name__")
+    if start_after:
+        q = q.start_after({"__name__": start_after})
+    out = []
+    for doc in q.limit(limit).stream():
+        item = doc.to_dict()
+        item["id"] = doc.id
+        out.append(item)
+    return out
+
+# ----- Idempotency records (see app/idempotency.py) -----
+@instrumented("firestore")
+def create_idempotency_record(record_id: str, body: dict) -> bool:
+    """Create idempotency/{record_id}; False if it already exists."""
+    try:
+        _db().collection("idempotency").document(record_id).create(body)
+        return True
+    except AlreadyExists:
+        return False
+
+def _same_idempotency_claim(current: dict | None, expected: dict | None) -> bool:
+    """Whether a record still holds the claim a caller read (status and claimedAt identify a claim)."""
+    if current is None or expected is None:
+        return current is None and expected is None
+    return (current.get("status"), current.get("claimedAt")) == (expected.get("status"), expected.get("claimedAt"))
+
+@instrumented("firestore")
+def claim_idempotency_record(record_id: str, body: dict, expected: dict | None) -> bool:
+    """Replace idempotency/{record_id} with `body` in a transaction, only if it still holds `expected`
+    (the stale or expired record the caller read; None if it was missing). False if another request
+    took it over first."""
+    db = _db()
+    ref = db.collection("idempotency").document(record_id)
+
+    @firestore.transactional
+    def claim(transaction):
+        snapshot = ref.get(transaction=transaction)
+        if not _same_idempotency_claim(snapshot.to_dict() if snapshot.exists else None, expected):
+            return False
+        transaction.set(ref, body)
+        return True
+
+    return claim(db.transaction())
+
+@instrumented("firestore")
+def get_idempotency_record(record_id: str) -> dict | None:
+    doc = _db().collection("idempotency").document(record_id).get()
+    return doc.to_dict() if doc.exists else None
+
+@instrumented("firestore")
+def set_idempotency_record(record_id: str, body: dict, merge: bool = False):
+    _db().collection("idempotency").document(record_id).set(body, merge=merge)
+
+@instrumented("firestore")
+def delete_idempotency_record(record_id: str):
+    _db().collection("idempotency").document(record_id).delete()
+
+# ----- Storage backend (STORAGE_BACKEND, see app/storage.py) -----
+# Installed last: db_sqlite imports the shared document builders defined above.
+from .storage import STORAGE_BACKEND
+if STORAGE_BACKEND != "firestore":
+    from .storage import backend_functions
+    globals().update(backend_functions())
@@ -0,0 +1,533 @@
+# app/db_async.py
+"""
+Async counterpart of app/db.py on Firestore's AsyncClient.
+
+Same function names, arguments and document shapes as db.py, but as coroutines
+that don't block the event loop, so handlers can overlap independent round trips:
+
+    session, interaction = await asyncio.gather(
+        db_async.get_session(session_id),
+        db_async.get_interaction(session_id, interaction_id),
+    )
+
+Route handlers use this module; db.py stays for scripts and background jobs.
+Keep the two in sync when adding helpers (shared document builders live in db.py).
+"""
+import uuid
+from firebase_admin import firestore_async as admin_fs_async
+from google.cloud import firestore
+from google.api_core.exceptions import AlreadyExists
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+from .metrics import instrumented
+from .firestore_ops import track_async_client
+from .db import (
+    _new_session_doc, _source_log_body, _session_evaluation_updates,
+    _opportunity_doc_id, _opportunities_query,
+    RECENT_TAIL_SIZE, _tail_update, recent_from_tail,
+    _counselling_turns_update, _counselling_conversation_body, _stored_conversation, _same_idempotency_claim, _BATCH_LIMIT, _bank_stats_update,
+    _RESPONSE_SCORE_FIELDS, _keep_calibrated_level,
+)
+
+# Async client for the Firebase Admin app (initialized via app/auth.py)
+def _db():
+    return track_async_client(admin_fs_async.client())
+
+async def _collect(query, id_key: str = "id") -> list[dict]:
+    out = []
+    async for d in query.stream():
+        item = d.to_dict() or {}
+        item[id_key] = d.id
+        out.append(item)
+    return out
+
+# Session helpers
+@instrumented("firestore")
+async def create_session(session_id: str, user_id: str, domain: str, metadata: dict = None):
+    doc = _new_session_doc(session_id, user_id, domain, metadata)
+    await _db().collection("sessions").document(session_id).set(doc)
+    return doc
+
+@instrumented("firestore")
+async def get_session(session_id: str):
+    doc = await _db().collection("sessions").document(session_id).get()
+    return doc.to_dict() if doc.exists else None
+
+@instrumented("firestore")
+async def update_session(session_id: str, updates: dict):
+    updates["updatedAt"] = SERVER_TIMESTAMP
+    await _db().collection("sessions").document(session_id).update(updates)
+
+# Interactions (Q/A round); writes also maintain sessions/{id}.recent_tail (see db.py)
+async def _write_interaction(session_id: str, interaction_id: str, body: dict, merge: bool = False, session: dict | None = None):
+    db = _db()
+    session_ref = db.collection("sessions").document(session_id)
+    batch = db.batch()
+    batch.set(session_ref.collection("interactions").document(interaction_id), body, merge=merge)
+    batch.set(session_ref, _tail_update(interaction_id, body, new=not merge, session=session), merge=True)
+    await batch.commit()
+
+@instrumented("firestore")
+async def create_interactions(session_id: str, interactions: list[tuple[str, dict]], documents: list[tuple[str, str, dict]] = (), session: dict | None = None):
+    """Create several interactions plus other documents in one batch (see db.create_interactions)."""
+    db = _db()
+    session_ref = db.collection("sessions").document(session_id)
+    batch = db.batch()
+    tail = {}
+    for interaction_id, body in interactions:
+        batch.set(session_ref.collection("interactions").document(interaction_id), body)
+        tail.update(_tail_update(interaction_id, body, new=True, session=session)["recent_tail"])
+    batch.set(session_ref, {"recent_tail": tail}, merge=True)
+    for collection, doc_id, body in documents:
+        batch.set(db.collection(collection).document(doc_id), body)
+    await batch.commit()
+
+@instrumented("firestore")
+async def store_interaction(session_id: str, interaction_id: str, payload: dict, session: dict | None = None):
+    payload = {**payload, "createdAt": SERVER_TIMESTAMP}
+    await _write_interaction(session_id, interaction_id, payload, session=session)
+
+@instrumented("firestore")
+async def get_interaction(session_id: str, interaction_id: str):
+    doc = await _db().collection("sessions").document(session_id).collection("interactions").document(interaction_id).get()
+    return doc.to_dict() if doc.exists else None
+
+@instrumented("firestore")
+async def update_interaction(session_id: str, interaction_id: str, updates: dict):
+    updates["updatedAt"] = SERVER_TIMESTAMP
+    await _write_interaction(session_id, interaction_id, updates, merge=True)
+
+@instrumented("firestore")
+async def get_last_interaction(session_id: str):
+    col = _db().collection("sessions").document(session_id).collection("interactions")
+    async for d in col.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(1).stream():
+        return d.to_dict()
+    return None
+
+# ----- Source logs (scraper audit) -----
+@instrumented("firestore")
+async def create_source_log(payload: dict) -> str:
+    """Store a scraping/audit log in source_logs/{log:<uuid>} with basic truncation for raw_html."""
+    body = _source_log_body(payload)
+    await _db().collection("source_logs").document(body["id"]).set(body, merge=True)
+    return body["id"]
+
+# ----- Session adaptive fields helpers -----
+@instrumented("firestore")
+async def get_session_proficiency(session_id: str) -> float:
+    s = await get_session(session_id)
+    if not s:
+        return 0.5
+    try:
+        return float(s.get("proficiency", 0.5))
+    except Exception:
+        return 0.5
+
+@instrumented("firestore")
+async def set_session_proficiency(session_id: str, value: float):
+    await _db().collection("sessions").document(session_id).update({
+        "proficiency": float(value),
+        "updatedAt": SERVER_TIMESTAMP,
+    })
+
+@instrumented("firestore")
+async def get_session_difficulty(session_id: str) -> int:
+    s = await get_session(session_id)
+    if not s:
+        return 3
+    try:
+        return int(s.get("difficulty_level", 3))
+    except Exception:
+        return 3
+
+@instrumented("firestore")
+async def set_session_difficulty(session_id: str, level: int):
+    await _db().collection("sessions").document(session_id).update({
+        "difficulty_level": int(level),
+        "updatedAt": SERVER_TIMESTAMP,
+    })
+
+@instrumented("firestore")
+async def append_session_history(session_id: str, field: str, entry):
+    # field is one of: scores, questions, answers, difficulty_progression
+    await _db().collection("sessions").document(session_id).update({
+        f"history.{field}": firestore.ArrayUnion([entry]),
+        "updatedAt": SERVER_TIMESTAMP,
+    })
+
+@instrumented("firestore")
+async def record_session_evaluation(session_id: str, proficiency: float, difficulty: int, history: dict):
+    """Apply one graded answer in a single write: proficiency, difficulty and history entries keyed by field."""
+    await _db().collection("sessions").document(session_id).update(_session_evaluation_updates(proficiency, difficulty, history))
+
+@instrumented("firestore")
+async def record_session_evaluations(session_id: str, interactions: list[tuple[str, dict]], proficiency: float, difficulty: int, history: dict):
+    """Apply several graded answers in one batch (see db.record_session_evaluations)."""
+    db = _db()
+    session_ref = db.collection("sessions").document(session_id)
+    batch = db.batch()
+    tail = {}
+    for interaction_id, updates in interactions:
+        updates = {**updates, "updatedAt": SERVER_TIMESTAMP}
+        batch.set(session_ref.collection("interactions").document(interaction_id), updates, merge=True)
+        tail.update(_tail_update(interaction_id, updates, new=False)["recent_tail"])
+    batch.set(session_ref, {"recent_tail": tail}, merge=True)
+    batch.update(session_ref, _session_evaluation_updates(proficiency, difficulty, history, many=True))
+    await batch.commit()
+
+# Skill state
+@instrumented("firestore")
+async def update_skill_state(user_id: str, skill: str, new_proficiency: float):
+    doc = {
+        "userId": user_id,
+        "skill": skill,
+        "proficiency": float(new_proficiency),
+        "updatedAt": SERVER_TIMESTAMP
+    }
+    await _db().collection("skill_state").document(f"{user_id}_{skill}").set(doc)
+    return doc
+
+# User profile helpers (for users collection)
+@instrumented("firestore")
+async def create_user_profile(user_id: str, profile_data: dict):
+    """Create or update user profile in users/{uid}"""
+    profile_data["updatedAt"] = SERVER_TIMESTAMP
+    if "createdAt" not in profile_data:
+        profile_data["createdAt"] = SERVER_TIMESTAMP
+    await _db().collection("users").document(user_id).set(profile_data, merge=True)
+    return profile_data
+
+@instrumented("firestore")
+async def get_user_profile(user_id: str):
+    """Get user profile from users/{uid}"""
+    doc = await _db().collection("users").document(user_id).get()
+    return doc.to_dict() if doc.exists else None
+
+# Additional helper functions
+@instrumented("firestore")
+async def get_recent_interactions(session_id: str, limit: int = RECENT_TAIL_SIZE, session: dict | None = None) -> list[dict]:
+    """Latest `limit` interactions, oldest first. Served from the session's recent_tail (pass `session` if
+    already loaded); falls back to a newest-first query for sessions created before the tail existed."""
+    if session is None:
+        session = await get_session(session_id)
+    recent = recent_from_tail(session, limit)
+    if recent is not None:
+        return recent
+    col = _db().collection("sessions").document(session_id).collection("interactions")
+    interactions = await _collect(col.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(limit))
+    interactions.reverse()
+    return interactions
+
+@instrumented("firestore")
+async def get_session_interactions(session_id: str, limit: int = 50):
+    """Get all interactions for a session, ordered by creation time"""
+    col = _db().collection("sessions").document(session_id).collection("interactions")
+    return await _collect(col.order_by("createdAt").limit(limit))
+
+@instrumented("firestore")
+async def get_user_sessions(user_id: str):
+    """Get all sessions for a user"""
+    q = _db().collection("sessions").where("userId", "==", user_id)
+    return await _collect(q.order_by("createdAt", direction=firestore.Query.DESCENDING))
+
+@instrumented("firestore")
+async def get_skill_state(user_id: str, skill: str = None):
+    """Get skill state for user. If skill is None, get all skills for user"""
+    if skill:
+        doc = await _db().collection("skill_state").document(f"{user_id}_{skill}").get()
+        return doc.to_dict() if doc.exists else None
+    return await _collect(_db().collection("skill_state").where("userId", "==", user_id))
+
+# Responses collection for evaluations
+@instrumented("firestore")
+async def store_response(response_id: str, payload: dict):
+    payload = {**payload, "createdAt": SERVER_TIMESTAMP}
+    await _db().collection("responses").document(response_id).set(payload)
+    return payload
+
+# Questions generated storage
+@instrumented("firestore")
+async def store_generated_question(question_id: str, payload: dict):
+    payload = {**payload, "createdAt": SERVER_TIMESTAMP}
+    await _db().collection("questions_generated").document(question_id).set(payload)
+    return payload
+
+@instrumented("firestore")
+async def write_documents(docs: list[tuple[str, str, dict]]):
+    """set() each (collection, doc_id, body), committing in batches of up to 500 writes."""
+    db = _db()
+    for start in range(0, len(docs), _BATCH_LIMIT):
+        batch = db.batch()
+        for collection, doc_id, body in docs[start:start + _BATCH_LIMIT]:
+            batch.set(db.collection(collection).document(doc_id), body)
+        await batch.commit()
+
+@instrumented("firestore")
+async def get_generated_question(question_id: str) -> dict | None:
+    doc = await _db().collection("questions_generated").document(question_id).get()
+    return doc.to_dict() if doc.exists else None
+
+@instrumented("firestore")
+async def create_question_interaction(session_id: str, interaction_id: str, question_payload: dict, session: dict | None = None):
+    # question_payload should include fields like: question_text, options/expected_answer, question_meta
+    body = {
+        **question_payload,
+        "createdAt": SERVER_TIMESTAMP,
+        "type": "question",
+    }
+    await _write_interaction(session_id, interaction_id, body, session=session)
+    return body
+
+@instrumented("firestore")
+async def create_answer_interaction(session_id: str, interaction_id: str, answer_payload: dict, session: dict | None = None):
+    # answer_payload should include fields like: answer_text (LLM answer), source: 'llm' | 'user'
+    body = {
+        **answer_payload,
+        "createdAt": SERVER_TIMESTAMP,
+        "type": "answer",
+    }
+    await _write_interaction(session_id, interaction_id, body, session=session)
+    return body
+
+# ----- Opportunity Finder helpers -----
+@instrumented("firestore")
+async def create_opportunity(doc_id: str | None, payload: dict) -> str:
+    """Upsert an opportunity at opportunities/{id} (id rules as in db.create_opportunity)."""
+    oid = _opportunity_doc_id(doc_id, payload)
+    body = {
+        **payload,
+        "id": oid,
+        "createdAt": payload.get("createdAt") or SERVER_TIMESTAMP,
+        "updatedAt": SERVER_TIMESTAMP,
+    }
+    await _db().collection("opportunities").document(oid).set(body, merge=True)
+    return oid
+
+@instrumented("firestore")
+async def list_opportunities(filters: dict = None, limit: int = 50, order_by: str | None = None, descending: bool = False, offset: int = 0) -> list[dict]:
+    """List opportunities; filters as in db.list_opportunities."""
+    return await _collect(_opportunities_query(_db().collection("opportunities"), filters, limit, order_by, descending, offset))
+
+@instrumented("firestore")
+async def get_opportunity_by_id(opportunity_id: str) -> dict | None:
+    doc = await _db().collection("opportunities").document(opportunity_id).get()
+    if doc and doc.exists:
+        data = doc.to_dict() or {}
+        data["id"] = doc.id
+        return data
+    return None
+
+@instrumented("firestore")
+async def save_opportunity_for_user(user_id: str, opportunity_id: str, status: str = "saved", notes: str | None = None, applied_at=None):
+    body = {
+        "opportunityId": opportunity_id,
+        "status": status,  # saved | applied | interested
+        "savedAt": SERVER_TIMESTAMP,
+        "appliedAt": applied_at,  # may be None
+        "notes": notes or None,
+        "updatedAt": SERVER_TIMESTAMP,
+    }
+    await _db().collection("users").document(user_id).collection("saved_opportunities").document(opportunity_id).set(body, merge=True)
+    return body
+
+@instrumented("firestore")
+async def unsave_opportunity_for_user(user_id: str, opportunity_id: str):
+    await _db().collection("users").document(user_id).collection("saved_opportunities").document(opportunity_id).delete()
+
+@instrumented("firestore")
+async def list_saved_opportunities(user_id: str) -> list[dict]:
+    col = _db().collection("users").document(user_id).collection("saved_opportunities")
+    return await _collect(col.order_by("savedAt", direction=firestore.Query.DESCENDING))
+
+@instrumented("firestore")
+async def mark_applied_opportunity(user_id: str, opportunity_id: str, notes: str | None = None):
+    body = {
+        "opportunityId": opportunity_id,
+        "appliedAt": SERVER_TIMESTAMP,
+        "notes": notes or None,
+    }
+    # Track under applied_opportunities and upsert saved_opportunities with status=applied
+    await _db().collection("users").document(user_id).collection("applied_opportunities").document(opportunity_id).set(body, merge=True)
+    await save_opportunity_for_user(user_id, opportunity_id, status="applied", notes=notes, applied_at=SERVER_TIMESTAMP)
+    return body
+
+@instrumented("firestore")
+async def list_applied_opportunities(user_id: str) -> list[dict]:
+    col = _db().collection("users").document(user_id).collection("applied_opportunities")
+    return await _collect(col.order_by("appliedAt", direction=firestore.Query.DESCENDING))
+
+# ----- Counselling sessions (per user) -----
+@instrumented("firestore")
+async def save_counselling_session(user_id: str, payload: dict) -> str:
+    """Create a new counselling session document under users/{uid}/counselling_sessions/{sessionId}."""
+    session_id = payload.get("sessionId") or str(uuid.uuid4())
+    doc = {
+        **payload,
+        "userId": user_id,
+        "createdAt": SERVER_TIMESTAMP,
+        "updatedAt": SERVER_TIMESTAMP,
+    }
+    await _db().collection("users").document(user_id).collection("counselling_sessions").document(session_id).set(doc)
+    return session_id
+
+@instrumented("firestore")
+async def get_counselling_session(user_id: str, session_id: str) -> dict | None:
+    """Fetch one counselling session by id."""
+    doc = await _db().collection("users").document(user_id).collection("counselling_sessions").document(session_id).get()
+    if not doc.exists:
+        return None
+    data = doc.to_dict() or {}
+    data["sessionId"] = doc.id
+    return data
+
+@instrumented("firestore")
+async def get_latest_counselling_session(user_id: str) -> dict | None:
+    """Fetch the most recent counselling session for a user."""
+    col = _db().collection("users").document(user_id).collection("counselling_sessions")
+    async for d in col.order_by("createdAt", direction=firestore.Query.DESCENDING).limit(1).stream():
+        data = d.to_dict()
+        data["sessionId"] = d.id
+        return data
+    return None
+
+@instrumented("firestore")
+async def set_counselling_career_paths(user_id: str, session_id: str, career_paths: dict):
+    """Store precomputed career paths (with their inputs hash) on a counselling session."""
+    ref = _db().collection("users").document(user_id).collection("counselling_sessions").document(session_id)
+    await ref.update({"career_paths": career_paths, "updatedAt": SERVER_TIMESTAMP})
+
+# Counselling conversations (see db.py)
+@instrumented("firestore")
+async def append_counselling_turns(user_id: str, conversation_id: str, messages: list[tuple[str, str]]) -> dict:
+    """Append (sender, content) turns to a conversation in one transaction (see db.append_counselling_turns)."""
+    db = _db()
+    ref = db.collection("users").document(user_id).collection("counselling_sessions").document(conversation_id)
+
+    @firestore.async_transactional
+    async def append(transaction):
+        snapshot = await ref.get(transaction=transaction)
+        conversation = _stored_conversation(conversation_id, snapshot.to_dict() if snapshot.exists else None)
+        turns, fields = _counselling_turns_update(conversation, messages)
+        for t in turns:
+            transaction.create(ref.collection("turns").document(f"{t['idx']:06d}"), t)
+        transaction.set(ref, _counselling_conversation_body(user_id, fields, conversation is None), merge=True)
+        return {**(conversation or {}), **fields}
+
+    return await append(db.transaction())
+
+@instrumented("firestore")
+async def update_counselling_summary(user_id: str, conversation_id: str, summary: str, summarized_through: int):
+    """Store the compacted summary covering turns up to and including summarized_through."""
+    ref = _db().collection("users").document(user_id).collection("counselling_sessions").document(conversation_id)
+    await ref.update({
+        "conversation.summary": summary,
+        "conversation.summarized_through": summarized_through,
+        "updatedAt": SERVER_TIMESTAMP,
+    })
+
+# ----- Question bank (see app/question_bank.py) -----
+@instrumented("firestore")
+async def list_bank_questions(bank_key: str, start_at: str | None = None, limit: int = 20) -> list[dict]:
+    """Banked questions for one bank_key in document id order, from `start_at` if given."""
+    q = _db().collection("question_bank").where("bank_key", "==", bank_key).order_by("__name__")
+    if start_at:
+        q = q.start_at({"__name__": start_at})
+    return await _collect(q.limit(limit))
+
+@instrumented("firestore")
+async def add_bank_questions(questions: list[tuple[str, dict]]):
+    """Transactional upsert that keeps calibrated levels (see db.add_bank_questions)."""
+    db = _db()
+
+    @firestore.async_transactional
+    async def add(transaction, chunk):
+        refs = {bank_id: db.collection("question_bank").document(bank_id) for bank_id, _ in chunk}
+        unchecked = [refs[bank_id] for bank_id, body in chunk if "irt" not in body]
+        stored = {s.id: s.to_dict() async for s in db.get_all(unchecked, transaction=transaction) if s.exists} if unchecked else {}
+        for bank_id, body in chunk:
+            transaction.set(refs[bank_id], _keep_calibrated_level(body, stored.get(bank_id)), merge=True)
+
+    for start in range(0, len(questions), _BATCH_LIMIT):
+        await add(db.transaction(), questions[start:start + _BATCH_LIMIT])
+
+@instrumented("firestore")
+async def create_bank_question_interaction(session_id: str, interaction_id: str, question_payload: dict, bank_id: str, session: dict | None = None):
+    """create_question_interaction for a banked question, plus bank_served and stats.served (see db.py)."""
+    body = {
+        **question_payload,
+        "createdAt": SERVER_TIMESTAMP,
+        "type": "question",
+    }
+    db = _db()
+    session_ref = db.collection("sessions").document(session_id)
+    batch = db.batch()
+    batch.set(session_ref.collection("interactions").document(interaction_id), body)
+    batch.set(session_ref, {**_tail_update(interaction_id, body, new=True, session=session), "bank_served": firestore.ArrayUnion([bank_id])}, merge=True)
+    batch.set(db.collection("question_bank").document(bank_id), _bank_stats_update({"served": 1}), merge=True)
+    await batch.commit()
+    return body
+
+@instrumented("firestore")
+async def increment_bank_stats(bank_id: str, counts: dict):
+    await _db().collection("question_bank").document(bank_id).set(_bank_stats_update(counts), merge=True)
+
+@instrumented("firestore")
+async def list_generated_questions(start_after: str | None = None, limit: int = 500) -> list[dict]:
+    """One page of questions_generated in document id order (for seeding the question bank)."""
+    q = _db().collection("questions_generated").order_by("__name__")
+    if start_after:
+        q = q.start_after({"__name__": start_after})
+    return await _collect(q.limit(limit))
+
+# ----- Calibration (see app/calibration.py) -----
+@instrumented("firestore")
+async def list_response_scores(start_after: str | None = None, limit: int = 1000) -> list[dict]:
+    """One page of responses in document id order, only the fields calibration reads."""
+    q = _db().collection("responses").select(_RESPONSE_SCORE_FIELDS).order_by("__name__")
+    if start_after:
+        q = q.start_after({"__name__": start_after})
+    return await _collect(q.limit(limit))
+
+# ----- Idempotency records (see app/idempotency.py) -----
+@instrumented("firestore")
+async def create_idempotency_record(record_id: str, body: dict) -> bool:
+    """Create idempotency/{record_id}; False if it already exists."""
+    try:
+        await _db().collection("idempotency").document(record_id).create(body)
+        return True
+    except AlreadyExists:
+        return False
+
+@instrumented("firestore")
+async def claim_idempotency_record(record_id: str, body: dict, expected: dict | None) -> bool:
+    """Transactional takeover of a stale or expired record (see db.claim_idempotency_record)."""
+    db = _db()
+    ref = db.collection("idempotency").document(record_id)
+
+    @firestore.async_transactional
+    async def claim(transaction):
+        snapshot = await ref.get(transaction=transaction)
+        if not _same_idempotency_claim(snapshot.to_dict() if snapshot.exists else None, expected):
+            return False
+        transaction.set(ref, body)
+        return True
+
+    return await claim(db.transaction())
+
+@instrumented("firestore")
+async def get_idempotency_record(record_id: str) -> dict | None:
+    doc = await _db().collection("idempotency").document(record_id).get()
+    return doc.to_dict() if doc.exists else None
+
+@instrumented("firestore")
+async def set_idempotency_record(record_id: str, body: dict, merge: bool = False):
+    await _db().collection("idempotency").document(record_id).set(body, merge=merge)
+
+@instrumented("firestore")
+async def delete_idempotency_record(record_id: str):
+    await _db().collection("idempotency").document(record_id).delete()
+
+# ----- Storage backend (STORAGE_BACKEND, see app/storage.py) -----
+from .storage import STORAGE_BACKEND
+if STORAGE_BACKEND != "firestore":
+    from .storage import backend_functions
+    globals().update(backend_functions(asynchronous=True))
@@ -0,0 +1,807 @@
+# app/db_sqlite.py
+"""
+SQLite implementation of the storage repository (STORAGE_BACKEND=sqlite, see app/storage.py).
+
+Same function names, arguments and document shapes as db.py, so route handlers,
+background jobs and scripts work unchanged; reads are local (sub-millisecond)
+instead of Firestore round trips. Meant for self-hosted single-node deployments,
+local development and tests.
+
+Layout (one file at SQLITE_PATH, WAL mode so readers never wait on the writer):
+
+    documents          every Firestore-shaped document, keyed by (collection path, id),
+                       body stored as JSON; created_at mirrors createdAt/startedAt
+                       for ordered subcollection reads (interactions, turns, ...)
+    opportunities      opportunity documents with the list_opportunities filter/sort
+                       fields as indexed columns
+    opportunity_terms  one row per element of the array fields list_opportunities
+                       filters with array-contains (education_level, domain,
+                       skills_required, tags)
+
+Firestore write semantics used by db.py are reproduced: SERVER_TIMESTAMP,
+ArrayUnion, Increment, DELETE_FIELD, dotted field paths in update(), recursive map merge
+for set(merge=True), NotFound for update() of a missing document, and queries
+skipping documents that lack an equality/order field.
+"""
+import datetime as dt
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterable
+
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from .config import SQLITE_PATH
+from .metrics import instrumented
+from .db import (
+    _new_session_doc, _source_log_body, _session_evaluation_updates,
+    _opportunity_doc_id, RECENT_TAIL_SIZE, _tail_update, recent_from_tail,
+    _counselling_turns_update, _counselling_conversation_body, _stored_conversation, _same_idempotency_claim, _bank_stats_update,
+    _keep_calibrated_level,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL,
+    PRIMARY KEY (collection, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS documents_created ON documents (collection, created_at);
+CREATE INDEX IF NOT EXISTS documents_user ON documents (collection, json_extract(data, '$.userId'), created_at);
+CREATE INDEX IF NOT EXISTS documents_bank_key ON documents (collection, json_extract(data, '$.bank_key'), id);
+
+CREATE TABLE IF NOT EXISTS opportunities (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    archived INTEGER,
+    type TEXT,
+    location TEXT,
+    country TEXT,
+    source TEXT,
+    deadline TEXT,
+    posted_at TEXT,
+    fetched_at TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS opportunities_type ON opportunities (archived, type, deadline);
+CREATE INDEX IF NOT EXISTS opportunities_location ON opportunities (archived, location, deadline);
+CREATE INDEX IF NOT EXISTS opportunities_country ON opportunities (archived, country, deadline);
+CREATE INDEX IF NOT EXISTS opportunities_source ON opportunities (archived, source, deadline);
+CREATE INDEX IF NOT EXISTS opportunities_deadline ON opportunities (archived, deadline);
+CREATE INDEX IF NOT EXISTS opportunities_posted ON opportunities (archived, posted_at);
+CREATE INDEX IF NOT EXISTS opportunities_fetched ON opportunities (archived, fetched_at);
+
+CREATE TABLE IF NOT EXISTS opportunity_terms (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    opportunity_id TEXT NOT NULL,
+    PRIMARY KEY (field, value, opportunity_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS opportunity_terms_by_id ON opportunity_terms (opportunity_id);
+"""
+
+_OPPORTUNITY_COLUMNS = ("type", "location", "country", "source", "deadline", "posted_at", "fetched_at")
+_OPPORTUNITY_TERMS = ("education_level", "domain", "skills_required", "tags")
+
+_local = threading.local()
+
+
+# ----- Connection -----
+def _conn() -> sqlite3.Connection:
+    """Per-thread connection (sqlite3 connections are not shared across threads)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(os.path.abspath(SQLITE_PATH)), exist_ok=True)
+        conn = sqlite3.connect(SQLITE_PATH, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+@contextmanager
+def _tx():
+    """One write transaction (the counterpart of a Firestore batch)."""
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+# ----- Values -----
+def _now() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def _utc(value: dt.datetime) -> dt.datetime:
+    # Naive datetimes are UTC, as in Firestore
+    return value.replace(tzinfo=dt.timezone.utc) if value.tzinfo is None else value.astimezone(dt.timezone.utc)
+
+
+def _iso(value: dt.datetime) -> str:
+    """Fixed-width UTC text (always with microseconds), so stored datetimes order correctly as text."""
+    return _utc(value).isoformat(timespec="microseconds")
+
+
+def _encode(value: Any):
+    if isinstance(value, dt.datetime):
+        return {"__datetime__": _iso(value)}
+    raise TypeError(f"Cannot store {type(value).__name__} in SQLite document")
+
+
+def _decode(obj: dict):
+    if len(obj) == 1 and "__datetime__" in obj:
+        return dt.datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def _dumps(doc: dict) -> str:
+    return json.dumps(doc, default=_encode, separators=(",", ":"))
+
+
+def _loads(data: str) -> dict:
+    return json.loads(data, object_hook=_decode)
+
+
+def _resolve(value: Any, current: Any = None) -> Any:
+    """Apply Firestore sentinels/transforms to a value being written over `current`."""
+    if value is SERVER_TIMESTAMP:
+        return _now()
+    if isinstance(value, firestore.Increment):
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + value.value
+    if isinstance(value, firestore.ArrayUnion):
+        existing = list(current) if isinstance(current, list) else []
+        return existing + [v for v in value.values if v not in existing]
+    if isinstance(value, dict):
+        return {k: _resolve(v) for k, v in value.items() if v is not firestore.DELETE_FIELD}
+    if isinstance(value, list):
+        return [_resolve(v) for v in value]
+    return value
+
+
+def _merge(base: dict, updates: dict) -> dict:
+    """set(..., merge=True): maps merge recursively, everything else is replaced."""
+    out = dict(base)
+    for k, v in updates.items():
+        if v is firestore.DELETE_FIELD:
+            out.pop(k, None)
+        elif isinstance(v, dict) and isinstance(out.get(k), dict):
+            out[k] = _merge(out[k], v)
+        else:
+            out[k] = _resolve(v, out.get(k))
+    return out
+
+
+def _apply_updates(doc: dict, updates: dict) -> dict:
+    """update(): keys are field paths ("history.scores", "recent_tail.`id`")."""
+    out = json.loads(_dumps(doc), object_hook=_decode)  # copy
+    for key, v in updates.items():
+        parts = FieldPath.from_api_repr(key).parts
+        target = out
+        for p in parts[:-1]:
+            if not isinstance(target.get(p), dict):
+                target[p] = {}
+            target = target[p]
+        if v is firestore.DELETE_FIELD:
+            target.pop(parts[-1], None)
+        else:
+            target[parts[-1]] = _resolve(v, target.get(parts[-1]))
+    return out
+
+
+def _timestamp(value: Any) -> float | None:
+    return _utc(value).timestamp() if isinstance(value, dt.datetime) else None
+
+
+# ----- Documents -----
+def _read(conn: sqlite3.Connection, collection: str, doc_id: str) -> dict | None:
+    row = conn.execute("SELECT data FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)).fetchone()
+    return _loads(row[0]) if row else None
+
+
+def _store(conn: sqlite3.Connection, collection: str, doc_id: str, doc: dict):
+    created = _timestamp(doc.get("createdAt")) or _timestamp(doc.get("startedAt"))
+    conn.execute(
+        "INSERT INTO documents (collection, id, data, created_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (collection, id) DO UPDATE SET data = excluded.data, created_at = excluded.created_at",
+        (collection, doc_id, _dumps(doc), created),
+    )
+
+
+def _write(conn: sqlite3.Connection, collection: str, doc_id: str, body: dict, merge: bool = False) -> dict:
+    if merge:
+        doc = _merge(_read(conn, collection, doc_id) or {}, body)
+    else:
+        doc = _resolve(body)
+    _store(conn, collection, doc_id, doc)
+    return doc
+
+
+def _patch(conn: sqlite3.Connection, collection: str, doc_id: str, updates: dict) -> dict:
+    current = _read(conn, collection, doc_id)
+    if current is None:
+        raise NotFound(f"No document to update: {collection}/{doc_id}")
+    doc = _apply_updates(current, updates)
+    _store(conn, collection, doc_id, doc)
+    return doc
+
+
+def _order_value(field: str) -> str:
+    """SQL sort key for a document field; datetimes ({"__datetime__": <fixed-width UTC text>}) sort by their text."""
+    return f"COALESCE(json_extract(data, '$.{field}.__datetime__'), json_extract(data, '$.{field}'))"
+
+
+def _select(collection: str, where: Iterable[tuple[str, Any]] = (), order_by: str | None = None,
+            descending: bool = False, limit: int | None = None, id_key: str = "id") -> list[dict]:
+    sql = ["SELECT id, data FROM documents WHERE collection = ?"]
+    params: list = [collection]
+    for field, value in where:
+        sql.append(f"AND json_extract(data, '$.{field}') = ?")
+        params.append(value)
+    if order_by:
+        # created_at also holds startedAt, so createdAt ordering still requires the field (as Firestore does)
+        column = "created_at" if order_by == "createdAt" else _order_value(order_by)
+        sql.append(f"AND json_extract(data, '$.{order_by}') IS NOT NULL ORDER BY {column} {'DESC' if descending else 'ASC'}")
+    else:
+        sql.append("ORDER BY id")
+    if limit:
+        sql.append("LIMIT ?")
+        params.append(int(limit))
+    out = []
+    for doc_id, data in _conn().execute(" ".join(sql), params):
+        item = _loads(data)
+        item[id_key] = doc_id
+        out.append(item)
+    return out
+
+
+# Session helpers
+@instrumented("sqlite")
+def create_session(session_id: str, user_id: str, domain: str, metadata: dict = None):
+    doc = _new_session_doc(session_id, user_id, domain, metadata)
+    with _tx() as conn:
+        _write(conn, "sessions", session_id, doc)
+    return doc
+
+@instrumented("sqlite")
+def get_session(session_id: str):
+    return _read(_conn(), "sessions", session_id)
+
+@instrumented("sqlite")
+def update_session(session_id: str, updates: dict):
+    updates["updatedAt"] = SERVER_TIMESTAMP
+    with _tx() as conn:
+        _patch(conn, "sessions", session_id, updates)
+
+# Interactions (Q/A round); writes also maintain sessions/{id}.recent_tail (see db.py)
+def _write_interaction(session_id: str, interaction_id: str, body: dict, merge: bool = False, session: dict | None = None):
+    with _tx() as conn:
+        _write(conn, f"sessions/{session_id}/interactions", interaction_id, body, merge=merge)
+        _write(conn, "sessions", session_id, _tail_update(interaction_id, body, new=not merge, session=session), merge=True)
+
+@instrumented("sqlite")
+def create_interactions(session_id: str, interactions: list[tuple[str, dict]], documents: list[tuple[str, str, dict]] = (), session: dict | None = None):
+    """Create several interactions plus other documents in one transaction (see db.create_interactions)."""
+    with _tx() as conn:
+        tail = {}
+        for interaction_id, body in interactions:
+            _write(conn, f"sessions/{session_id}/interactions", interaction_id, body)
+            tail.update(_tail_update(interaction_id, body, new=True, session=session)["recent_tail"])
+        _write(conn, "sessions", session_id, {"recent_tail": tail}, merge=True)
+        for collection, doc_id, body in documents:
+            _write(conn, collection, doc_id, body)
+
+@instrumented("sqlite")
+def store_interaction(session_id: str, interaction_id: str, payload: dict, session: dict | None = None):
+    payload = {**payload, "createdAt": SERVER_TIMESTAMP}
+    _write_interaction(session_id, interaction_id, payload, session=session)
+
+@instrumented("sqlite")
+def get_interaction(session_id: str, interaction_id: str):
+    return _read(_conn(), f"sessions/{session_id}/interactions", interaction_id)
+
+@instrumented("sqlite")
+def update_interaction(session_id: str, interaction_id: str, updates: dict):
+    updates["updatedAt"] = SERVER_TIMESTAMP
+    _write_interaction(session_id, interaction_id, updates, merge=True)
+
+@instrumented("sqlite")
+def get_last_interaction(session_id: str):
+    docs = _select(f"sessions/{session_id}/interactions", order_by="createdAt", descending=True, limit=1)
+    if not docs:
+        return None
+    docs[0].pop("id", None)
+    return docs[0]
+
+# ----- Source logs (scraper audit) -----
+@instrumented("sqlite")
+def create_source_log(payload: dict) -> str:
+    """Store a scraping/audit log in source_logs/{log:<uuid>} with basic truncation for raw_html."""
+    body = _source_log_body(payload)
+    with _tx() as conn:
+        _write(conn, "source_logs", body["id"], body, merge=True)
+    return body["id"]
+
+# ----- Session adaptive fields helpers -----
+@instrumented("sqlite")
+def get_session_proficiency(session_id: str) -> float:
+    s = get_session(session_id)
+    if not s:
+        return 0.5
+    try:
+        return float(s.get("proficiency", 0.5))
+    except Exception:
+        return 0.5
+
+@instrumented("sqlite")
+def set_session_proficiency(session_id: str, value: float):
+    with _tx() as conn:
+        _patch(conn, "sessions", session_id, {"proficiency": float(value), "updatedAt": SERVER_TIMESTAMP})
+
+@instrumented("sqlite")
+def get_session_difficulty(session_id: str) -> int:
+    s = get_session(session_id)
+    if not s:
+        return 3
+    try:
+        return int(s.get("difficulty_level", 3))
+    except Exception:
+        return 3
+
+@instrumented("sqlite")
+def set_session_difficulty(session_id: str, level: int):
+    with _tx() as conn:
+        _patch(conn, "sessions", session_id, {"difficulty_level": int(level), "updatedAt": SERVER_TIMESTAMP})
+
+@instrumented("sqlite")
+def append_session_history(session_id: str, field: str, entry):
+    # field is one of: scores, questions, answers, difficulty_progression
+    with _tx() as conn:
+        _patch(conn, "sessions", session_id, {
+            f"history.{field}": firestore.ArrayUnion([entry]),
+            "updatedAt": SERVER_TIMESTAMP,
+        })
+
+@instrumented("sqlite")
+def record_session_evaluation(session_id: str, proficiency: float, difficulty: int, history: dict):
+    """Apply one graded answer in a single write: proficiency, difficulty and history entries keyed by field."""
+    with _tx() as conn:
+        _patch(conn, "sessions", session_id, _session_evaluation_updates(proficiency, difficulty, history))
+
+@instrumented("sqlite")
+def record_session_evaluations(session_id: str, interactions: list[tuple[str, dict]], proficiency: float, difficulty: int, history: dict):
+    """Apply several graded answers in one transaction (see db.record_session_evaluations)."""
+    with _tx() as conn:
+        tail = {}
+        for interaction_id, updates in interactions:
+            updates = {**updates, "updatedAt": SERVER_TIMESTAMP}
+            _write(conn, f"sessions/{session_id}/interactions", interaction_id, updates, merge=True)
+            tail.update(_tail_update(interaction_id, updates, new=False)["recent_tail"])
+        _write(conn, "sessions", session_id, {"recent_tail": tail}, merge=True)
+        _patch(conn, "sessions", session_id, _session_evaluation_updates(proficiency, difficulty, history, many=True))
+
+# Skill state
+@instrumented("sqlite")
+def update_skill_state(user_id: str, skill: str, new_proficiency: float):
+    doc = {
+        "userId": user_id,
+        "skill": skill,
+        "proficiency": float(new_proficiency),
+        "updatedAt": SERVER_TIMESTAMP
+    }
+    with _tx() as conn:
+        _write(conn, "skill_state", f"{user_id}_{skill}", doc)
+    return doc
+
+# User profile helpers (for users collection)
+@instrumented("sqlite")
+def create_user_profile(user_id: str, profile_data: dict):
+    """Create or update user profile in users/{uid}"""
+    profile_data["updatedAt"] = SERVER_TIMESTAMP
+    if "createdAt" not in profile_data:
+        profile_data["createdAt"] = SERVER_TIMESTAMP
+    with _tx() as conn:
+        _write(conn, "users", user_id, profile_data, merge=True)
+    return profile_data
+
+@instrumented("sqlite")
+def get_user_profile(user_id: str):
+    """Get user profile from users/{uid}"""
+    return _read(_conn(), "users", user_id)
+
+# Additional helper functions
+@instrumented("sqlite")
+def get_recent_interactions(session_id: str, limit: int = RECENT_TAIL_SIZE, session: dict | None = None) -> list[dict]:
+    """Latest `limit` interactions, oldest first (recent_tail first, as in db.py)."""
+    if session is None:
+        session = get_session(session_id)
+    recent = recent_from_tail(session, limit)
+    if recent is not None:
+        return recent
+    interactions = _select(f"sessions/{session_id}/interactions", order_by="createdAt", descending=True, limit=limit)
+    interactions.reverse()
+    return interactions
+
+@instrumented("sqlite")
+def get_session_interactions(session_id: str, limit: int = 50):
+    """Get all interactions for a session, ordered by creation time"""
+    return _select(f"sessions/{session_id}/interactions", order_by="createdAt", limit=limit)
+
+@instrumented("sqlite")
+def get_user_sessions(user_id: str):
+    """Get all sessions for a user"""
+    return _select("sessions", where=[("userId", user_id)], order_by="createdAt", descending=True)
+
+@instrumented("sqlite")
+def get_skill_state(user_id: str, skill: str = None):
+    """Get skill state for user. If skill is None, get all skills for user"""
+    if skill:
+        return _read(_conn(), "skill_state", f"{user_id}_{skill}")
+    return _select("skill_state", where=[("userId", user_id)])
+
+# Responses collection for evaluations
+@instrumented("sqlite")
+def store_response(response_id: str, payload: dict):
+    payload = {**payload, "createdAt": SERVER_TIMESTAMP}
+    with _tx() as conn:
+        _write(conn, "responses", response_id, payload)
+    return payload
+
+# Questions generated storage
+@instrumented("sqlite")
+def store_generated_question(question_id: str, payload: dict):
+    payload = {**payload, "createdAt": SERVER_TIMESTAMP}
+    with _tx() as conn:
+        _write(conn, "questions_generated", question_id, payload)
+    return payload
+
+@instrumented("sqlite")
+def write_documents(docs: list[tuple[str, str, dict]]):
+    """set() each (collection, doc_id, body) in one transaction."""
+    with _tx() as conn:
+        for collection, doc_id, body in docs:
+            _write(conn, collection, doc_id, body)
+
+@instrumented("sqlite")
+def get_generated_question(question_id: str) -> dict | None:
+    return _read(_conn(), "questions_generated", question_id)
+
+@instrumented("sqlite")
+def create_question_interaction(session_id: str, interaction_id: str, question_payload: dict, session: dict | None = None):
+    body = {
+        **question_payload,
+        "createdAt": SERVER_TIMESTAMP,
+        "type": "question",
+    }
+    _write_interaction(session_id, interaction_id, body, session=session)
+    return body
+
+@instrumented("sqlite")
+def create_answer_interaction(session_id: str, interaction_id: str, answer_payload: dict, session: dict | None = None):
+    body = {
+        **answer_payload,
+        "createdAt": SERVER_TIMESTAMP,
+        "type": "answer",
+    }
+    _write_interaction(session_id, interaction_id, body, session=session)
+    return body
+
+# ----- Opportunity Finder helpers -----
+def _column_value(value: Any):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, dt.datetime):
+        return _iso(value)
+    if isinstance(value, (str, int, float)):
+        return value
+    return None
+
+def _read_opportunity(conn: sqlite3.Connection, oid: str) -> dict | None:
+    row = conn.execute("SELECT data FROM opportunities WHERE id = ?", (oid,)).fetchone()
+    return _loads(row[0]) if row else None
+
+def _store_opportunity(conn: sqlite3.Connection, oid: str, doc: dict):
+    archived = doc.get("archived")
+    columns = [_column_value(doc.get(c)) for c in _OPPORTUNITY_COLUMNS]
+    conn.execute(
+        f"INSERT OR REPLACE INTO opportunities (id, data, archived, {', '.join(_OPPORTUNITY_COLUMNS)}) "
+        f"VALUES (?, ?, ?, {', '.join('?' * len(_OPPORTUNITY_COLUMNS))})",
+        (oid, _dumps(doc), int(archived) if isinstance(archived, bool) else None, *columns),
+    )
+    conn.execute("DELETE FROM opportunity_terms WHERE opportunity_id = ?", (oid,))
+    terms = {
+        (field, str(v))
+        for field in _OPPORTUNITY_TERMS
+        if isinstance(doc.get(field), list)
+        for v in doc[field] if isinstance(v, (str, int, float))
+    }
+    conn.executemany("INSERT INTO opportunity_terms (field, value, opportunity_id) VALUES (?, ?, ?)", [(f, v, oid) for f, v in terms])
+
+@instrumented("sqlite")
+def create_opportunity(doc_id: str | None, payload: dict) -> str:
+    """Upsert an opportunity at opportunities/{id} (id rules as in db.create_opportunity)."""
+    oid = _opportunity_doc_id(doc_id, payload)
+    body = {
+        **payload,
+        "id": oid,
+        "createdAt": payload.get("createdAt") or SERVER_TIMESTAMP,
+        "updatedAt": SERVER_TIMESTAMP,
+    }
+    with _tx() as conn:
+        _store_opportunity(conn, oid, _merge(_read_opportunity(conn, oid) or {}, body))
+    return oid
+
+@instrumented("sqlite")
+def list_opportunities(filters: dict = None, limit: int = 50, order_by: str | None = None, descending: bool = False, offset: int = 0) -> list[dict]:
+    """List opportunities; filters as in db.list_opportunities (each served by an index)."""
+    f = filters or {}
+    clauses, params = [], []
+    # Default: exclude archived unless explicitly requested (documents without the field never match, as in Firestore)
+    if f.get("archived") is None:
+        clauses.append("archived = 0")
+    elif isinstance(f.get("archived"), bool):
+        clauses.append("archived = ?")
+        params.append(int(f["archived"]))
+    for field in ("type", "location", "country", "source"):
+        if f.get(field):
+            clauses.append(f"{field} = ?")
+            params.append(f[field])
+    for field in _OPPORTUNITY_TERMS:
+        if f.get(field):
+            clauses.append("id IN (SELECT opportunity_id FROM opportunity_terms WHERE field = ? AND value = ?)")
+            params.extend([field, str(f[field])])
+    for key, column, op in (("deadline_from", "deadline", ">="), ("posted_after", "posted_at", ">="), ("deadline_to", "deadline", "<=")):
+        if f.get(key):
+            clauses.append(f"{column} {op} ?")
+            params.append(_column_value(f[key]))
+    order = "id"
+    if order_by:
+        column = order_by if order_by in _OPPORTUNITY_COLUMNS else _order_value(order_by)
+        clauses.append(f"{column} IS NOT NULL")
+        order = f"{column} {'DESC' if descending else 'ASC'}, id"
+    sql = "SELECT id, data FROM opportunities"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {order} LIMIT ? OFFSET ?"
+    params.extend([int(limit), int(offset or 0)])
+    out = []
+    for oid, data in _conn().execute(sql, params):
+        item = _loads(data)
+        item["id"] = oid
+        out.append(item)
+    return out
+
+@instrumented("sqlite")
+def get_opportunity_by_id(opportunity_id: str) -> dict | None:
+    data = _read_opportunity(_conn(), opportunity_id)
+    if data is None:
+        return None
+    data["id"] = opportunity_id
+    return data
+
+@instrumented("sqlite")
+def save_opportunity_for_user(user_id: str, opportunity_id: str, status: str = "saved", notes: str | None = None, applied_at=None):
+    body = {
+        "opportunityId": opportunity_id,
+        "status": status,  # saved | applied | interested
+        "savedAt": SERVER_TIMESTAMP,
+        "appliedAt": applied_at,  # may be None
+        "notes": notes or None,
+        "updatedAt": SERVER_TIMESTAMP,
+    }
+    with _tx() as conn:
+        _write(conn, f"users/{user_id}/saved_opportunities", opportunity_id, body, merge=True)
+    return body
+
+@instrumented("sqlite")
+def unsave_opportunity_for_user(user_id: str, opportunity_id: str):
+    with _tx() as conn:
+        conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?", (f"users/{user_id}/saved_opportunities", opportunity_id))
+
+@instrumented("sqlite")
+def list_saved_opportunities(user_id: str) -> list[dict]:
+    return _select(f"users/{user_id}/saved_opportunities", order_by="savedAt", descending=True)
+
+@instrumented("sqlite")
+def mark_applied_opportunity(user_id: str, opportunity_id: str, notes: str | None = None):
+    body = {
+        "opportunityId": opportunity_id,
+        "appliedAt": SERVER_TIMESTAMP,
+        "notes": notes or None,
+    }
+    with _tx() as conn:
+        _write(conn, f"users/{user_id}/applied_opportunities", opportunity_id, body, merge=True)
+    save_opportunity_for_user(user_id, opportunity_id, status="applied", notes=notes, applied_at=SERVER_TIMESTAMP)
+    return body
+
+@instrumented("sqlite")
+def list_applied_opportunities(user_id: str) -> list[dict]:
+    return _select(f"users/{user_id}/applied_opportunities", order_by="appliedAt", descending=True)
+
+# ----- Counselling sessions (per user) -----
+@instrumented("sqlite")
+def save_counselling_session(user_id: str, payload: dict) -> str:
+    """Create a new counselling session document under users/{uid}/counselling_sessions/{sessionId}."""
+    session_id = payload.get("sessionId") or str(uuid.uuid4())
+    doc = {
+        **payload,
+        "userId": user_id,
+        "createdAt": SERVER_TIMESTAMP,
+        "updatedAt": SERVER_TIMESTAMP,
+    }
+    with _tx() as conn:
+        _write(conn, f"users/{user_id}/counselling_sessions", session_id, doc)
+    return session_id
+
+@instrumented("sqlite")
+def get_counselling_session(user_id: str, session_id: str) -> dict | None:
+    """Fetch one counselling session by id."""
+    data = _read(_conn(), f"users/{user_id}/counselling_sessions", session_id)
+    if data is None:
+        return None
+    data["sessionId"] = session_id
+    return data
+
+@instrumented("sqlite")
+def get_latest_counselling_session(user_id: str) -> dict | None:
+    """Fetch the most recent counselling session for a user (conversation docs have no createdAt, see db.py)."""
+    col = f"users/{user_id}/counselling_sessions"
+    row = _conn().execute(
+        "SELECT id, data FROM documents WHERE collection = ? AND json_extract(data, '$.createdAt') IS NOT NULL "
+        "ORDER BY created_at DESC LIMIT 1",
+        (col,),
+    ).fetchone()
+    if not row:
+        return None
+    data = _loads(row[1])
+    data["sessionId"] = row[0]
+    return data
+
+@instrumented("sqlite")
+def set_counselling_career_paths(user_id: str, session_id: str, career_paths: dict):
+    """Store precomputed career paths (with their inputs hash) on a counselling session."""
+    with _tx() as conn:
+        _patch(conn, f"users/{user_id}/counselling_sessions", session_id, {"career_paths": career_paths, "updatedAt": SERVER_TIMESTAMP})
+
+# Counselling conversations (see db.py)
+@instrumented("sqlite")
+def append_counselling_turns(user_id: str, conversation_id: str, messages: list[tuple[str, str]]) -> dict:
+    """Append (sender, content) turns to a conversation in one transaction (see db.append_counselling_turns);
+    BEGIN IMMEDIATE serializes overlapping appends, each reading the conversation it extends."""
+    col = f"users/{user_id}/counselling_sessions"
+    with _tx() as conn:
+        conversation = _stored_conversation(conversation_id, _read(conn, col, conversation_id))
+        turns, fields = _counselling_turns_update(conversation, messages)
+        for t in turns:
+            _write(conn, f"{col}/{conversation_id}/turns", f"{t['idx']:06d}", t)
+        _write(conn, col, conversation_id, _counselling_conversation_body(user_id, fields, conversation is None), merge=True)
+    return {**(conversation or {}), **fields}
+
+@instrumented("sqlite")
+def update_counselling_summary(user_id: str, conversation_id: str, summary: str, summarized_through: int):
+    """Store the compacted summary covering turns up to and including summarized_through."""
+    with _tx() as conn:
+        _patch(conn, f"users/{user_id}/counselling_sessions", conversation_id, {
+            "conversation.summary": summary,
+            "conversation.summarized_through": summarized_through,
+            "updatedAt": SERVER_TIMESTAMP,
+        })
+
+# ----- Question bank (see app/question_bank.py) -----
+@instrumented("sqlite")
+def list_bank_questions(bank_key: str, start_at: str | None = None, limit: int = 20) -> list[dict]:
+    """Banked questions for one bank_key in document id order, from `start_at` if given (documents_bank_key index)."""
+    rows = _conn().execute(
+        "SELECT id, data FROM documents WHERE collection = 'question_bank' AND json_extract(data, '$.bank_key') = ? "
+        "AND id >= ? ORDER BY id LIMIT ?",
+        (bank_key, start_at or "", int(limit)),
+    )
+    out = []
+    for doc_id, data in rows:
+        item = _loads(data)
+        item["id"] = doc_id
+        out.append(item)
+    return out
+
+@instrumented("sqlite")
+def add_bank_questions(questions: list[tuple[str, dict]]):
+    """Upsert (bank_id, body) questions with merge, so re-banking a question keeps its stats and calibrated level."""
+    with _tx() as conn:
+        for bank_id, body in questions:
+            if "irt" not in body:
+                body = _keep_calibrated_level(body, _read(conn, "question_bank", bank_id))
+            _write(conn, "question_bank", bank_id, body, merge=True)
+
+@instrumented("sqlite")
+def create_bank_question_interaction(session_id: str, interaction_id: str, question_payload: dict, bank_id: str, session: dict | None = None):
+    """create_question_interaction for a banked question, plus bank_served and stats.served (see db.py)."""
+    body = {
+        **question_payload,
+        "createdAt": SERVER_TIMESTAMP,
+        "type": "question",
+    }
+    with _tx() as conn:
+        _write(conn, f"sessions/{session_id}/interactions", interaction_id, body)
+        _write(conn, "sessions", session_id, {**_tail_update(interaction_id, body, new=True, session=session), "bank_served": firestore.ArrayUnion([bank_id])}, merge=True)
+        _write(conn, "question_bank", bank_id, _bank_stats_update({"served": 1}), merge=True)
+    return body
+
+@instrumented("sqlite")
+def increment_bank_stats(bank_id: str, counts: dict):
+    with _tx() as conn:
+        _write(conn, "question_bank", bank_id, _bank_stats_update(counts), merge=True)
+
+@instrumented("sqlite")
+def list_generated_questions(start_after: str | None = None, limit: int = 500) -> list[dict]:
+    """One page of questions_generated in document id order (for seeding the question bank)."""
+    rows = _conn().execute(
+        "SELECT id, data FROM documents WHERE collection = 'questions_generated' AND id > ? ORDER BY id LIMIT ?",
+        (start_after or "", int(limit)),
+    )
+    out = []
+    for doc_id, data in rows:
+        item = _loads(data)
+        item["id"] = doc_id
+        out.append(item)
+    return out
+
+# ----- Calibration (see app/calibration.py) -----
+@instrumented("sqlite")
+def list_response_scores(start_after: str | None = None, limit: int = 1000) -> list[dict]:
+    """One page of responses in document id order, only the fields calibration reads."""
+    rows = _conn().execute(
+        "SELECT id, json_extract(data, '$.uid'), json_extract(data, '$.bankId'), json_extract(data, '$.domain'), "
+        "json_extract(data, '$.topic'), json_extract(data, '$.evaluation.score') "
+        "FROM documents WHERE collection = 'responses' AND id > ? ORDER BY id LIMIT ?",
+        (start_after or "", int(limit)),
+    )
+    return [
+        {"id": doc_id, "uid": uid, "bankId": bank_id, "domain": domain, "topic": topic, "evaluation": {"score": score}}
+        for doc_id, uid, bank_id, domain, topic, score in rows
+    ]
+
+# ----- Idempotency records (see app/idempotency.py) -----
+@instrumented("sqlite")
+def create_idempotency_record(record_id: str, body: dict) -> bool:
+    """Create idempotency/{record_id}; False if it already exists."""
+    with _tx() as conn:
+        if _read(conn, "idempotency", record_id) is not None:
+            return False
+        _write(conn, "idempotency", record_id, body)
+    return True
+
+@instrumented("sqlite")
+def claim_idempotency_record(record_id: str, body: dict, expected: dict | None) -> bool:
+    """Compare-and-set takeover under BEGIN IMMEDIATE (see db.claim_idempotency_record)."""
+    with _tx() as conn:
+        if not _same_idempotency_claim(_read(conn, "idempotency", record_id), expected):
+            return False
+        _write(conn, "idempotency", record_id, body)
+    return True
+
+@instrumented("sqlite")
+def get_idempotency_record(record_id: str) -> dict | None:
+    return _read(_conn(), "idempotency", record_id)
+
+@instrumented("sqlite")
+def set_idempotency_record(record_id: str, body: dict, merge: bool = False):
+    with _tx() as conn:
+        _write(conn, "idempotency", record_id, body, merge=merge)
+
+@instrumented("sqlite")
+def delete_idempotency_record(record_id: str):
+    with _tx() as conn:
+        conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?", ("idempotency", record_id))
@@ -0,0 +1,274 @@
+# app/fake_llm.py
+"""
+Fake and replay Gemini backends for load testing, plus response recording.
+
+Select with LLM_BACKEND (read by llm._get_model):
+
+    gemini  (default) real google-generativeai models
+    fake    schema-valid synthetic output for every llm.py function
+    replay  answers from a recording (LLM_REPLAY_PATH); prompts that were not
+            recorded fall back to a recorded answer for the same function,
+            then to synthetic output
+
+Fake/replay models honour the same call shape as GenerativeModel
+(generate_content(prompt, generation_config=, request_options={"timeout"}))
+and return an object with .text, .candidates and .usage_metadata, so caching,
+deadlines, the breaker, hedging and token metrics all behave as in production.
+
+    LLM_FAKE_LATENCY       fixed:MS | uniform:LO_MS,HI_MS | lognormal:MEDIAN_MS,SIGMA  (default lognormal:800,0.5)
+                           | replay (recorded latencies; replay backend only)
+    LLM_FAKE_ERROR_RATE    fraction of calls failing with 503 (default 0)
+    LLM_FAKE_TIMEOUT_RATE  fraction of calls that hang until their deadline (default 0)
+    LLM_FAKE_OUTPUT_TOKENS reported output tokens per call (default: estimated from the text)
+    LLM_FAKE_SEED          seed for latency/error sampling (default 0)
+
+With the real backend, LLM_RECORD_PATH=<file.jsonl> appends every response
+(text, token counts, latency) for later replay.
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from . import prompts
+
+try:
+    from google.api_core import exceptions as gexc
+except ImportError:
+    gexc = None
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").strip().lower()
+LLM_FAKE_LATENCY = os.getenv("LLM_FAKE_LATENCY", "lognormal:800,0.5")
+LLM_FAKE_ERROR_RATE = float(os.getenv("LLM_FAKE_ERROR_RATE", "0"))
+LLM_FAKE_TIMEOUT_RATE = float(os.getenv("LLM_FAKE_TIMEOUT_RATE", "0"))
+LLM_FAKE_OUTPUT_TOKENS = int(os.getenv("LLM_FAKE_OUTPUT_TOKENS", "0"))
+LLM_RECORD_PATH = os.getenv("LLM_RECORD_PATH")
+LLM_REPLAY_PATH = os.getenv("LLM_REPLAY_PATH")
+
+_rng = random.Random(int(os.getenv("LLM_FAKE_SEED", "0")))
+_rng_lock = threading.Lock()
+
+# System instruction -> llm.py function, so a model knows what it is answering
+_FUNCTIONS = {
+    prompts.EVALUATOR: "evaluate_answer",
+    prompts.QUESTION_GENERATOR: "generate_next_question",
+    prompts.LEARNER_SUMMARIZER: "summarize_learner",
+    prompts.COUNSELLING_SUMMARIZER: "summarize_counselling",
+    prompts.TUTOR: "answer_question",
+    prompts.TUTOR_WITH_FOLLOWUP: "answer_with_followup",
+    prompts.CAREER_ADVISOR: "generate_career_paths",
+    prompts.COUNSELLOR: "counselling_response",
+}
+
+
+def is_enabled() -> bool:
+    return LLM_BACKEND in ("fake", "replay")
+
+
+def prompt_key(system_instruction: str | None, prompt: str) -> str:
+    return hashlib.sha256(f"{system_instruction or ''}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+# ----- Sampling -----
+def _parse_latency(spec: str):
+    kind, _, args = spec.partition(":")
+    nums = [float(x) for x in args.split(",") if x.strip()] if args else []
+    kind = kind.strip().lower()
+    if kind == "replay":
+        # Recorded latency per response; unrecorded prompts use the default distribution
+        return _parse_latency("lognormal:800,0.5")
+    if kind == "fixed" and nums:
+        return lambda r: nums[0] / 1000.0
+    if kind == "uniform" and len(nums) == 2:
+        return lambda r: r.uniform(nums[0], nums[1]) / 1000.0
+    if kind == "lognormal" and len(nums) == 2:
+        return lambda r: r.lognormvariate(math.log(nums[0]), nums[1]) / 1000.0
+    raise ValueError(f"Invalid LLM_FAKE_LATENCY: {spec!r}")
+
+
+_latency = _parse_latency(LLM_FAKE_LATENCY)
+
+
+def _sample():
+    with _rng_lock:
+        return _latency(_rng), _rng.random(), _rng.random()
+
+
+def _unavailable(message: str) -> Exception:
+    return gexc.ServiceUnavailable(message) if gexc is not None else ConnectionError(message)
+
+
+def _timed_out(message: str) -> Exception:
+    return gexc.DeadlineExceeded(message) if gexc is not None else TimeoutError(message)
+
+
+# ----- Synthetic output -----
+def _between(prompt: str, label: str, default: str = "") -> str:
+    for line in prompt.splitlines():
+        if line.startswith(label):
+            return line[len(label):].strip()
+    return default
+
+
+def _synthetic(function: str, prompt: str, r: random.Random) -> str:
+    if function == "evaluate_answer":
+        score = round(r.random(), 2)
+        return json.dumps({
+            "score": score,
+            "feedback": "Good structure; tighten the explanation of the key step." if score >= 0.6 else "Revisit the core definition and try a worked example.",
+            "understood_concept": score >= 0.6,
+        })
+    if function == "generate_next_question":
+        try:
+            difficulty = int(_between(prompt, "Current difficulty level (1..5):", "3"))
+        except ValueError:
+            difficulty = 3
+        n = r.randint(1, 10_000)
+        if n % 2:
+            return json.dumps({
+                "question": f"Synthetic MCQ #{n}: which option best describes the concept?",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "answer_index": n % 4,
+                "difficulty": difficulty,
+                "hint": "Eliminate the options that contradict the definition.",
+            })
+        return json.dumps({
+            "question": f"Synthetic question #{n}: explain the concept in your own words.",
+            "expected_answer": "A short explanation covering the definition and one example.",
+            "difficulty": difficulty,
+            "hint": "Start from the definition.",
+        })
+    if function == "answer_with_followup":
+        return json.dumps({
+            "answer": "This is a synthetic answer from the fake LLM backend.",
+            "followup": json.loads(_synthetic("generate_next_question", prompt, r)),
+        })
+    if function == "summarize_learner":
+        return json.dumps({"weak_topics": ["definitions", "edge cases"], "recurring_mistakes": ["skips justification"]})
+    if function == "generate_career_paths":
+        careers = [
+            {
+                "title": title,
+                "why_fit": "Matches the stated interests and preferred skills.",
+                "required_skills": ["communication", "problem solving"],
+                "learning_roadmap": ["Take an introductory course", "Build a small project", "Find a mentor"],
+                "future_growth": "Steady demand over the next five years.",
+                "related_roles": ["Analyst", "Consultant"],
+            }
+            for title in ("Data Analyst", "Product Designer", "Software Engineer")
+        ]
+        return json.dumps({"careers": careers})
+    if function == "summarize_counselling":
+        return "The user is exploring career options, has shared their interests and is weighing next steps."
+    if function == "counselling_response":
+        return (
+            "Thanks for sharing that. It sounds like you are weighing a few directions.\n\n"
+            "• List the subjects you enjoy most\n• Talk to someone working in the field\n• Try a short online course\n\n"
+            "Next step: Which of these could you start this week?"
+        )
+    return "This is a synthetic answer from the fake LLM backend."
+
+
+# ----- Recording / replay -----
+class _Recordings:
+    def __init__(self, path: Optional[str]):
+        self.by_key: Dict[str, dict] = {}
+        self.by_function: Dict[str, List[dict]] = {}
+        if not path or not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                self.by_key[rec.get("key")] = rec
+                self.by_function.setdefault(rec.get("function"), []).append(rec)
+
+    def lookup(self, key: str, function: str, r: random.Random) -> Optional[dict]:
+        rec = self.by_key.get(key)
+        if rec is None and self.by_function.get(function):
+            rec = r.choice(self.by_function[function])
+        return rec
+
+
+_recordings: Optional[_Recordings] = None
+_record_lock = threading.Lock()
+
+
+def _replay_source() -> _Recordings:
+    global _recordings
+    if _recordings is None:
+        _recordings = _Recordings(LLM_REPLAY_PATH)
+    return _recordings
+
+
+def _response(text: str, prompt_tokens: int, output_tokens: int):
+    return SimpleNamespace(
+        text=text,
+        candidates=None,
+        usage_metadata=SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=output_tokens),
+    )
+
+
+class FakeModel:
+    def __init__(self, system_instruction: str | None = None):
+        self.system_instruction = system_instruction
+        self.function = _FUNCTIONS.get(system_instruction, "unknown")
+
+    def generate_content(self, prompt: str, generation_config=None, request_options=None):
+        latency, fail, hang = _sample()
+        timeout = (request_options or {}).get("timeout")
+        key = prompt_key(self.system_instruction, prompt)
+        # Output depends only on the prompt, so identical requests get identical answers
+        r = random.Random(key)
+        rec = _replay_source().lookup(key, self.function, r) if LLM_BACKEND == "replay" else None
+        if rec is not None and LLM_FAKE_LATENCY == "replay":
+            latency = float(rec.get("latency_ms") or 0) / 1000.0
+        if hang < LLM_FAKE_TIMEOUT_RATE or (timeout and latency > timeout):
+            time.sleep(timeout or latency)
+            raise _timed_out(f"fake {self.function} exceeded its deadline")
+        time.sleep(latency)
+        if fail < LLM_FAKE_ERROR_RATE:
+            raise _unavailable(f"fake {self.function} failure")
+        text = rec["text"] if rec is not None else _synthetic(self.function, prompt, r)
+        prompt_tokens = (rec or {}).get("prompt_tokens") or prompts.estimate_tokens(self.system_instruction) + prompts.estimate_tokens(prompt)
+        output_tokens = LLM_FAKE_OUTPUT_TOKENS or (rec or {}).get("output_tokens") or prompts.estimate_tokens(text)
+        return _response(text, prompt_tokens, output_tokens)
+
+
+class RecordingModel:
+    """Wraps a real GenerativeModel and appends each response to LLM_RECORD_PATH."""
+
+    def __init__(self, model, system_instruction: str | None = None):
+        self._model = model
+        self.system_instruction = system_instruction
+        self.function = _FUNCTIONS.get(system_instruction, "unknown")
+
+    def generate_content(self, prompt: str, *args, **kwargs):
+        start = time.perf_counter()
+        completion = self._model.generate_content(prompt, *args, **kwargs)
+        usage = getattr(completion, "usage_metadata", None)
+        try:
+            text = completion.text
+        except Exception:
+            return completion
+        rec = {
+            "key": prompt_key(self.system_instruction, prompt),
+            "function": self.function,
+            "text": text,
+            "prompt_tokens": getattr(usage, "prompt_token_count", None),
+            "output_tokens": getattr(usage, "candidates_token_count", None),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+        with _record_lock, open(LLM_RECORD_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec) + "\n")
+        return completion
+
+    def __getattr__(self, name: str):
+        return getattr(self._model, name)
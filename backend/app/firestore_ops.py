@@ -0,0 +1,275 @@
+# app/firestore_ops.py
+"""
+Per-request Firestore operation counting and read-amplification guardrails.
+
+db._db() / db_async._db() hand out a TrackedClient / TrackedAsyncClient wrapping
+the admin Firestore client. Every document get, query (plus each document it
+returns) and write is recorded in the current request's RequestStats (see app/metrics.py). When the request ends
+a compact summary is checked against budgets and repeated identical reads are
+flagged, since every Firestore read is billed.
+
+Environment:
+    FIRESTORE_READ_BUDGET / FIRESTORE_WRITE_BUDGET / FIRESTORE_QUERY_BUDGET
+        per-request limits (0 disables a limit)
+    FIRESTORE_OPS_LOG=all     log a summary line for every request, not just flagged ones
+    FIRESTORE_OPS_STRICT=1    raise FirestoreBudgetExceeded for flagged requests (use in tests/CI)
+
+backend/tests/test_firestore_budget.py drives routes through TestClient with STRICT on
+(against the Firestore emulator), so a route that exceeds its budget fails the suite.
+"""
+import os
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from .metrics import RequestStats, counter, on_request_end, record_firestore_op, request_scope
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+READ_BUDGET = _env_int("FIRESTORE_READ_BUDGET", 100)
+WRITE_BUDGET = _env_int("FIRESTORE_WRITE_BUDGET", 25)
+QUERY_BUDGET = _env_int("FIRESTORE_QUERY_BUDGET", 5)
+LOG_ALL = os.getenv("FIRESTORE_OPS_LOG", "").strip().lower() == "all"
+STRICT = os.getenv("FIRESTORE_OPS_STRICT", "").strip().lower() in ("1", "true", "yes")
+
+FLAGGED_REQUESTS = counter("firestore_flagged_requests_total", "Requests over a Firestore budget or with repeated reads", ("route", "reason"))
+
+
+class FirestoreBudgetExceeded(Exception):
+    pass
+
+
+# ----- Client wrappers -----
+# Reads/writes are recorded when the call is made, so the same wrappers work for the
+# AsyncClient (the caller awaits the returned coroutine). Only query streaming differs.
+class _TrackedDocument:
+    def __init__(self, ref, asynchronous: bool = False):
+        self._ref = ref
+        self._async = asynchronous
+
+    @property
+    def path(self) -> str:
+        return self._ref.path
+
+    def collection(self, name: str) -> "_TrackedCollection":
+        cls = _TrackedAsyncCollection if self._async else _TrackedCollection
+        return cls(self._ref.collection(name))
+
+    def get(self, *args, **kwargs):
+        record_firestore_op("read", key=f"doc:{self._ref.path}")
+        return self._ref.get(*args, **kwargs)
+
+    def create(self, *args, **kwargs):
+        record_firestore_op("write")
+        return self._ref.create(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        record_firestore_op("write")
+        return self._ref.set(*args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        record_firestore_op("write")
+        return self._ref.update(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        record_firestore_op("write")
+        return self._ref.delete(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._ref, name)
+
+
+class _TrackedQuery:
+    _CHAINABLE = ("where", "order_by", "limit", "limit_to_last", "offset", "start_at", "start_after", "end_at", "end_before", "select")
+
+    def __init__(self, query, shape: str):
+        self._query = query
+        self._shape = shape
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._query, name)
+        if name not in self._CHAINABLE:
+            return attr
+
+        def chained(*args, **kwargs):
+            parts = [repr(a) for a in args] + [f"{k}={v!r}" for k, v in kwargs.items()]
+            return self._query_cls(attr(*args, **kwargs), f"{self._shape}|{name}({','.join(parts)})")
+        return chained
+
+    @property
+    def _query_cls(self):
+        return _TrackedQuery
+
+    def stream(self, *args, **kwargs) -> Iterator[Any]:
+        record_firestore_op("query", key=f"query:{self._shape}")
+        for snap in self._query.stream(*args, **kwargs):
+            record_firestore_op("read")
+            yield snap
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+
+class _TrackedAsyncQuery(_TrackedQuery):
+    @property
+    def _query_cls(self):
+        return _TrackedAsyncQuery
+
+    async def stream(self, *args, **kwargs) -> AsyncIterator[Any]:
+        record_firestore_op("query", key=f"query:{self._shape}")
+        async for snap in self._query.stream(*args, **kwargs):
+            record_firestore_op("read")
+            yield snap
+
+    async def get(self, *args, **kwargs):
+        return [snap async for snap in self.stream(*args, **kwargs)]
+
+
+class _TrackedCollection(_TrackedQuery):
+    _asynchronous = False
+
+    def __init__(self, ref):
+        super().__init__(ref, "/".join(ref._path))
+        self._ref = ref
+
+    def document(self, document_id: Optional[str] = None) -> _TrackedDocument:
+        ref = self._ref.document(document_id) if document_id is not None else self._ref.document()
+        return _TrackedDocument(ref, self._asynchronous)
+
+
+class _TrackedAsyncCollection(_TrackedAsyncQuery, _TrackedCollection):
+    _asynchronous = True
+
+
+class _TrackedBatch:
+    def __init__(self, batch):
+        self._batch = batch
+
+    def create(self, ref, *args, **kwargs):
+        record_firestore_op("write")
+        return self._batch.create(getattr(ref, "_ref", ref), *args, **kwargs)
+
+    def set(self, ref, *args, **kwargs):
+        record_firestore_op("write")
+        return self._batch.set(getattr(ref, "_ref", ref), *args, **kwargs)
+
+    def update(self, ref, *args, **kwargs):
+        record_firestore_op("write")
+        return self._batch.update(getattr(ref, "_ref", ref), *args, **kwargs)
+
+    def delete(self, ref, *args, **kwargs):
+        record_firestore_op("write")
+        return self._batch.delete(getattr(ref, "_ref", ref), *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._batch, name)
+
+
+class TrackedClient:
+    _collection_cls = _TrackedCollection
+
+    def __init__(self, client):
+        self._client = client
+
+    def collection(self, name: str) -> _TrackedCollection:
+        return self._collection_cls(self._client.collection(name))
+
+    def batch(self) -> _TrackedBatch:
+        return _TrackedBatch(self._client.batch())
+
+    def transaction(self, **kwargs) -> _TrackedBatch:
+        # Writes are counted as for batches; reads go through tracked documents' get(transaction=...)
+        return _TrackedBatch(self._client.transaction(**kwargs))
+
+    def get_all(self, references, *args, **kwargs):
+        # One batched call (pass transaction= to read inside a transaction); each document counts as a read
+        for ref in references:
+            record_firestore_op("read", key=f"doc:{ref.path}")
+        return self._client.get_all([getattr(ref, "_ref", ref) for ref in references], *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+class TrackedAsyncClient(TrackedClient):
+    _collection_cls = _TrackedAsyncCollection
+
+
+def track_client(client) -> TrackedClient:
+    return client if isinstance(client, TrackedClient) else TrackedClient(client)
+
+
+def track_async_client(client) -> TrackedAsyncClient:
+    return client if isinstance(client, TrackedAsyncClient) else TrackedAsyncClient(client)
+
+
+# ----- Per-request budget checks -----
+def summarize(stats: RequestStats) -> Dict[str, Any]:
+    return {
+        "route": stats.route,
+        "reads": stats.firestore.get("read", 0),
+        "writes": stats.firestore.get("write", 0),
+        "queries": stats.firestore.get("query", 0),
+        "duplicate_reads": {k: n for k, n in stats.firestore_reads.items() if n > 1},
+    }
+
+
+def check_budget(stats: RequestStats, reads: int = READ_BUDGET, writes: int = WRITE_BUDGET, queries: int = QUERY_BUDGET, allow_duplicate_reads: bool = False) -> list[str]:
+    """Return the reasons this request should be flagged (empty if within budget)."""
+    s = summarize(stats)
+    reasons = []
+    if reads and s["reads"] > reads:
+        reasons.append(f"reads>{reads}")
+    if writes and s["writes"] > writes:
+        reasons.append(f"writes>{writes}")
+    if queries and s["queries"] > queries:
+        reasons.append(f"queries>{queries}")
+    if s["duplicate_reads"] and not allow_duplicate_reads:
+        reasons.append("duplicate_reads")
+    return reasons
+
+
+def _format(summary: Dict[str, Any], reasons: list[str]) -> str:
+    dups = ", ".join(f"{k} x{n}" for k, n in summary["duplicate_reads"].items())
+    line = f"{summary['route']} reads={summary['reads']} writes={summary['writes']} queries={summary['queries']}"
+    if reasons:
+        line += f" flagged={','.join(reasons)}"
+    if dups:
+        line += f" repeated=[{dups}]"
+    return line
+
+
+@on_request_end
+def _report(stats: RequestStats):
+    if not stats.firestore:
+        return
+    # Budgets and STRICT are read per request, so tests can tighten them at runtime
+    reasons = check_budget(stats, READ_BUDGET, WRITE_BUDGET, QUERY_BUDGET)
+    if reasons:
+        for r in reasons:
+            FLAGGED_REQUESTS.inc(route=stats.route or "", reason=r.split(">")[0])
+        print(f"[WARN] Firestore ops {_format(summarize(stats), reasons)}")
+        if STRICT:
+            raise FirestoreBudgetExceeded(_format(summarize(stats), reasons))
+    elif LOG_ALL:
+        print(f"[INFO] Firestore ops {_format(summarize(stats), reasons)}")
+
+
+@contextmanager
+def firestore_budget(reads: int = 0, writes: int = 0, queries: int = 0, allow_duplicate_reads: bool = False):
+    """
+    Assert a Firestore budget around direct calls, e.g. in tests:
+
+        with firestore_budget(reads=2, queries=1):
+            db.get_latest_counselling_session(uid)
+    """
+    with request_scope("firestore_budget") as stats:
+        yield stats
+    reasons = check_budget(stats, reads, writes, queries, allow_duplicate_reads)
+    if reasons:
+        raise FirestoreBudgetExceeded(_format(summarize(stats), reasons))
@@ -0,0 +1,129 @@
+# app/hedging.py
+"""
+Hedged Gemini requests for latency-critical calls (llm._generate(hedge=True)).
+
+With LLM_HEDGE=1, a hedged call that has not returned after the function's
+observed p90 latency sends a second, identical request; whichever succeeds
+first is returned (the other finishes in the background and its tokens are
+still recorded). Hedges are capped by a global budget: at most
+LLM_HEDGE_BUDGET (default 5%) extra calls relative to hedgeable calls. p90 is
+taken over the last _WINDOW primary-call latencies per function and hedging
+starts once _MIN_SAMPLES have been seen.
+
+Reported as llm_hedges_total{function, result=sent|won|lost}; hedge rate is
+sent / llm_hedgeable_calls_total.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+from .metrics import counter
+
+T = TypeVar("T")
+
+LLM_HEDGE = os.getenv("LLM_HEDGE", "").strip().lower() in ("1", "true", "yes")
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.05"))
+_QUANTILE = 0.9
+_WINDOW = 200
+_MIN_SAMPLES = 20
+_MIN_DELAY = 0.25
+
+HEDGEABLE_CALLS = counter("llm_hedgeable_calls_total", "Gemini calls eligible for hedging", ("function",))
+HEDGES = counter("llm_hedges_total", "Hedged Gemini requests", ("function", "result"))
+
+
+class LatencyTracker:
+    def __init__(self, window: int = _WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, function: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(function, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, function: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(function) or ())
+        if len(samples) < _MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class HedgeBudget:
+    """Allows a hedge while hedges stay within `ratio` of calls; counts decay so old traffic stops counting."""
+
+    def __init__(self, ratio: float):
+        self.ratio = ratio
+        self._calls = 0.0
+        self._hedges = 0.0
+        self._lock = threading.Lock()
+
+    def note_call(self):
+        with self._lock:
+            self._calls += 1
+            if self._calls > 10_000:
+                self._calls /= 2
+                self._hedges /= 2
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._hedges + 1 > self.ratio * self._calls:
+                return False
+            self._hedges += 1
+            return True
+
+
+tracker = LatencyTracker()
+budget = HedgeBudget(LLM_HEDGE_BUDGET)
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_HEDGE_THREADS", "32")), thread_name_prefix="llm-hedge")
+
+
+def _submit(attempt: Callable[[float], T], timeout: float):
+    # Each attempt runs in its own copy of the caller's context (request stats, spans)
+    return _pool.submit(contextvars.copy_context().run, attempt, timeout)
+
+
+def call(function: str, attempt: Callable[[float], T], timeout: float) -> T:
+    """Run attempt(timeout) (one upstream request), hedging it with a second one past the p90 latency."""
+    start = time.monotonic()
+
+    def observe(fut=None):
+        if fut is None or fut.exception() is None:
+            tracker.observe(function, time.monotonic() - start)
+
+    if not LLM_HEDGE:
+        result = attempt(timeout)
+        observe()
+        return result
+
+    HEDGEABLE_CALLS.inc(function=function)
+    budget.note_call()
+    delay = tracker.quantile(function, _QUANTILE)
+    if delay is None or delay >= timeout:
+        result = attempt(timeout)
+        observe()
+        return result
+
+    primary = _submit(attempt, timeout)
+    primary.add_done_callback(observe)
+    done, _ = wait([primary], timeout=max(_MIN_DELAY, delay))
+    if done or not budget.try_acquire():
+        return primary.result()
+
+    HEDGES.inc(function=function, result="sent")
+    secondary = _submit(attempt, max(0.1, timeout - (time.monotonic() - start)))
+    pending = {primary, secondary}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            if fut.exception() is None:
+                HEDGES.inc(function=function, result="won" if fut is secondary else "lost")
+                return fut.result()
+            error = error or fut.exception()
+    raise error
@@ -0,0 +1,157 @@
+# app/idempotency.py
+"""
+Idempotency-Key support for mutating tutoring endpoints.
+
+A client that may retry sends `Idempotency-Key: <unique value>`. The first
+request with a key claims idempotency/{uid}:{sha256(key)} (Firestore create(),
+so only one request wins) and stores its JSON response there when it
+succeeds; a retry with the same key and body replays that response (with
+`Idempotent-Replayed: true`) without calling Gemini or writing again.
+
+- Same key while the first request is still running: 409.
+- Same key with a different endpoint or body: 422.
+- If the first request fails, its claim is released so a retry recomputes.
+- Records expire after IDEMPOTENCY_TTL_HOURS (expiresAt; enable a Firestore
+  TTL policy on idempotency.expiresAt to have them deleted). A claim whose
+  request died without finishing is taken over after IDEMPOTENCY_PENDING_TTL
+  seconds. Takeovers are compare-and-set (claim_idempotency_record): when
+  several retries find the same stale claim one wins, the others get 409.
+
+Usage:
+    idem: Idempotency = Depends(idempotency)
+    ...
+    replay = await idem.replay()
+    if replay is not None:
+        return replay
+    ...
+    return await idem.save(result)
+
+Requests without the header behave exactly as before.
+"""
+import datetime as dt
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from .auth import get_current_user
+from .db_async import (
+    claim_idempotency_record, create_idempotency_record, delete_idempotency_record,
+    get_idempotency_record, set_idempotency_record,
+)
+from .metrics import counter
+
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_PENDING_TTL = float(os.getenv("IDEMPOTENCY_PENDING_TTL", "120"))
+_MAX_KEY_LENGTH = 255
+
+IDEMPOTENT_REQUESTS = counter("idempotent_requests_total", "Requests carrying an Idempotency-Key", ("endpoint", "result"))
+
+
+def _now() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+def _as_datetime(value: Any) -> Optional[dt.datetime]:
+    if isinstance(value, dt.datetime):
+        return value if value.tzinfo else value.replace(tzinfo=dt.timezone.utc)
+    return None
+
+
+class Idempotency:
+    def __init__(self, uid: str, key: Optional[str], endpoint: str, request_hash: str):
+        self.uid = uid
+        self.key = key
+        self.endpoint = endpoint
+        self.request_hash = request_hash
+        self.record_id = f"{uid}:{hashlib.sha256(key.encode('utf-8')).hexdigest()[:40]}" if key else None
+        self._claimed = False
+
+    def _pending_body(self) -> dict:
+        now = _now()
+        return {
+            "uid": self.uid,
+            "endpoint": self.endpoint,
+            "request_hash": self.request_hash,
+            "status": "pending",
+            "claimedAt": now,
+            "expiresAt": now + dt.timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+            "createdAt": SERVER_TIMESTAMP,
+        }
+
+    async def replay(self) -> Optional[JSONResponse]:
+        """Claim the key, or return the stored response for a completed earlier request."""
+        if not self.key:
+            return None
+        if await create_idempotency_record(self.record_id, self._pending_body()):
+            self._claimed = True
+            IDEMPOTENT_REQUESTS.inc(endpoint=self.endpoint, result="first")
+            return None
+        stored = await get_idempotency_record(self.record_id)
+        record = stored or {}
+        now = _now()
+        expires = _as_datetime(record.get("expiresAt"))
+        expired = bool(expires and expires <= now)
+        if stored and not expired and (record.get("endpoint") != self.endpoint or record.get("request_hash") != self.request_hash):
+            IDEMPOTENT_REQUESTS.inc(endpoint=self.endpoint, result="mismatch")
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        claimed = _as_datetime(record.get("claimedAt"))
+        stale_claim = record.get("status") != "done" and (claimed is None or (now - claimed).total_seconds() > IDEMPOTENCY_PENDING_TTL)
+        if not stored or expired or stale_claim:
+            if not await claim_idempotency_record(self.record_id, self._pending_body(), expected=stored):
+                # Another retry took the key over first and is running now
+                IDEMPOTENT_REQUESTS.inc(endpoint=self.endpoint, result="in_progress")
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            self._claimed = True
+            IDEMPOTENT_REQUESTS.inc(endpoint=self.endpoint, result="first")
+            return None
+        if record.get("status") != "done":
+            IDEMPOTENT_REQUESTS.inc(endpoint=self.endpoint, result="in_progress")
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        IDEMPOTENT_REQUESTS.inc(endpoint=self.endpoint, result="replayed")
+        return JSONResponse(
+            content=json.loads(record.get("response") or "null"),
+            status_code=int(record.get("status_code") or 200),
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    async def save(self, result: Any, status_code: int = 200) -> Any:
+        """Store the response for replay and return it unchanged."""
+        if self._claimed:
+            await set_idempotency_record(self.record_id, {
+                "status": "done",
+                "status_code": status_code,
+                "response": json.dumps(result, default=str),
+                "completedAt": SERVER_TIMESTAMP,
+            }, merge=True)
+            self._claimed = False
+        return result
+
+    async def release(self):
+        """Drop an unfinished claim so the client can retry."""
+        if self._claimed:
+            self._claimed = False
+            try:
+                await delete_idempotency_record(self.record_id)
+            except Exception as e:
+                print(f"[WARN] Failed to release idempotency key {self.record_id}: {e}")
+
+
+async def idempotency(request: Request, user: dict = Depends(get_current_user)):
+    key = (request.headers.get("Idempotency-Key") or "").strip() or None
+    if key and len(key) > _MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {_MAX_KEY_LENGTH} characters")
+    body = await request.body() if key else b""
+    idem = Idempotency(user["uid"], key, request.url.path, hashlib.sha256(body).hexdigest())
+    try:
+        yield idem
+    except Exception:
+        await idem.release()
+        raise
+    else:
+        # Handler returned without save() (e.g. an early return); nothing to replay
+        await idem.release()
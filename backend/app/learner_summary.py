@@ -0,0 +1,81 @@
+# app/learner_summary.py
+"""
+Rolling learner summary per tutoring session (sessions/{id}.learner_summary).
+
+Every SUMMARY_REFRESH_EVERY graded answers, /evaluate-answer schedules
+refresh_learner_summary() in the background. It folds the latest graded turns
+from the session's recent_tail into the previous summary (weak topics and
+recurring mistakes via Gemini; score trend computed locally from
+history.scores). generate_next_question then sends this fixed-size summary
+instead of the raw Q/A text, so prompt size stays flat however verbose the
+learner's answers are.
+"""
+import asyncio
+import os
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from .db import recent_from_tail
+from .db_async import get_session, update_session
+from .llm import summarize_learner as llm_summarize_learner
+
+SUMMARY_REFRESH_EVERY = int(os.getenv("SUMMARY_REFRESH_EVERY", "5"))
+_TREND_WINDOW = 5
+
+
+def should_refresh(graded_count: int) -> bool:
+    return SUMMARY_REFRESH_EVERY > 0 and graded_count > 0 and graded_count % SUMMARY_REFRESH_EVERY == 0
+
+
+def score_trend(scores: list[float]) -> dict:
+    """Compare the mean of the last window of scores with the window before it."""
+    recent = scores[-_TREND_WINDOW:]
+    if not recent:
+        return {"score_trend": "unknown", "recent_avg": None}
+    recent_avg = sum(recent) / len(recent)
+    before = scores[-2 * _TREND_WINDOW:-_TREND_WINDOW]
+    if not before:
+        trend = "steady"
+    else:
+        delta = recent_avg - sum(before) / len(before)
+        trend = "improving" if delta > 0.1 else "declining" if delta < -0.1 else "steady"
+    return {"score_trend": trend, "recent_avg": round(recent_avg, 2)}
+
+
+def _scores(session: dict) -> list[float]:
+    out = []
+    for e in ((session.get("history") or {}).get("scores") or []):
+        try:
+            out.append(float(e.get("score")))
+        except Exception:
+            continue
+    return out
+
+
+async def refresh_learner_summary(session_id: str):
+    session = await get_session(session_id)
+    if not session:
+        return
+    previous = session.get("learner_summary") or {}
+    graded = [it for it in (recent_from_tail(session, 0) or []) if (it.get("evaluator_result") or {}).get("score") is not None]
+    try:
+        lists = await asyncio.to_thread(
+            llm_summarize_learner,
+            previous=previous,
+            interactions=graded[-SUMMARY_REFRESH_EVERY:],
+            domain=session.get("domain"),
+        )
+    except Exception as e:
+        print(f"[WARN] Learner summary refresh failed for {session_id}: {e}")
+        lists = {
+            "weak_topics": previous.get("weak_topics") or [],
+            "recurring_mistakes": previous.get("recurring_mistakes") or [],
+        }
+    scores = _scores(session)
+    summary = {
+        **lists,
+        **score_trend(scores),
+        "interactions_covered": len(scores),
+        "updatedAt": SERVER_TIMESTAMP,
+    }
+    await update_session(session_id, {"learner_summary": summary})
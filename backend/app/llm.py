@@ -1,6 +1,10 @@
 import os
-from typing import Dict, Any
+import threading
+from typing import Callable, Dict, Any
 from dotenv import load_dotenv
+from . import fake_llm, hedging, llm_cache, prompts
+from .llm_guard import LLM_CALLS, LLMUnavailable, breaker, deadline, is_timeout, is_upstream_failure
+from .metrics import instrumented, record_llm_usage
 
 # Load env for local dev
 load_dotenv()
@@ -14,20 +18,135 @@ except ImportError as e:
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
 DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+_JSON_OUTPUT = {"response_mime_type": "application/json"}
+# generate_next_question's answer when the model output is not JSON (never banked)
+FALLBACK_QUESTION = "Describe your approach to the last problem and correct any mistakes."
 
 class LLMNotConfigured(Exception):
     pass
 
 
-def _get_model():
+def _record_usage(function: str, completion, estimated_prompt_tokens: int | None = None) -> None:
+    usage = getattr(completion, "usage_metadata", None)
+    if usage is None:
+        record_llm_usage(function, estimated_prompt_tokens, None)
+        return
+    record_llm_usage(
+        function,
+        getattr(usage, "prompt_token_count", None) or estimated_prompt_tokens,
+        getattr(usage, "candidates_token_count", None),
+    )
+
+
+# One GenerativeModel per system instruction, built on first use (LLM_BACKEND=fake|replay: see app/fake_llm.py)
+_models: Dict[str | None, Any] = {}
+_models_lock = threading.Lock()
+
+
+def _get_model(system_instruction: str | None = None):
+    if fake_llm.is_enabled():
+        return fake_llm.FakeModel(system_instruction)
     if genai is None:
         raise LLMNotConfigured("google-generativeai is not installed. Add it to requirements.txt")
     if not GOOGLE_API_KEY:
         raise LLMNotConfigured("GOOGLE_API_KEY (or GEMINI_API_KEY) is not set in environment")
-    genai.configure(api_key=GOOGLE_API_KEY)
-    return genai.GenerativeModel(DEFAULT_MODEL)
-
+    model = _models.get(system_instruction)
+    if model is None:
+        with _models_lock:
+            model = _models.get(system_instruction)
+            if model is None:
+                if not _models:
+                    genai.configure(api_key=GOOGLE_API_KEY)
+                model = genai.GenerativeModel(DEFAULT_MODEL, system_instruction=system_instruction)
+                if fake_llm.LLM_RECORD_PATH:
+                    model = fake_llm.RecordingModel(model, system_instruction)
+                _models[system_instruction] = model
+    return model
+
+
+class _CachedCompletion:
+    """Stands in for a GenerateContentResponse served from llm_cache (no candidates or usage)."""
+    candidates = None
+    usage_metadata = None
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+def _generate(
+    function: str,
+    system_instruction: str,
+    prompt: str,
+    generation_config: dict | None = None,
+    cache_if: Callable[[str], bool] | None = None,
+    hedge: bool = False,
+    refresh_cache: bool = False,
+):
+    """
+    Single Gemini call path: cached model for the static instruction, token usage recorded per call,
+    per-function deadline and circuit breaker (app/llm_guard.py; failures raise LLMUnavailable).
+    Passing cache_if marks the call cacheable: responses are served from / stored in llm_cache,
+    and a fresh response is stored only when cache_if(text) is true. refresh_cache=True skips the
+    lookup but still stores, so an explicit regenerate replaces the cached response.
+    hedge=True sends a second identical request if the first is slower than p90 (app/hedging.py).
+    """
+    key = None
+    if cache_if is not None:
+        key = llm_cache.make_key(DEFAULT_MODEL, system_instruction, generation_config, prompt)
+        hit = None if refresh_cache else llm_cache.get(function, key)
+        if hit is not None:
+            return _CachedCompletion(hit)
+    model = _get_model(system_instruction)
+    if not breaker.allow():
+        LLM_CALLS.inc(function=function, outcome="rejected")
+        raise LLMUnavailable("Gemini circuit breaker is open", retry_after=breaker.retry_after())
+    estimated_tokens = prompts.estimate_tokens(system_instruction) + prompts.estimate_tokens(prompt)
+
+    def attempt(timeout: float):
+        completion = model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options={"timeout": timeout},
+        )
+        _record_usage(function, completion, estimated_tokens)
+        return completion
 
+    try:
+        if hedge:
+            completion = hedging.call(function, attempt, deadline(function))
+        else:
+            completion = attempt(deadline(function))
+    except Exception as e:
+        if not is_upstream_failure(e):
+            breaker.release_probe()
+            LLM_CALLS.inc(function=function, outcome="error")
+            raise
+        breaker.failure()
+        LLM_CALLS.inc(function=function, outcome="timeout" if is_timeout(e) else "unavailable")
+        raise LLMUnavailable(f"Gemini call {function} failed: {e}", retry_after=breaker.retry_after() or 1.0) from e
+    breaker.success()
+    LLM_CALLS.inc(function=function, outcome="ok")
+    if key is not None:
+        text = _text(completion)
+        if text and cache_if(text):
+            llm_cache.put(key, text)
+    return completion
+
+
+def _text(completion, default: str = "") -> str:
+    return completion.text.strip() if completion and completion.text else default
+
+
+def _unfence(text: str) -> str:
+    """Drop a surrounding ```json ... ``` fence, which models add around JSON output."""
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+
+@instrumented("llm")
 def evaluate_answer(
     *,
     question_text: str,
@@ -40,14 +159,6 @@ def evaluate_answer(
     Calls Gemini to evaluate a user's answer against a question.
     Returns a dict with keys: score (0..1), feedback (str), understood_concept (bool)
     """
-    model = _get_model()
-
-    system_instruction = (
-        "You are an educational evaluator. Given a question and a student's answer, "
-        "analyze correctness, provide concise constructive feedback, and decide whether the student "
-        "has understood the core concept. Output valid JSON only with keys: score (0..1), feedback (string), understood_concept (boolean)."
-    )
-
     meta = []
     if difficulty is not None:
         meta.append(f"difficulty: {difficulty}")
@@ -57,31 +168,21 @@ def evaluate_answer(
         meta.append(f"topic: {topic}")
     meta_str = ", ".join(meta)
 
-    prompt = f"""
-{system_instruction}
-
-Context: {meta_str}
+    prompt = f"""Context: {meta_str}
 
 Question:
-{question_text}
+{prompts.fit("evaluate_answer", "question", question_text)}
 
 Student Answer:
-{user_answer}
-
-Respond with JSON only, like:
-{{
-  "score": 0.85,
-  "feedback": "Your steps are correct; minor arithmetic slip in the last step.",
-  "understood_concept": true
-}}
+{prompts.fit("evaluate_answer", "answer", user_answer)}
 """
 
     generation_config = {
         "max_output_tokens": 1024,
         "temperature": 0.1,
     }
-    completion = model.generate_content(prompt, generation_config=generation_config)
-    text = completion.text.strip() if completion and completion.text else "{}"
+    completion = _generate("evaluate_answer", prompts.EVALUATOR, prompt, generation_config, hedge=True)
+    text = _text(completion, "{}")
 
     # Attempt to parse JSON result
     import json
@@ -107,6 +208,7 @@ Respond with JSON only, like:
         }
 
 
+@instrumented("llm")
 def generate_next_question(
     *,
     domain: str,
@@ -116,65 +218,33 @@ def generate_next_question(
     history: list[dict] | None,
     last_feedback: str | None,
     last_answer: str | None = None,
+    learner_summary: dict | None = None,
 ) -> Dict[str, Any]:
     """
     Ask Gemini to generate the next question tailored to the learner.
+    When the session has a learner_summary (see app/learner_summary.py) it replaces the raw
+    Q/A history in the prompt, and only short recent question stems are kept to avoid repeats.
     Enforce structured JSON output with one of the two shapes:
     - {"question": str, "options": [str, ...], "answer_index": int, "difficulty": int, "hint": str}
     - {"question": str, "expected_answer": str, "difficulty": int, "hint": str}
     """
-    model = _get_model()
-
-    sys_inst = (
-        "You are a tutoring question generator. Using the provided context and learner state, "
-        "generate the NEXT question that is pedagogically sound and appropriately difficult. "
-        "Use the learner's mistakes to craft helpful hints. "
-        "Respond with strict JSON only."
-    )
-
-    hist_snippets = []
-    if history:
-        for h in history[-5:]:  # include last few interactions
-            q = h.get("question_text") or h.get("question") or ""
-            a = h.get("answer_text") or ""
-            s = h.get("score")
-            hist_snippets.append(f"Q: {q}\nA: {a}\nscore: {s}")
-    hist_block = "\n\n".join(hist_snippets)
+    hist_block = _history_block("generate_next_question", history, learner_summary)
 
-    prompt = f"""
-{sys_inst}
-
-Domain: {domain}
+    prompt = f"""Domain: {domain}
 Topic: {topic or 'general'}
 Current difficulty level (1..5): {difficulty}
 Learner proficiency (0..1): {proficiency}
-Last feedback: {last_feedback or 'n/a'}
-Last answer summary: { (last_answer[:500] if last_answer else 'n/a') }
+Last feedback: {prompts.fit("generate_next_question", "last_feedback", last_feedback) or 'n/a'}
+Last answer summary: {prompts.fit("generate_next_question", "last_answer", last_answer) or 'n/a'}
 
 Recent history (most recent last):
 {hist_block}
 
-Output JSON ONLY. Choose ONE of the two formats:
-MCQ format:
-{{
-  "question": "...",
-  "options": ["...", "...", "...", "..."],
-  "answer_index": 1,
-  "difficulty": {difficulty},
-  "hint": "..."  // optional
-}}
-
-Open-ended format:
-{{
-  "question": "...",
-  "expected_answer": "...",
-  "difficulty": {difficulty},
-  "hint": "..."  // optional
-}}
+Use "difficulty": {difficulty} in the JSON.
 """
 
-    completion = model.generate_content(prompt)
-    out = completion.text.strip() if completion and completion.text else "{}"
+    completion = _generate("generate_next_question", prompts.QUESTION_GENERATOR, prompt, hedge=True)
+    out = _text(completion, "{}")
     import json
     try:
         data = json.loads(out)
@@ -184,43 +254,186 @@ Open-ended format:
     except Exception:
         # fallback minimal question
         return {
-            "question": "Describe your approach to the last problem and correct any mistakes.",
+            "question": FALLBACK_QUESTION,
             "expected_answer": "A brief explanation focusing on the core concept.",
             "difficulty": difficulty,
             "hint": last_feedback or "Review the previous feedback.",
             "raw_text": out,
+            "fallback": True,
+        }
+
+
+def _history_block(profile: str, history: list[dict] | None, learner_summary: dict | None) -> str:
+    """Learner state for question generation: the learner summary plus recent question stems when
+    the session has one, otherwise the raw Q/A history; fitted to the profile's history budget."""
+    hist_snippets = []
+    if learner_summary:
+        hist_snippets.append(_format_learner_summary(learner_summary))
+        stems = [prompts.truncate(h.get("question_text") or h.get("question") or "", 30) for h in (history or [])]
+        stems = [q for q in stems if q]
+        if stems:
+            hist_snippets.append("Recently asked (do not repeat):\n" + "\n".join(f"- {q}" for q in stems))
+    elif history:
+        for h in history:
+            q = h.get("question_text") or h.get("question") or ""
+            a = h.get("answer_text") or ""
+            s = h.get("score")
+            hist_snippets.append(f"Q: {q}\nA: {a}\nscore: {s}")
+    return "\n\n".join(prompts.fit_recent(profile, "history", hist_snippets))
+
+
+def _format_learner_summary(summary: dict) -> str:
+    weak = ", ".join(str(t) for t in (summary.get("weak_topics") or [])[:5]) or "none identified"
+    mistakes = "; ".join(str(m) for m in (summary.get("recurring_mistakes") or [])[:5]) or "none identified"
+    return (
+        f"Learner summary ({summary.get('interactions_covered', 0)} graded answers): "
+        f"score trend {summary.get('score_trend', 'unknown')}, recent average {summary.get('recent_avg', 'n/a')}.\n"
+        f"Weak topics: {weak}\nRecurring mistakes: {mistakes}"
+    )
+
+
+@instrumented("llm")
+def summarize_learner(*, previous: dict | None, interactions: list[dict], domain: str | None = None) -> Dict[str, Any]:
+    """
+    Fold recent graded interactions into a compact learner summary.
+    Returns {"weak_topics": [str], "recurring_mistakes": [str]} (at most 5 each).
+    """
+    lines = []
+    for it in interactions:
+        ev = it.get("evaluator_result") or {}
+        q = prompts.truncate(it.get("question_text"), 75)
+        fb = prompts.truncate(ev.get("feedback"), 75)
+        lines.append(f"- Q: {q} | score: {ev.get('score')} | feedback: {fb}")
+    lines = prompts.fit_recent("summarize_learner", "interactions", lines)
+    prev = previous or {}
+    prompt = f"""Domain: {domain or 'general'}
+Previous weak topics: {prev.get('weak_topics') or []}
+Previous recurring mistakes: {prev.get('recurring_mistakes') or []}
+
+New graded interactions:
+{chr(10).join(lines) or '- none'}
+"""
+    generation_config = {"max_output_tokens": 256, "temperature": 0.1}
+    completion = _generate("summarize_learner", prompts.LEARNER_SUMMARIZER, prompt, generation_config)
+    text = _text(completion, "{}")
+    import json
+    try:
+        data = json.loads(text)
+        return {
+            "weak_topics": [str(x) for x in (data.get("weak_topics") or [])][:5],
+            "recurring_mistakes": [str(x) for x in (data.get("recurring_mistakes") or [])][:5],
+        }
+    except Exception:
+        return {
+            "weak_topics": list(prev.get("weak_topics") or []),
+            "recurring_mistakes": list(prev.get("recurring_mistakes") or []),
         }
 
 
+@instrumented("llm")
+def summarize_counselling(*, previous_summary: str | None, turns: list[dict]) -> str:
+    """
+    Fold older counselling turns into the conversation's running summary.
+    Returns plain text (under ~150 words); falls back to the previous summary on empty output.
+    """
+    lines = [f"{t.get('sender', 'unknown')}: {t.get('content') or ''}" for t in turns]
+    lines = prompts.fit_recent("summarize_counselling", "turns", lines)
+    prompt = f"""Previous summary: {prompts.fit("summarize_counselling", "summary", previous_summary) or 'none'}
+
+New turns:
+{chr(10).join(lines) or 'none'}
+"""
+    generation_config = {"max_output_tokens": 384, "temperature": 0.1}
+    completion = _generate("summarize_counselling", prompts.COUNSELLING_SUMMARIZER, prompt, generation_config)
+    return _text(completion) or (previous_summary or "")
+
+
+@instrumented("llm")
 def answer_question(*, query: str, context: str | None = None, domain: str | None = None, topic: str | None = None) -> Dict[str, Any]:
     """
     General-purpose Q&A using Gemini. Returns a dict with 'answer' (string) and 'raw' metadata.
     """
-    model = _get_model()
-    sys_inst = (
-        "You are a helpful, precise tutor. Provide a clear, concise answer."
-    )
     prefix = []
     if domain:
         prefix.append(f"Domain: {domain}")
     if topic:
         prefix.append(f"Topic: {topic}")
     if context:
-        prefix.append(f"Context: {context}")
+        prefix.append(f"Context: {prompts.fit('answer_question', 'context', context)}")
     header = "\n".join(prefix)
 
-    prompt = f"""
-{sys_inst}
-{header}
+    prompt = f"""{header}
 
 Question:
-{query}
+{prompts.fit("answer_question", "query", query)}
 """
-    completion = model.generate_content(prompt)
-    answer_text = completion.text.strip() if completion and completion.text else ""
+    completion = _generate("answer_question", prompts.TUTOR, prompt, cache_if=bool)
+    answer_text = _text(completion)
     return {"answer": answer_text, "raw": getattr(completion, "candidates", None)}
 
 
+@instrumented("llm")
+def answer_with_followup(
+    *,
+    query: str,
+    domain: str | None,
+    topic: str | None,
+    difficulty: int,
+    proficiency: float,
+    history: list[dict] | None,
+    learner_summary: dict | None = None,
+) -> Dict[str, Any]:
+    """
+    Answer a learner's question and generate the follow-up question in one Gemini call
+    (/ask-followup), instead of answer_question followed by generate_next_question.
+    Returns {"answer": str, "followup": dict | None}; followup has the generate_next_question
+    shape, or is None when the output had no usable question (the caller then generates one).
+    """
+    hist_block = _history_block("answer_with_followup", history, learner_summary)
+    prompt = f"""Domain: {domain or 'general'}
+Topic: {topic or 'general'}
+Current difficulty level (1..5): {difficulty}
+Learner proficiency (0..1): {proficiency}
+
+Recent history (most recent last):
+{hist_block or 'none'}
+
+Learner question:
+{prompts.fit("answer_with_followup", "query", query)}
+
+Use "difficulty": {difficulty} in the follow-up JSON.
+"""
+    completion = _generate("answer_with_followup", prompts.TUTOR_WITH_FOLLOWUP, prompt, generation_config=_JSON_OUTPUT)
+    text = _unfence(_text(completion, "{}"))
+    import json
+    try:
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError("answer_with_followup output is not a JSON object")
+    except Exception:
+        # Not JSON: no answer, so the caller falls back to answer_question and generate_next_question
+        return {"answer": "", "followup": None}
+    answer = str(data.get("answer") or "").strip()
+    followup = data.get("followup")
+    if not isinstance(followup, dict) or not str(followup.get("question") or "").strip():
+        followup = None
+    else:
+        try:
+            followup["difficulty"] = int(followup.get("difficulty", difficulty))
+        except (TypeError, ValueError):
+            followup["difficulty"] = difficulty
+    return {"answer": answer, "followup": followup}
+
+
+def _has_careers(text: str) -> bool:
+    import json
+    try:
+        return bool(json.loads(text).get("careers"))
+    except Exception:
+        return False
+
+
+@instrumented("llm")
 def generate_career_paths(
     *,
     interests: list[str] | None,
@@ -228,9 +441,11 @@ def generate_career_paths(
     personality_traits: list[str] | None,
     chosen_domain: str | None,
     difficulty_preference: str | None,
+    refresh: bool = False,
 ) -> Dict[str, Any]:
     """
     Ask Gemini to return JSON with an array of career options based on user counselling context.
+    refresh=True bypasses the response cache (and replaces the cached entry).
     Output JSON shape:
     {
       "careers": [
@@ -245,45 +460,15 @@ def generate_career_paths(
       ]
     }
     """
-    model = _get_model()
-    sys_inst = (
-        "You are an AI career advisor. Return STRICT JSON only."
-    )
-    prompt = f"""
-{sys_inst}
-
-User profile:
+    profile = f"""User profile:
 - Interests: {interests or []}
 - Preferred skills: {preferred_skills or []}
 - Chosen domain: {chosen_domain or 'unspecified'}
 - Difficulty preference: {difficulty_preference or 'unspecified'}
-
-Task:
-Based on the profile and current job market trends, suggest suitable career paths.
-For each career, include:
-- title
-- why_fit
-- required_skills (array)
-- learning_roadmap (array of short actionable steps)
-- future_growth
-- related_roles (array)
-
-Return JSON ONLY:
-{{
-  "careers": [
-    {{
-      "title": "...",
-      "why_fit": "...",
-      "required_skills": ["..."],
-      "learning_roadmap": ["...", "..."],
-      "future_growth": "...",
-      "related_roles": ["...", "..."]
-    }}
-  ]
-}}
 """
-    completion = model.generate_content(prompt)
-    text = completion.text.strip() if completion and completion.text else "{}"
+    prompt = prompts.fit("generate_career_paths", "profile", profile)
+    completion = _generate("generate_career_paths", prompts.CAREER_ADVISOR, prompt, cache_if=_has_careers, refresh_cache=refresh)
+    text = _text(completion, "{}")
     import json
     try:
         data = json.loads(text)
@@ -297,19 +482,21 @@ Return JSON ONLY:
         }
 
 
+@instrumented("llm")
 def counselling_response(
     *,
     user_message: str,
     conversation_history: list = None,
     user_profile: dict = None,
     session_context: dict = None,
+    conversation_summary: str | None = None,
+    max_history: int = 5,
 ) -> Dict[str, Any]:
     """
     Adaptive counselling assistant that provides supportive responses and generates
     relevant follow-up questions. Returns JSON with 'answer' and 'follow_up_question' fields.
+    conversation_summary (server-side compacted memory) covers turns older than conversation_history.
     """
-    model = _get_model()
-    
     # Build context from user profile
     profile_context = ""
     if user_profile:
@@ -323,8 +510,8 @@ def counselling_response(
         if user_profile.get("stream_of_interest"):
             profile_parts.append(f"Stream of Interest: {user_profile['stream_of_interest']}")
         if profile_parts:
-            profile_context = f"User Profile: {', '.join(profile_parts)}\n"
-    
+            profile_context = prompts.fit("counselling_response", "profile", f"User Profile: {', '.join(profile_parts)}") + "\n"
+
     # Build session context
     session_info = ""
     if session_context:
@@ -339,55 +526,33 @@ def counselling_response(
             session_parts.append(f"Proficiency: {session_context['proficiency']}")
         if session_parts:
             session_info = f"Session Context: {', '.join(session_parts)}\n"
-    
-    # Build conversation history
+
+    # Build conversation history (newest turns first within the history budget)
     history_text = ""
+    if conversation_summary:
+        history_text = f"Conversation so far (summary): {prompts.fit('counselling_response', 'summary', conversation_summary)}\n"
     if conversation_history:
-        history_parts = []
-        for i, msg in enumerate(conversation_history[-5:]):  # Last 5 messages
-            sender = msg.get("sender", "unknown")
-            content = msg.get("content", "")
-            history_parts.append(f"{sender}: {content}")
+        history_parts = [
+            f"{msg.get('sender', 'unknown')}: {msg.get('content', '')}"
+            for msg in conversation_history[-max_history:]
+        ]
+        history_parts = prompts.fit_recent("counselling_response", "history", history_parts)
         if history_parts:
-            history_text = f"Recent Conversation:\n" + "\n".join(history_parts) + "\n"
-    
-    system_instruction = """
-You are an adaptive counselling assistant specializing in career guidance and personal development. Your role is to:
-
-1. Provide clear, supportive, and detailed answers to the user's questions or concerns
-2. Structure your reply as:
-   - 1-2 short introductory paragraphs
-   - 3-7 concise bullet points (use bullets, not dashes or numbers)
-   - 1 unique, context-aware follow-up question (never generic)
-3. Never use JSON, code blocks, or any markup—output only plain text suitable for direct display in a chat UI.
-4. Maintain a professional yet empathetic counselling tone
-5. Guide the user step-by-step toward deeper understanding
-
-Important guidelines:
-- Be empathetic and non-judgmental
-- Ask open-ended questions that encourage self-reflection
-- Build on previous conversation context
-- Focus on career guidance, personal development, and educational pathways
-- Keep responses conversational yet professional
-- Aim for a thorough response (8-12 sentences + bullets) with concrete, actionable suggestions where appropriate
-- Do NOT use any generic or repeated follow-up questions. Every follow-up must be tailored to the user's message and your answer, and always appear as the last paragraph prefixed with 'Next step:'
-"""
+            history_text += f"Recent Conversation:\n" + "\n".join(history_parts) + "\n"
 
     generation_config = {
         "max_output_tokens": 1536,
         "temperature": 0.45,
     }
-    prompt = f"""{system_instruction}
-
-{profile_context}{session_info}{history_text}User's current message: {user_message}
+    prompt = f"""{profile_context}{session_info}{history_text}User's current message: {prompts.fit("counselling_response", "message", user_message)}
 
-Reply in plain text ONLY (no JSON, no code blocks). Use:
+Use:
 - 1-2 short introductory paragraphs
 - 3-7 concise bullet points (use bullets, not dashes or numbers)
 - End with a unique, context-aware follow-up question as the last paragraph, prefixed with 'Next step:'
 """
-    completion = model.generate_content(prompt, generation_config=generation_config)
-    response_text = completion.text.strip() if completion and completion.text else ""
+    completion = _generate("counselling_response", prompts.COUNSELLOR, prompt, generation_config)
+    response_text = _text(completion)
     return {
         "answer": response_text,
         "raw": response_text
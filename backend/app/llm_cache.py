@@ -0,0 +1,118 @@
+# app/llm_cache.py
+"""
+Exact-match response cache for cacheable Gemini calls (see llm._generate).
+
+Keys hash (model, system instruction, generation config, normalized prompt),
+so any change to the model, the instruction text or sampling settings misses.
+Two tiers: a per-worker LRU (LLM_CACHE_SIZE entries) and, when REDIS_URL is set
+and the redis package is installed, a shared Redis tier. Both expire entries
+after LLM_CACHE_TTL seconds. Redis errors degrade to a miss.
+
+Per-function lookups are counted in llm_cache_requests_total{function, result}
+with result hit_memory | hit_redis | miss.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .metrics import counter
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))
+_KEY_PREFIX = "llm:v1:"
+
+CACHE_REQUESTS = counter("llm_cache_requests_total", "LLM response cache lookups", ("function", "result"))
+
+# Optional Redis tier
+try:
+    import redis  # type: ignore
+    REDIS_URL = os.getenv("REDIS_URL")
+    _redis = redis.from_url(REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.2) if REDIS_URL else None
+except Exception:
+    _redis = None
+
+
+def normalize(text: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share an entry."""
+    return " ".join(str(text or "").split()).casefold()
+
+
+def make_key(model: str, system_instruction: str | None, generation_config: dict | None, prompt: str) -> str:
+    material = json.dumps(
+        [model, system_instruction or "", generation_config or {}, normalize(prompt)],
+        sort_keys=True,
+        default=str,
+    )
+    return _KEY_PREFIX + hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class _LRU:
+    def __init__(self, size: int, ttl: int):
+        self.size = size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            if hit[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return hit[1]
+
+    def set(self, key: str, value: str):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_memory = _LRU(LLM_CACHE_SIZE, LLM_CACHE_TTL)
+
+
+def get(function: str, key: str) -> Optional[str]:
+    text = _memory.get(key)
+    if text is not None:
+        CACHE_REQUESTS.inc(function=function, result="hit_memory")
+        return text
+    if _redis is not None:
+        try:
+            data = _redis.get(key)
+        except Exception:
+            data = None
+        if data:
+            text = data.decode("utf-8") if isinstance(data, bytes) else str(data)
+            _memory.set(key, text)
+            CACHE_REQUESTS.inc(function=function, result="hit_redis")
+            return text
+    CACHE_REQUESTS.inc(function=function, result="miss")
+    return None
+
+
+def put(key: str, text: str):
+    _memory.set(key, text)
+    if _redis is not None:
+        try:
+            _redis.setex(key, LLM_CACHE_TTL, text)
+        except Exception:
+            pass
+
+
+def clear():
+    """Drop the in-process tier (Redis entries expire on their own)."""
+    _memory.clear()
@@ -0,0 +1,126 @@
+# app/llm_guard.py
+"""
+Deadlines and a circuit breaker for Gemini calls (used by llm._generate).
+
+Every call gets a per-function deadline (DEADLINES, scaled by
+LLM_DEADLINE_SCALE) passed to the SDK as its request timeout, so a stuck call
+fails at the deadline instead of the SDK's own much longer timeout and the
+worker thread is released.
+
+The breaker opens after LLM_BREAKER_FAILURES consecutive upstream failures
+(timeouts, 5xx, 429, connection errors). While open, calls fail immediately
+with LLMUnavailable; after LLM_BREAKER_COOLDOWN seconds one probe call is let
+through and its outcome closes or re-opens the breaker. Route handlers catch
+LLMUnavailable and serve their fallback (stored career paths, local MCQ
+grading, canned counselling text) or a 503 with Retry-After.
+"""
+import os
+import threading
+import time
+
+from .metrics import counter, gauge
+
+try:
+    from google.api_core import exceptions as gexc
+except ImportError:
+    gexc = None
+
+DEADLINES = {
+    "evaluate_answer": 8.0,
+    "generate_next_question": 10.0,
+    "answer_question": 12.0,
+    "answer_with_followup": 15.0,
+    "counselling_response": 15.0,
+    "generate_career_paths": 20.0,
+    "summarize_learner": 20.0,
+    "summarize_counselling": 20.0,
+}
+_DEFAULT_DEADLINE = 15.0
+_SCALE = float(os.getenv("LLM_DEADLINE_SCALE", "1"))
+
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+LLM_CALLS = counter("llm_calls_total", "Gemini calls by outcome", ("function", "outcome"))
+BREAKER_STATE = gauge("llm_breaker_open", "1 while the Gemini circuit breaker is open or probing")
+
+
+class LLMUnavailable(Exception):
+    """Gemini failed, timed out, or the breaker is open. retry_after is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: float = LLM_BREAKER_COOLDOWN):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def deadline(function: str) -> float:
+    return DEADLINES.get(function, _DEFAULT_DEADLINE) * _SCALE
+
+
+def is_timeout(exc: Exception) -> bool:
+    if isinstance(exc, TimeoutError) or (gexc is not None and isinstance(exc, gexc.DeadlineExceeded)):
+        return True
+    return "timeout" in type(exc).__name__.lower()
+
+
+def is_upstream_failure(exc: Exception) -> bool:
+    """True for failures that say Gemini is unhealthy, as opposed to a bad request from us."""
+    if is_timeout(exc) or isinstance(exc, ConnectionError):
+        return True
+    if gexc is not None:
+        if isinstance(exc, (gexc.ServerError, gexc.TooManyRequests, gexc.ResourceExhausted, gexc.RetryError)):
+            return True
+        if isinstance(exc, gexc.GoogleAPICallError):
+            return False
+    return "timed out" in str(exc).lower()
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._consecutive = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._probing = True
+            return True
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(1.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+        BREAKER_STATE.set(0)
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or (self.failures > 0 and self._consecutive >= self.failures):
+                if self._opened_at is None or self._probing:
+                    print(f"[WARN] Gemini circuit breaker open after {self._consecutive} consecutive failures")
+                self._opened_at = time.monotonic()
+            self._probing = False
+            is_open = self._opened_at is not None
+        BREAKER_STATE.set(1 if is_open else 0)
+
+    def release_probe(self):
+        """The probe ended without an upstream verdict (e.g. a bad request); let another one through."""
+        with self._lock:
+            self._probing = False
+
+
+breaker = CircuitBreaker()
@@ -0,0 +1,149 @@
+# app/loop_monitor.py
+"""
+Event-loop lag and blocking-call detector (opt-in: LOOP_MONITOR=1).
+
+A heartbeat task on the loop wakes every LOOP_MONITOR_INTERVAL seconds and
+records how late it fired (event_loop_lag_seconds). A watchdog thread checks
+the heartbeat; once the loop has been stuck for LOOP_BLOCK_THRESHOLD_MS it
+samples the loop thread's stack (sys._current_frames) and attributes the
+block to the route of the task that was running (metrics.route_for_task, or
+"background:<task name>") and to the innermost frame in app code, e.g.
+"app/db.py:212 get_session". When the loop recovers the block is:
+
+- counted in event_loop_blocks_total{route, site} and
+  event_loop_blocked_seconds_total{route, site};
+- logged as [WARN] with the sampled stack (the full stack once per site);
+- kept in recent_blocks() so tests and bench/api_bench.py can fail a run that
+  introduces a blocking call (reset(), then check recent_blocks()).
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, List, Optional, Set
+
+from .metrics import LATENCY_BUCKETS, counter, histogram, route_for_task
+
+LOOP_MONITOR = os.getenv("LOOP_MONITOR", "").strip().lower() in ("1", "true", "yes")
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.05"))
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+_MAX_BLOCKS = 500
+_STACK_DEPTH = 25
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOOP_LAG = histogram("event_loop_lag_seconds", "How late the loop monitor heartbeat fired", (), (0.001,) + LATENCY_BUCKETS)
+LOOP_BLOCKS = counter("event_loop_blocks_total", "Times the event loop was blocked past the threshold", ("route", "site"))
+LOOP_BLOCKED_SECONDS = counter("event_loop_blocked_seconds_total", "Time the event loop spent blocked past the threshold", ("route", "site"))
+
+
+def _call_site(frames: List[traceback.FrameSummary]) -> str:
+    """Innermost frame in app code (where the blocking call was made), else the innermost frame."""
+    for fs in reversed(frames):
+        if fs.filename.startswith(_APP_DIR) and not fs.filename.endswith("loop_monitor.py"):
+            return f"app/{os.path.relpath(fs.filename, _APP_DIR)}:{fs.lineno} {fs.name}"
+    if frames:
+        fs = frames[-1]
+        return f"{os.path.basename(fs.filename)}:{fs.lineno} {fs.name}"
+    return "unknown"
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, threshold_ms: float = LOOP_BLOCK_THRESHOLD_MS):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._beat = 0.0
+        self._sample: Optional[dict] = None  # stack sampled during the current block
+        self._blocks: Deque[dict] = deque(maxlen=_MAX_BLOCKS)
+        self._logged_sites: Set[str] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat is not None and not self._heartbeat.done()
+
+    def start(self):
+        """Start monitoring the running loop (call from a startup hook)."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat = self._loop.create_task(self._run_heartbeat(), name="loop_monitor_heartbeat")
+        self._watchdog = threading.Thread(target=self._run_watchdog, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        print(f"[INFO] Event loop monitor started (threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    def reset(self):
+        with self._lock:
+            self._blocks.clear()
+
+    def recent_blocks(self) -> List[dict]:
+        """Blocks seen since start/reset(), oldest first: {route, site, blocked_ms, stack, at}."""
+        with self._lock:
+            return list(self._blocks)
+
+    async def _run_heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            LOOP_LAG.observe(lag)
+            with self._lock:
+                self._beat = now
+                sample, self._sample = self._sample, None
+            if lag >= self.threshold:
+                self._record(lag, sample)
+
+    def _run_watchdog(self):
+        poll = max(0.005, min(self.interval, self.threshold) / 4)
+        while not self._stop.wait(poll):
+            with self._lock:
+                stuck = time.monotonic() - self._beat - self.interval
+                if stuck < self.threshold or self._sample is not None:
+                    continue
+                self._sample = self._take_sample()
+
+    def _take_sample(self) -> dict:
+        frame = sys._current_frames().get(self._loop_thread)
+        frames = traceback.extract_stack(frame, limit=_STACK_DEPTH) if frame is not None else []
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        route = route_for_task(task)
+        if route is None:
+            route = f"background:{task.get_name()}" if task is not None else "loop"
+        return {"route": route, "site": _call_site(frames), "stack": "".join(traceback.format_list(frames))}
+
+    def _record(self, lag: float, sample: Optional[dict]):
+        # No sample means the block ended between watchdog polls; we only know how long it was
+        sample = sample or {"route": "unknown", "site": "unknown", "stack": ""}
+        block = {**sample, "blocked_ms": round(lag * 1000, 1), "at": time.time()}
+        LOOP_BLOCKS.inc(route=block["route"], site=block["site"])
+        LOOP_BLOCKED_SECONDS.inc(lag, route=block["route"], site=block["site"])
+        with self._lock:
+            self._blocks.append(block)
+            first = block["site"] not in self._logged_sites
+            self._logged_sites.add(block["site"])
+        print(f"[WARN] Event loop blocked {block['blocked_ms']}ms in {block['route']} at {block['site']}")
+        if first and block["stack"]:
+            print(f"[WARN] Blocking stack (first occurrence):\n{block['stack']}")
+
+
+monitor = LoopMonitor()
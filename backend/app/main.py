@@ -1,35 +1,53 @@
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
 import subprocess, sys
 import os
 from fastapi.middleware.cors import CORSMiddleware
 from .config import CORS_ORIGINS, SCRAPER_DIR
 from .api_routes import router
+from .metrics import TimingMiddleware, render as render_metrics
+from .user_context import UserContext, get_user_context, invalidate_user_context
+from .background import drain as drain_background, spawn
+from .loop_monitor import LOOP_MONITOR, monitor as loop_monitor
+from . import write_behind
+from . import question_bank
+from .learner_summary import refresh_learner_summary, should_refresh
+from .career_paths import career_inputs, get_career_paths as load_career_paths, precompute as precompute_career_paths
+from . import singleflight
+from .idempotency import Idempotency, idempotency
+from .counselling_memory import compact_conversation, needs_compaction, prompt_context
+from .db import is_counselling_conversation
 import uuid
 import json
-from typing import Optional, Dict, Any
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
 from pydantic import BaseModel
 from .auth import verify_firebase_token, get_current_user
-from .db import (
+from .db_async import (
     create_session, get_session, update_session,
-    store_interaction, get_last_interaction, get_session_interactions,
+    store_interaction, get_last_interaction, get_session_interactions, get_recent_interactions,
     update_skill_state, get_skill_state,
     create_user_profile, get_user_profile, get_user_sessions,
-    get_interaction, update_interaction, store_response,
+    get_interaction, update_interaction,
     get_session_proficiency, set_session_proficiency,
     get_session_difficulty, set_session_difficulty,
-    append_session_history,
-    store_generated_question, create_question_interaction, create_answer_interaction,
+    append_session_history, record_session_evaluation, record_session_evaluations,
+    get_generated_question, create_question_interaction, create_interactions,
+    create_bank_question_interaction,
     create_opportunity, list_opportunities,
     save_opportunity_for_user, unsave_opportunity_for_user, list_saved_opportunities,
     mark_applied_opportunity, list_applied_opportunities,
-    get_latest_counselling_session,
+    get_counselling_session,
     get_opportunity_by_id,
     save_counselling_session,
+    append_counselling_turns,
 )
+from .llm import LLMUnavailable
 from .llm import evaluate_answer as llm_evaluate_answer
 from .llm import generate_next_question as llm_generate_next_question
 from .llm import answer_question as llm_answer_question
-from .llm import generate_career_paths as llm_generate_career_paths
+from .llm import answer_with_followup as llm_answer_with_followup
 
 # Optional Redis cache
 try:
@@ -57,6 +75,14 @@ class SubmitAnswer(BaseModel):
     interaction_id: str
     answer_text: str
 
+class AnswerItem(BaseModel):
+    interaction_id: str
+    answer_text: str
+
+class SubmitAnswers(BaseModel):
+    session_id: str
+    answers: List[AnswerItem]
+
 class InteractionCreate(BaseModel):
     interaction_id: str
     question_text: str
@@ -116,12 +142,15 @@ class SaveOpportunityRequest(BaseModel):
 class CounsellingRequest(BaseModel):
     user_message: str
     session_id: Optional[str] = None
+    conversation_id: Optional[str] = None  # server-side memory; conversation_history is only used without it
     conversation_history: Optional[list] = None
     user_profile: Optional[Dict[str, Any]] = None
 
 # Kick off scraper once on startup so fresh opportunities are available
 @app.on_event("startup")
 async def _run_scraper_startup():
+    if os.getenv("SCRAPER_ON_STARTUP", "1").strip().lower() in ("0", "false", "no"):
+        return
     try:
         env = os.environ.copy()
         # Limit pages on startup; can be overridden via env
@@ -143,6 +172,8 @@ app.add_middleware(
 # Kick off scraper once on startup so fresh opportunities are available
 @app.on_event("startup")
 async def _run_scraper_startup():
+    if os.getenv("SCRAPER_ON_STARTUP", "1").strip().lower() in ("0", "false", "no"):
+        return
     try:
         env = os.environ.copy()
         env.setdefault("UNSTOP_MAX_PAGES", "1")
@@ -151,50 +182,165 @@ async def _run_scraper_startup():
     except Exception as e:
         print(f"[WARN] Failed to start scraper on startup: {e}")
 
+# Opt-in event-loop blocking detector (LOOP_MONITOR=1), reported in logs and /metrics
+@app.on_event("startup")
+async def _start_loop_monitor():
+    if LOOP_MONITOR:
+        loop_monitor.start()
+
+# Audit writes (responses, generated questions) are flushed in the background; see app/write_behind.py
+@app.on_event("startup")
+async def _start_write_behind():
+    await write_behind.buffer.start()
+
+# Let in-flight background work (learner summaries etc.) finish before the worker exits,
+# then flush queued write-behind documents
+@app.on_event("shutdown")
+async def _drain_background_tasks():
+    await drain_background()
+    await write_behind.buffer.stop()
+    loop_monitor.stop()
+
+# Request timing + Server-Timing header (added last so it wraps CORS as the outermost layer)
+app.add_middleware(TimingMiddleware)
+
 # Include all API/business logic routes
 app.include_router(router)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint: per-route/per-dependency latency, Firestore op counts and LLM tokens."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+def _llm_unavailable(e: LLMUnavailable) -> HTTPException:
+    """503 for endpoints without a degraded answer while Gemini is failing or the breaker is open."""
+    return HTTPException(
+        status_code=503,
+        detail="The AI service is temporarily unavailable, please retry shortly",
+        headers={"Retry-After": str(int(max(1, e.retry_after)))},
+    )
+
+
+async def _grade_mcq_locally(interaction: dict, answer_text: str) -> Optional[dict]:
+    """Fallback grade for an MCQ from its stored answer key; None if the question is not an MCQ we can grade."""
+    options = interaction.get("options") or []
+    question_id = (interaction.get("question_meta") or {}).get("question_id")
+    if not options or not question_id:
+        return None
+    generated = write_behind.pending("questions_generated", question_id) or await get_generated_question(question_id) or {}
+    try:
+        correct = int(generated.get("answer_index"))
+        correct_text = str(options[correct])
+    except Exception:
+        return None
+    given = " ".join(str(answer_text or "").split()).casefold()
+    letters = "abcdefghij"
+    chosen = None
+    for i, opt in enumerate(options):
+        if given == " ".join(str(opt).split()).casefold():
+            chosen = i
+    if chosen is None and len(given) == 1 and given in letters[:len(options)]:
+        chosen = letters.index(given)
+    if chosen is None and given.isdigit() and 1 <= int(given) <= len(options):
+        chosen = int(given) - 1
+    ok = chosen == correct
+    return {
+        "score": 1.0 if ok else 0.0,
+        "feedback": "Correct." if ok else f"Not quite. The correct answer is: {correct_text}",
+        "understood_concept": ok,
+        "graded_by": "local_mcq",
+    }
+
+async def _grade_answer(session: dict, interaction: dict, answer_text: str) -> tuple[str, dict]:
+    """(question_text, evaluation) for an answer to a question interaction, graded by Gemini
+    (MCQs are graded locally against the stored answer key if Gemini is unavailable)."""
+    question_text = interaction.get("question_text") or interaction.get("question") or ""
+    if not question_text:
+        raise HTTPException(status_code=400, detail="Interaction does not contain a question_text")
+
+    # Derive metadata
+    qmeta = interaction.get("question_meta", {}) or {}
+    topic = qmeta.get("topic") or (session.get("metadata", {}) or {}).get("topic")
+    try:
+        eval_result = await asyncio.to_thread(
+            llm_evaluate_answer,
+            question_text=question_text,
+            user_answer=answer_text,
+            difficulty=qmeta.get("difficulty"),
+            domain=session.get("domain"),
+            topic=topic,
+        )
+    except LLMUnavailable:
+        eval_result = await _grade_mcq_locally(interaction, answer_text)
+        if eval_result is None:
+            raise
+    return question_text, eval_result
+
+def _session_level(session: dict) -> tuple[float, int]:
+    """The session's current (proficiency, difficulty_level), with defaults for malformed values."""
+    try:
+        proficiency = float(session.get("proficiency", 0.5))
+    except Exception:
+        proficiency = 0.5
+    try:
+        difficulty = int(session.get("difficulty_level", 3))
+    except Exception:
+        difficulty = 3
+    return proficiency, difficulty
+
+def _adapt(proficiency: float, difficulty: int, score: float) -> tuple[float, int]:
+    """One adaptive-engine step for a graded answer: (new proficiency, next difficulty)."""
+    # 1) Proficiency update via Exponential Moving Average (EMA)
+    alpha = 0.3  # smoothing factor
+    new_prof = max(0.0, min(1.0, alpha * score + (1 - alpha) * proficiency))
+
+    # 2) Difficulty adjustment based on score
+    # Increase difficulty if strong performance; decrease if weak; otherwise keep the same
+    next_diff = difficulty
+    if score >= 0.85:
+        next_diff = min(5, difficulty + 1)
+    elif score <= 0.40:
+        next_diff = max(1, difficulty - 1)
+    return new_prof, next_diff
+
 # New: Evaluate answer using Gemini and persist results
 @app.post("/evaluate-answer")
 async def evaluate_answer_endpoint(
     answer_data: SubmitAnswer,
-    user: dict = Depends(get_current_user)
+    user: dict = Depends(get_current_user),
+    idem: Idempotency = Depends(idempotency),
 ):
     """
     Fetch the original question from Firestore, call Gemini to evaluate the user's answer,
     then store the evaluation result under responses/ and update the corresponding interaction.
     """
     try:
-        # Validate session ownership
-        session = get_session(answer_data.session_id)
+        # Retry of an already-completed request (same Idempotency-Key): replay it
+        replay = await idem.replay()
+        if replay is not None:
+            return replay
+
+        # Fetch session (for ownership) and the original interaction (question) concurrently
+        session, interaction = await asyncio.gather(
+            get_session(answer_data.session_id),
+            get_interaction(answer_data.session_id, answer_data.interaction_id),
+        )
         if not session or session.get("userId") != user["uid"]:
             raise HTTPException(status_code=403, detail="Access denied to session")
-
-        # Fetch original interaction (question)
-        interaction = get_interaction(answer_data.session_id, answer_data.interaction_id)
         if not interaction:
             raise HTTPException(status_code=404, detail="Interaction not found")
 
-        question_text = interaction.get("question_text") or interaction.get("question") or ""
-        if not question_text:
-            raise HTTPException(status_code=400, detail="Interaction does not contain a question_text")
-
-        # Derive metadata
+        question_text, eval_result = await _grade_answer(session, interaction, answer_data.answer_text)
         qmeta = interaction.get("question_meta", {}) or {}
-        difficulty = qmeta.get("difficulty")
-        domain = session.get("domain")
-        topic = qmeta.get("topic") or (session.get("metadata", {}) or {}).get("topic")
 
-        # Call LLM for evaluation
-        eval_result = llm_evaluate_answer(
-            question_text=question_text,
-            user_answer=answer_data.answer_text,
-            difficulty=difficulty,
-            domain=domain,
-            topic=topic,
-        )
+        # ----- Adaptive Engine Logic (session doc was read above) -----
+        # 1) + 2) Proficiency EMA and difficulty adjustment
+        old_prof, cur_diff = _session_level(session)
+        score = float(eval_result.get("score", 0.0))
+        new_prof, next_diff = _adapt(old_prof, cur_diff, score)
 
-        # Persist response in a top-level responses collection and update interaction
+        # 3) Persist: interaction update and one session update (proficiency, difficulty,
+        # history) concurrently; the responses/ audit document is written behind
         response_id = str(uuid.uuid4())
         response_payload = {
             "responseId": response_id,
@@ -202,57 +348,159 @@ async def evaluate_answer_endpoint(
             "interactionId": answer_data.interaction_id,
             "uid": user["uid"],
             "evaluation": eval_result,
+            # Item and skill for offline calibration (app/calibration.py)
+            "questionId": qmeta.get("question_id"),
+            "bankId": qmeta.get("bank_id"),
+            "domain": session.get("domain"),
+            "topic": qmeta.get("topic"),
         }
-        store_response(response_id, response_payload)
-
-        # Update interaction with the evaluation and the student's answer
-        update_interaction(
-            answer_data.session_id,
-            answer_data.interaction_id,
-            {
-                "answer_text": answer_data.answer_text,
-                "evaluator_result": eval_result,
-            },
+        write_behind.store_response(response_id, response_payload)
+        await asyncio.gather(
+            update_interaction(
+                answer_data.session_id,
+                answer_data.interaction_id,
+                {
+                    "answer_text": answer_data.answer_text,
+                    "evaluator_result": eval_result,
+                },
+            ),
+            record_session_evaluation(answer_data.session_id, new_prof, next_diff, {
+                "scores": {"interactionId": answer_data.interaction_id, "score": score},
+                "questions": {"interactionId": answer_data.interaction_id, "text": question_text},
+                "answers": {"interactionId": answer_data.interaction_id, "text": answer_data.answer_text},
+                "difficulty_progression": {"from": cur_diff, "to": next_diff},
+            }),
         )
 
-        # ----- Adaptive Engine Logic -----
-        # 1) Proficiency update via Exponential Moving Average (EMA)
-        old_prof = get_session_proficiency(answer_data.session_id)
-        score = float(eval_result.get("score", 0.0))
-        alpha = 0.3  # smoothing factor
-        new_prof = max(0.0, min(1.0, alpha * score + (1 - alpha) * old_prof))
-        set_session_proficiency(answer_data.session_id, new_prof)
-
-        # 2) Difficulty adjustment based on score
-        # Increase difficulty if strong performance; decrease if weak
-        cur_diff = get_session_difficulty(answer_data.session_id)
-        next_diff = cur_diff
-        if score >= 0.85:
-            next_diff = min(5, cur_diff + 1)
-        elif score <= 0.40:
-            next_diff = max(1, cur_diff - 1)
-        # Otherwise keep the same
-        if next_diff != cur_diff:
-            set_session_difficulty(answer_data.session_id, next_diff)
-
-        # 3) Session state tracking (history)
-        append_session_history(answer_data.session_id, "scores", {"interactionId": answer_data.interaction_id, "score": score})
-        append_session_history(answer_data.session_id, "questions", {"interactionId": answer_data.interaction_id, "text": question_text})
-        append_session_history(answer_data.session_id, "answers", {"interactionId": answer_data.interaction_id, "text": answer_data.answer_text})
-        append_session_history(answer_data.session_id, "difficulty_progression", {"from": cur_diff, "to": next_diff})
+        # Quality signal for banked questions (observed score distribution)
+        if qmeta.get("bank_id"):
+            spawn(question_bank.record_answer(qmeta["bank_id"], score), name=f"question_bank_answer:{qmeta['bank_id']}")
 
-        return {
+        # 4) Refresh the rolling learner summary every SUMMARY_REFRESH_EVERY graded answers
+        graded_count = len(((session.get("history") or {}).get("scores") or [])) + 1
+        if should_refresh(graded_count):
+            spawn(refresh_learner_summary(answer_data.session_id), name=f"learner_summary:{answer_data.session_id}")
+
+        return await idem.save({
             "success": True,
             "response_id": response_id,
             "evaluation": eval_result,
             "proficiency": new_prof,
             "difficulty_level": next_diff,
-        }
+        })
     except HTTPException:
         raise
+    except LLMUnavailable as e:
+        raise _llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to evaluate answer: {str(e)}")
 
+EVALUATE_BATCH_MAX = int(os.getenv("EVALUATE_BATCH_MAX", "50"))
+EVALUATE_BATCH_CONCURRENCY = int(os.getenv("EVALUATE_BATCH_CONCURRENCY", "4"))
+
+@app.post("/evaluate-answers")
+async def evaluate_answers_endpoint(
+    batch: SubmitAnswers,
+    user: dict = Depends(get_current_user),
+    idem: Idempotency = Depends(idempotency),
+):
+    """
+    Batch /evaluate-answer for several answers from one session (quiz flows). Answers are graded
+    concurrently (at most EVALUATE_BATCH_CONCURRENCY Gemini calls at a time), the adaptive updates
+    are applied in submission order, and the interactions and session are committed in one write.
+    Each entry of `results` matches the /evaluate-answer response for that answer.
+    """
+    try:
+        # Retry of an already-completed request (same Idempotency-Key): replay it
+        replay = await idem.replay()
+        if replay is not None:
+            return replay
+
+        interaction_ids = [a.interaction_id for a in batch.answers]
+        if not interaction_ids:
+            raise HTTPException(status_code=400, detail="No answers submitted")
+        if len(interaction_ids) > EVALUATE_BATCH_MAX:
+            raise HTTPException(status_code=400, detail=f"At most {EVALUATE_BATCH_MAX} answers per batch")
+        if len(set(interaction_ids)) != len(interaction_ids):
+            raise HTTPException(status_code=400, detail="Duplicate interaction_id in batch")
+
+        # Fetch session (for ownership) and all question interactions concurrently
+        session, *interactions = await asyncio.gather(
+            get_session(batch.session_id),
+            *(get_interaction(batch.session_id, iid) for iid in interaction_ids),
+        )
+        if not session or session.get("userId") != user["uid"]:
+            raise HTTPException(status_code=403, detail="Access denied to session")
+        missing = [iid for iid, it in zip(interaction_ids, interactions) if not it]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Interaction not found: {', '.join(missing)}")
+
+        limit = asyncio.Semaphore(max(1, EVALUATE_BATCH_CONCURRENCY))
+
+        async def grade(interaction: dict, answer_text: str):
+            async with limit:
+                return await _grade_answer(session, interaction, answer_text)
+
+        graded = await asyncio.gather(*(grade(it, a.answer_text) for it, a in zip(interactions, batch.answers)))
+
+        # Adaptive engine, one step per answer in submission order
+        prof, diff = _session_level(session)
+        results, updates = [], []
+        history = {"scores": [], "questions": [], "answers": [], "difficulty_progression": []}
+        for answer, interaction, (question_text, eval_result) in zip(batch.answers, interactions, graded):
+            qmeta = interaction.get("question_meta", {}) or {}
+            score = float(eval_result.get("score", 0.0))
+            new_prof, next_diff = _adapt(prof, diff, score)
+            response_id = str(uuid.uuid4())
+            write_behind.store_response(response_id, {
+                "responseId": response_id,
+                "sessionId": batch.session_id,
+                "interactionId": answer.interaction_id,
+                "uid": user["uid"],
+                "evaluation": eval_result,
+                "questionId": qmeta.get("question_id"),
+                "bankId": qmeta.get("bank_id"),
+                "domain": session.get("domain"),
+                "topic": qmeta.get("topic"),
+            })
+            updates.append((answer.interaction_id, {"answer_text": answer.answer_text, "evaluator_result": eval_result}))
+            history["scores"].append({"interactionId": answer.interaction_id, "score": score})
+            history["questions"].append({"interactionId": answer.interaction_id, "text": question_text})
+            history["answers"].append({"interactionId": answer.interaction_id, "text": answer.answer_text})
+            history["difficulty_progression"].append({"from": diff, "to": next_diff})
+            if qmeta.get("bank_id"):
+                spawn(question_bank.record_answer(qmeta["bank_id"], score), name=f"question_bank_answer:{qmeta['bank_id']}")
+            results.append({
+                "success": True,
+                "interaction_id": answer.interaction_id,
+                "response_id": response_id,
+                "evaluation": eval_result,
+                "proficiency": new_prof,
+                "difficulty_level": next_diff,
+            })
+            prof, diff = new_prof, next_diff
+
+        # One batched write: every interaction update and the session's final state and history
+        await record_session_evaluations(batch.session_id, updates, prof, diff, history)
+
+        # Refresh the learner summary if this batch crossed a SUMMARY_REFRESH_EVERY boundary
+        graded_before = len(((session.get("history") or {}).get("scores") or []))
+        if any(should_refresh(n) for n in range(graded_before + 1, graded_before + len(results) + 1)):
+            spawn(refresh_learner_summary(batch.session_id), name=f"learner_summary:{batch.session_id}")
+
+        return await idem.save({
+            "success": True,
+            "results": results,
+            "proficiency": prof,
+            "difficulty_level": diff,
+        })
+    except HTTPException:
+        raise
+    except LLMUnavailable as e:
+        raise _llm_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to evaluate answers: {str(e)}")
+
 @app.post("/ask")
 async def ask_endpoint(payload: AskRequest, user: dict = Depends(get_current_user)):
     """
@@ -264,22 +512,27 @@ async def ask_endpoint(payload: AskRequest, user: dict = Depends(get_current_use
         domain = None
         topic = None
         if payload.session_id:
-            session = get_session(payload.session_id)
+            session = await get_session(payload.session_id)
             if not session or session.get("userId") != user["uid"]:
                 raise HTTPException(status_code=403, detail="Access denied to session")
             domain = session.get("domain")
             topic = (session.get("metadata", {}) or {}).get("topic")
-            interactions = get_session_interactions(payload.session_id, limit=1)
+            interactions = await get_recent_interactions(payload.session_id, limit=1, session=session)
             if interactions:
                 last = interactions[-1]
                 fb = ((last.get("evaluator_result") or {}).get("feedback"))
                 if fb:
                     context = f"Last feedback: {fb}"
 
-        result = llm_answer_question(query=payload.query, context=context, domain=domain, topic=topic)
+        result = await singleflight.call(
+            "ask", user["uid"], llm_answer_question,
+            query=payload.query, context=context, domain=domain, topic=topic,
+        )
         return {"success": True, "answer": result.get("answer", ""), "raw": result.get("raw")}
     except HTTPException:
         raise
+    except LLMUnavailable as e:
+        raise _llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to answer query: {str(e)}")
 
@@ -290,41 +543,39 @@ async def save_counselling(result: CounsellingResult, user: dict = Depends(get_c
     """
     try:
         payload = {k: v for k, v in result.dict().items() if v is not None}
-        sid = save_counselling_session(user["uid"], payload)
+        sid = await save_counselling_session(user["uid"], payload)
+        invalidate_user_context(user["uid"])
+        # Generate career paths for the new inputs now, so /career-paths can serve them directly
+        precompute_career_paths(user["uid"], sid, payload)
         return {"success": True, "session_id": sid}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save counselling: {str(e)}")
 
 @app.get("/career-paths")
-async def get_career_paths(session_id: Optional[str] = None, user: dict = Depends(get_current_user)):
+async def get_career_paths(session_id: Optional[str] = None, refresh: bool = False, user: dict = Depends(get_current_user), user_ctx: UserContext = Depends(get_user_context)):
     """
-    Generate AI career paths using latest (or specified) saved counselling session as context.
+    AI career paths for the latest (or specified) saved counselling session.
+    Served from the result precomputed on /counselling/save while the session's inputs are unchanged;
+    regenerated (and stored) when they differ or when refresh=true.
     """
     try:
         context = None
         if session_id:
-            # fetch that specific counselling session under user
-            # simple scan; if not found, fall back to latest
-            latest = get_latest_counselling_session(user["uid"]) or {}
-            if latest and latest.get("sessionId") == session_id:
-                context = latest
+            # fetch that specific counselling session under user; if not found, fall back to latest
+            context = await get_counselling_session(user["uid"], session_id)
         if context is None:
-            context = get_latest_counselling_session(user["uid"]) or {}
-
-        interests = context.get("interests")
-        preferred_skills = context.get("preferred_skills")
-        personality_traits = context.get("personality_traits")
-        chosen_domain = context.get("chosen_domain")
-        difficulty_preference = context.get("difficulty_preference")
-
-        data = llm_generate_career_paths(
-            interests=interests,
-            preferred_skills=preferred_skills,
-            personality_traits=personality_traits,
-            chosen_domain=chosen_domain,
-            difficulty_preference=difficulty_preference,
-        )
+            context = await user_ctx.counselling()
+
+        # Coalesce duplicate requests across workers; load_career_paths already joins in-worker generations
+        flight = singleflight.flight_key("career-paths", user["uid"], {
+            "sessionId": (context or {}).get("sessionId"),
+            "inputs": career_inputs(context),
+            "refresh": refresh,
+        })
+        data = await singleflight.run(flight, lambda: load_career_paths(user["uid"], context, refresh=refresh))
         return {"success": True, **data}
+    except LLMUnavailable as e:
+        raise _llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate career paths: {str(e)}")
 
@@ -334,7 +585,7 @@ async def create_opportunity_endpoint(payload: OpportunityCreate, user: dict = D
     """Create or update an opportunity document (for admin/editor workflows)."""
     try:
         # Minimal authorization: any authenticated user can create; tighten if needed
-        oid = create_opportunity(payload.id, payload.dict())
+        oid = await create_opportunity(payload.id, payload.dict())
         return {"success": True, "id": oid}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create opportunity: {str(e)}")
@@ -359,7 +610,7 @@ async def list_opportunities_endpoint(
         if location: filters["location"] = location
         if deadline_from: filters["deadline_from"] = deadline_from
         if skill: filters["skills_required"] = skill
-        items = list_opportunities(filters, min(max(limit, 1), 100))
+        items = await list_opportunities(filters, min(max(limit, 1), 100))
         return {"success": True, "items": items}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list opportunities: {str(e)}")
@@ -367,7 +618,7 @@ async def list_opportunities_endpoint(
 @app.post("/opportunities/{opportunity_id}/save")
 async def save_opportunity_endpoint(opportunity_id: str, status: Optional[str] = "saved", user: dict = Depends(get_current_user)):
     try:
-        doc = save_opportunity_for_user(user["uid"], opportunity_id, status or "saved")
+        doc = await save_opportunity_for_user(user["uid"], opportunity_id, status or "saved")
         return {"success": True, "saved": doc}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save opportunity: {str(e)}")
@@ -375,7 +626,7 @@ async def save_opportunity_endpoint(opportunity_id: str, status: Optional[str] =
 @app.delete("/opportunities/{opportunity_id}/save")
 async def unsave_opportunity_endpoint(opportunity_id: str, user: dict = Depends(get_current_user)):
     try:
-        unsave_opportunity_for_user(user["uid"], opportunity_id)
+        await unsave_opportunity_for_user(user["uid"], opportunity_id)
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to unsave opportunity: {str(e)}")
@@ -383,7 +634,7 @@ async def unsave_opportunity_endpoint(opportunity_id: str, user: dict = Depends(
 @app.get("/opportunities/saved")
 async def list_saved_opportunities_endpoint(user: dict = Depends(get_current_user)):
     try:
-        items = list_saved_opportunities(user["uid"])
+        items = await list_saved_opportunities(user["uid"])
         return {"success": True, "items": items}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list saved opportunities: {str(e)}")
@@ -391,7 +642,7 @@ async def list_saved_opportunities_endpoint(user: dict = Depends(get_current_use
 @app.post("/opportunities/{opportunity_id}/applied")
 async def mark_applied_opportunity_endpoint(opportunity_id: str, notes: Optional[str] = None, user: dict = Depends(get_current_user)):
     try:
-        doc = mark_applied_opportunity(user["uid"], opportunity_id, notes)
+        doc = await mark_applied_opportunity(user["uid"], opportunity_id, notes)
         return {"success": True, "applied": doc}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to mark applied: {str(e)}")
@@ -399,7 +650,7 @@ async def mark_applied_opportunity_endpoint(opportunity_id: str, notes: Optional
 @app.get("/opportunities/applied")
 async def list_applied_opportunities_endpoint(user: dict = Depends(get_current_user)):
     try:
-        items = list_applied_opportunities(user["uid"])
+        items = await list_applied_opportunities(user["uid"])
         return {"success": True, "items": items}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list applied opportunities: {str(e)}")
@@ -491,7 +742,7 @@ def _cache_set(key: str, value: dict, ttl_seconds: int = 600):
 
 
 @app.post("/api/opportunities/search")
-async def search_opportunities(payload: OpportunitySearchRequest, user: dict = Depends(get_current_user)):
+async def search_opportunities(payload: OpportunitySearchRequest, user: dict = Depends(get_current_user), user_ctx: UserContext = Depends(get_user_context)):
     try:
         # Cache key: user + query
         cache_key = None
@@ -512,7 +763,7 @@ async def search_opportunities(payload: OpportunitySearchRequest, user: dict = D
         # Education level
         edu = payload.education_level or "Auto"
         if edu == "Auto":
-            latest = get_latest_counselling_session(user["uid"]) or {}
+            latest = await user_ctx.counselling()
             auto_edu = latest.get("education_level")
             if isinstance(auto_edu, str) and auto_edu:
                 filters["education_level"] = auto_edu
@@ -551,7 +802,7 @@ async def search_opportunities(payload: OpportunitySearchRequest, user: dict = D
         offset = (page - 1) * page_size
 
         # Query Firestore
-        items = list_opportunities(filters=filters, limit=page_size, order_by=order_by, descending=descending, offset=offset)
+        items = await list_opportunities(filters=filters, limit=page_size, order_by=order_by, descending=descending, offset=offset)
 
         # Naive full-text scoring on current page if q provided
         q = (payload.q or "").strip()
@@ -560,7 +811,7 @@ async def search_opportunities(payload: OpportunitySearchRequest, user: dict = D
 
         # Personalized scoring when sort=relevance
         if (payload.sort or "relevance") == "relevance":
-            latest = get_latest_counselling_session(user["uid"]) or {}
+            latest = await user_ctx.counselling()
             for it in items:
                 it["score_cache"] = _personalized_score(it, latest)
             items.sort(key=lambda it: it.get("score_cache", 0), reverse=True)
@@ -585,7 +836,7 @@ async def search_opportunities(payload: OpportunitySearchRequest, user: dict = D
 @app.get("/api/opportunities/{opportunity_id}")
 async def get_opportunity(opportunity_id: str, user: dict = Depends(get_current_user)):
     try:
-        data = get_opportunity_by_id(opportunity_id)
+        data = await get_opportunity_by_id(opportunity_id)
         if not data:
             raise HTTPException(status_code=404, detail="Not found")
         return data
@@ -600,7 +851,7 @@ async def save_user_opportunity(uid: str, payload: SaveOpportunityRequest, user:
     try:
         if uid != user["uid"]:
             raise HTTPException(status_code=403, detail="Forbidden")
-        saved = save_opportunity_for_user(uid, payload.opportunityId, status="saved")
+        saved = await save_opportunity_for_user(uid, payload.opportunityId, status="saved")
         return {"success": True, "saved": saved}
     except HTTPException:
         raise
@@ -609,11 +860,11 @@ async def save_user_opportunity(uid: str, payload: SaveOpportunityRequest, user:
 
 
 @app.get("/api/users/{uid}/recommended")
-async def recommended_for_user(uid: str, user: dict = Depends(get_current_user)):
+async def recommended_for_user(uid: str, user: dict = Depends(get_current_user), user_ctx: UserContext = Depends(get_user_context)):
     try:
         if uid != user["uid"]:
             raise HTTPException(status_code=403, detail="Forbidden")
-        latest = get_latest_counselling_session(uid) or {}
+        latest = await user_ctx.counselling()
         filters: Dict[str, Any] = {"archived": False}
         if latest.get("education_level"):
             filters["education_level"] = latest["education_level"]
@@ -625,7 +876,7 @@ async def recommended_for_user(uid: str, user: dict = Depends(get_current_user))
         from datetime import datetime, timezone
         today_iso = datetime.now(timezone.utc).strftime("%Y-%m-%d")
         filters["deadline_from"] = today_iso
-        items = list_opportunities(filters=filters, limit=20, order_by="deadline", descending=False)
+        items = await list_opportunities(filters=filters, limit=20, order_by="deadline", descending=False)
         return {"success": True, "items": items}
     except HTTPException:
         raise
@@ -633,15 +884,21 @@ async def recommended_for_user(uid: str, user: dict = Depends(get_current_user))
         raise HTTPException(status_code=500, detail=f"Failed to load recommendations: {str(e)}")
 
 @app.post("/ask-followup")
-async def ask_followup(payload: AskFollowupRequest, user: dict = Depends(get_current_user)):
+async def ask_followup(payload: AskFollowupRequest, user: dict = Depends(get_current_user), idem: Idempotency = Depends(idempotency)):
     """
     Answers the user's free-form question with the LLM, persists both the user's question
     and the LLM answer as interactions, then generates a related follow-up question and persists it.
-    No fixed question set is used.
+    No fixed question set is used. ASK_FOLLOWUP_MODE picks how the two are produced: combined
+    (default, one structured LLM call), parallel (answer and follow-up concurrently) or sequential.
     """
     try:
+        # Retry of an already-completed request (same Idempotency-Key): replay it
+        replay = await idem.replay()
+        if replay is not None:
+            return replay
+
         # Validate session and ownership
-        session = get_session(payload.session_id)
+        session = await get_session(payload.session_id)
         if not session or session.get("userId") != user["uid"]:
             raise HTTPException(status_code=403, detail="Access denied to session")
 
@@ -650,53 +907,81 @@ async def ask_followup(payload: AskFollowupRequest, user: dict = Depends(get_cur
         difficulty = int(session.get("difficulty_level", 3))
         proficiency = float(session.get("proficiency", 0.5))
 
-        # 1) Persist the user's question as an interaction
+        # Everything this request creates is committed in one batch at the end (step 4), so
+        # each document carries its own creation time instead of a shared server timestamp
+        # (keeps the three interactions ordered).
         user_q_interaction_id = str(uuid.uuid4())
-        create_question_interaction(
-            payload.session_id,
-            user_q_interaction_id,
-            {
-                "question_text": payload.query,
-                "question_meta": {"source": "user", "domain": domain, "topic": topic},
-            },
-        )
-
-        # 2) Answer user's question via LLM
-        answer_obj = llm_answer_question(query=payload.query, context=None, domain=domain, topic=topic)
-        answer_text = answer_obj.get("answer", "")
-
-        # 3) Persist LLM answer as an interaction
-        llm_a_interaction_id = str(uuid.uuid4())
-        create_answer_interaction(
-            payload.session_id,
-            llm_a_interaction_id,
-            {"answer_text": answer_text, "source": "llm"},
-        )
+        user_q_body = {
+            "question_text": payload.query,
+            "question_meta": {"source": "user", "domain": domain, "topic": topic},
+            "createdAt": datetime.now(timezone.utc),
+            "type": "question",
+        }
 
-        # 4) Generate a related follow-up question using the LLM answer as context
-        interactions = get_session_interactions(payload.session_id, limit=10)
-        history = []
-        last_feedback = None
-        for it in interactions:
-            item = {
+        # 1) + 2) Answer the user's question and generate a related follow-up question. History comes
+        # from the session's recent_tail (already read; queried for sessions without one) plus this
+        # request's turns.
+        recent = await get_recent_interactions(payload.session_id, limit=8, session=session)
+        history = [
+            {
                 "interactionId": it.get("id"),
                 "question_text": it.get("question_text") or it.get("question"),
                 "answer_text": it.get("answer_text"),
                 "score": ((it.get("evaluator_result") or {}).get("score")),
             }
-            history.append(item)
-
-        qdata = llm_generate_next_question(
-            domain=domain,
-            topic=topic,
-            difficulty=difficulty,
-            proficiency=proficiency,
-            history=history,
-            last_feedback=last_feedback,
-            last_answer=answer_text,
-        )
-
-        # 5) Persist the follow-up question
+            for it in recent
+        ] + [{"interactionId": user_q_interaction_id, "question_text": payload.query}]
+        learner_summary = session.get("learner_summary")
+        llm_a_interaction_id = str(uuid.uuid4())
+        mode = os.getenv("ASK_FOLLOWUP_MODE", "combined").strip().lower()
+
+        def generate_followup(answer_text: str | None):
+            return asyncio.to_thread(
+                llm_generate_next_question,
+                domain=domain,
+                topic=topic,
+                difficulty=difficulty,
+                proficiency=proficiency,
+                history=history + ([{"interactionId": llm_a_interaction_id, "answer_text": answer_text}] if answer_text else []),
+                last_feedback=None,
+                last_answer=answer_text,
+                learner_summary=learner_summary,
+            )
+
+        qdata = None
+        if mode == "parallel":
+            # Follow-up from the user's query alone, generated while the answer is
+            answer_obj, qdata = await asyncio.gather(
+                asyncio.to_thread(llm_answer_question, query=payload.query, context=None, domain=domain, topic=topic),
+                generate_followup(None),
+            )
+            answer_text = answer_obj.get("answer", "")
+        elif mode == "sequential":
+            answer_obj = await asyncio.to_thread(llm_answer_question, query=payload.query, context=None, domain=domain, topic=topic)
+            answer_text = answer_obj.get("answer", "")
+        else:
+            # One structured call returns both (default)
+            combined = await asyncio.to_thread(
+                llm_answer_with_followup,
+                query=payload.query,
+                domain=domain,
+                topic=topic,
+                difficulty=difficulty,
+                proficiency=proficiency,
+                history=history,
+                learner_summary=learner_summary,
+            )
+            answer_text = combined["answer"]
+            qdata = combined["followup"]
+            if not answer_text:
+                answer_obj = await asyncio.to_thread(llm_answer_question, query=payload.query, context=None, domain=domain, topic=topic)
+                answer_text = answer_obj.get("answer", "")
+        llm_a_body = {"answer_text": answer_text, "source": "llm", "createdAt": datetime.now(timezone.utc), "type": "answer"}
+        if qdata is None:
+            # Sequential mode, or the combined output had no usable follow-up
+            qdata = await generate_followup(answer_text)
+
+        # 3) Build the follow-up question
         followup_interaction_id = str(uuid.uuid4())
         followup_question_id = str(uuid.uuid4())
         followup_payload = {
@@ -705,8 +990,9 @@ async def ask_followup(payload: AskFollowupRequest, user: dict = Depends(get_cur
                 "difficulty": qdata.get("difficulty", difficulty),
                 "topic": topic,
                 "domain": domain,
-                "generated_by": "gemini",
+                "generated_by": "fallback" if qdata.get("fallback") else "gemini",
                 "related_to": llm_a_interaction_id,
+                "question_id": followup_question_id,
             },
         }
         if "options" in qdata:
@@ -715,20 +1001,29 @@ async def ask_followup(payload: AskFollowupRequest, user: dict = Depends(get_cur
             followup_payload["expected_answer"] = qdata.get("expected_answer")
         if "hint" in qdata:
             followup_payload["hint"] = qdata.get("hint")
+        created = datetime.now(timezone.utc)
 
-        store_generated_question(
-            followup_question_id,
-            {
+        # 4) One batched commit: the three interactions, the session's recent_tail and the
+        # generated question (with its answer key)
+        await create_interactions(
+            payload.session_id,
+            [
+                (user_q_interaction_id, user_q_body),
+                (llm_a_interaction_id, llm_a_body),
+                (followup_interaction_id, {**followup_payload, "createdAt": created, "type": "question"}),
+            ],
+            documents=[("questions_generated", followup_question_id, {
                 **followup_payload,
                 "questionId": followup_question_id,
                 "sessionId": payload.session_id,
                 "uid": user["uid"],
                 "answer_index": qdata.get("answer_index"),
-            },
+                "createdAt": created,
+            })],
+            session=session,
         )
-        create_question_interaction(payload.session_id, followup_interaction_id, followup_payload)
 
-        return {
+        return await idem.save({
             "success": True,
             "user_question_interaction_id": user_q_interaction_id,
             "llm_answer_interaction_id": llm_a_interaction_id,
@@ -736,24 +1031,34 @@ async def ask_followup(payload: AskFollowupRequest, user: dict = Depends(get_cur
             "followup_question_id": followup_question_id,
             "answer": answer_text,
             "followup_question": followup_payload,
-        }
+        })
     except HTTPException:
         raise
+    except LLMUnavailable as e:
+        raise _llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process ask-followup: {str(e)}")
 
 @app.post("/next-question")
 async def next_question(
     payload: NextQuestionRequest,
-    user: dict = Depends(get_current_user)
+    user: dict = Depends(get_current_user),
+    idem: Idempotency = Depends(idempotency),
 ):
     """
     Generate the next question based on session difficulty, proficiency, and recent history.
     Persist to questions_generated and also create a new interaction in the session.
+    An unseen question from the question bank (app/question_bank.py) is served when one fits;
+    Gemini is only called on a bank miss.
     """
     try:
+        # Retry of an already-completed request (same Idempotency-Key): replay it
+        replay = await idem.replay()
+        if replay is not None:
+            return replay
+
         # Validate session and ownership
-        session = get_session(payload.session_id)
+        session = await get_session(payload.session_id)
         if not session or session.get("userId") != user["uid"]:
             raise HTTPException(status_code=403, detail="Access denied to session")
 
@@ -763,8 +1068,8 @@ async def next_question(
         domain = session.get("domain") or "general"
         topic = payload.topic or (session.get("metadata", {}) or {}).get("topic")
 
-        interactions = get_session_interactions(payload.session_id, limit=10)
-        # Build simple history entries
+        interactions = await get_recent_interactions(payload.session_id, limit=10, session=session)
+        # Build simple history entries (oldest first)
         history = []
         last_feedback = None
         for it in interactions:
@@ -778,16 +1083,34 @@ async def next_question(
         if interactions:
             last = interactions[-1]
             last_feedback = ((last.get("evaluator_result") or {}).get("feedback"))
-
-        # Call LLM to generate next question
-        qdata = llm_generate_next_question(
-            domain=domain,
-            topic=topic,
-            difficulty=difficulty,
-            proficiency=proficiency,
-            history=history,
-            last_feedback=last_feedback,
-        )
+            # A banked question left unanswered counts as skipped
+            last_bank_id = last.get("bank_id") or (last.get("question_meta") or {}).get("bank_id")
+            if last_bank_id and last.get("type") == "question" and not last.get("answer_text"):
+                spawn(question_bank.record_skip(last_bank_id), name=f"question_bank_skip:{last_bank_id}")
+
+        # Serve from the question bank; call the LLM only on a miss
+        banked = None
+        if question_bank.QUESTION_BANK:
+            banked = await question_bank.pick(
+                session, domain, topic, difficulty, proficiency,
+                [h["question_text"] for h in history if h.get("question_text")],
+            )
+        if banked is not None:
+            qdata = {"question": banked.get("question_text", ""), "difficulty": banked.get("difficulty", difficulty)}
+            for field in ("options", "answer_index", "expected_answer", "hint"):
+                if banked.get(field) is not None:
+                    qdata[field] = banked[field]
+        else:
+            qdata = await singleflight.call(
+                "next-question", user["uid"], llm_generate_next_question,
+                domain=domain,
+                topic=topic,
+                difficulty=difficulty,
+                proficiency=proficiency,
+                history=history,
+                last_feedback=last_feedback,
+                learner_summary=session.get("learner_summary"),
+            )
 
         # Normalize to our interaction schema
         interaction_id = str(uuid.uuid4())
@@ -799,9 +1122,12 @@ async def next_question(
                 "difficulty": qdata.get("difficulty", difficulty),
                 "topic": topic,
                 "domain": domain,
-                "generated_by": "gemini",
+                "generated_by": "question_bank" if banked is not None else "fallback" if qdata.get("fallback") else "gemini",
+                "question_id": question_id,
             },
         }
+        if banked is not None:
+            question_payload["question_meta"]["bank_id"] = banked["id"]
         # Optional fields
         if "options" in qdata:
             question_payload["options"] = qdata.get("options")
@@ -811,8 +1137,9 @@ async def next_question(
         if "hint" in qdata:
             question_payload["hint"] = qdata.get("hint")
 
-        # Persist generated question (with answer key if provided)
-        store_generated_question(
+        # Queue the generated question (with answer key if provided) for write-behind and
+        # create the session interaction (without exposing answer_index)
+        write_behind.store_generated_question(
             question_id,
             {
                 **question_payload,
@@ -822,18 +1149,25 @@ async def next_question(
                 "answer_index": qdata.get("answer_index"),
             },
         )
-
-        # Create interaction in the session (without exposing answer_index)
-        create_question_interaction(payload.session_id, interaction_id, question_payload)
-
-        return {
+        if banked is not None:
+            await create_bank_question_interaction(payload.session_id, interaction_id, question_payload, banked["id"], session=session)
+        else:
+            await create_question_interaction(payload.session_id, interaction_id, question_payload, session=session)
+            if question_bank.QUESTION_BANK:
+                # Backfill the bank in the background (never delays the response)
+                question_bank.bank_generated(domain, topic, qdata.get("difficulty", difficulty), qdata, question_id)
+                question_bank.maybe_backfill(domain, topic, difficulty)
+
+        return await idem.save({
             "success": True,
             "interaction_id": interaction_id,
             "question_id": question_id,
             "question": question_payload,
-        }
+        })
     except HTTPException:
         raise
+    except LLMUnavailable as e:
+        raise _llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate next question: {str(e)}")
 
@@ -846,13 +1180,13 @@ async def create_interaction(
     """Create a new interaction (question) in a session"""
     try:
         # Verify session belongs to user
-        session = get_session(session_id)
+        session = await get_session(session_id)
         if not session or session.get("userId") != user["uid"]:
             raise HTTPException(status_code=403, detail="Access denied to session")
         
         # Store the interaction
         interaction_payload = interaction_data.dict()
-        store_interaction(session_id, interaction_data.interaction_id, interaction_payload)
+        await store_interaction(session_id, interaction_data.interaction_id, interaction_payload, session=session)
         
         return {
             "success": True,
@@ -872,11 +1206,11 @@ async def get_interactions(
     """Get all interactions for a session"""
     try:
         # Verify session belongs to user
-        session = get_session(session_id)
+        session = await get_session(session_id)
         if not session or session.get("userId") != user["uid"]:
             raise HTTPException(status_code=403, detail="Access denied to session")
         
-        interactions = get_session_interactions(session_id, limit)
+        interactions = await get_session_interactions(session_id, limit)
         return {"interactions": interactions}
     except HTTPException:
         raise
@@ -891,11 +1225,11 @@ async def get_last_interaction_endpoint(
     """Get the last interaction for a session"""
     try:
         # Verify session belongs to user
-        session = get_session(session_id)
+        session = await get_session(session_id)
         if not session or session.get("userId") != user["uid"]:
             raise HTTPException(status_code=403, detail="Access denied to session")
         
-        last_interaction = get_last_interaction(session_id)
+        last_interaction = await get_last_interaction(session_id)
         return {"last_interaction": last_interaction}
     except HTTPException:
         raise
@@ -914,7 +1248,7 @@ async def update_skill(
         if not (0.0 <= proficiency <= 1.0):
             raise HTTPException(status_code=400, detail="Proficiency must be between 0.0 and 1.0")
         
-        result = update_skill_state(user["uid"], skill, proficiency)
+        result = await update_skill_state(user["uid"], skill, proficiency)
         return {"success": True, "skill_state": result}
     except HTTPException:
         raise
@@ -925,7 +1259,7 @@ async def update_skill(
 async def get_skills(user: dict = Depends(get_current_user)):
     """Get all skills for user"""
     try:
-        skills = get_skill_state(user["uid"])
+        skills = await get_skill_state(user["uid"])
         return {"skills": skills}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get skills: {str(e)}")
@@ -937,7 +1271,7 @@ async def get_skill(
 ):
     """Get specific skill state for user"""
     try:
-        skill_state = get_skill_state(user["uid"], skill)
+        skill_state = await get_skill_state(user["uid"], skill)
         if not skill_state:
             raise HTTPException(status_code=404, detail="Skill state not found")
         return skill_state
@@ -950,7 +1284,8 @@ async def get_skill(
 @app.post("/counselling")
 async def counselling_assistant(
     counselling_data: CounsellingRequest,
-    user: dict = Depends(get_current_user)
+    user: dict = Depends(get_current_user),
+    user_ctx: UserContext = Depends(get_user_context),
 ):
     """
     Adaptive counselling assistant that provides supportive responses and generates
@@ -963,8 +1298,7 @@ async def counselling_assistant(
         user_profile = counselling_data.user_profile
         if not user_profile:
             try:
-                profile = get_user_profile(user["uid"])
-                user_profile = profile if profile else {}
+                user_profile = await user_ctx.profile()
             except:
                 user_profile = {}
         
@@ -972,7 +1306,7 @@ async def counselling_assistant(
         session_context = None
         if counselling_data.session_id:
             try:
-                session = get_session(counselling_data.session_id)
+                session = await get_session(counselling_data.session_id)
                 if session and session.get("userId") == user["uid"]:
                     session_context = {
                         "domain": session.get("domain"),
@@ -983,12 +1317,35 @@ async def counselling_assistant(
             except:
                 session_context = None
         
+        # Conversation memory: stored summary + last turns when the client sends conversation_id,
+        # otherwise start a new conversation (client-sent history is still honoured for it).
+        # Ids are only issued by this endpoint: an unknown id, or one of a saved counselling
+        # outcome (same collection, no conversation map), is rejected rather than written to.
+        conversation_id = counselling_data.conversation_id
+        conversation = None
+        if conversation_id:
+            stored = await get_counselling_session(user["uid"], conversation_id)
+            if not is_counselling_conversation(stored):
+                raise HTTPException(status_code=404, detail="Conversation not found")
+            if stored.get("userId") not in (None, user["uid"]):
+                raise HTTPException(status_code=403, detail="Access denied to conversation")
+            conversation = stored["conversation"]
+        else:
+            conversation_id = str(uuid.uuid4())
+        if conversation:
+            summary, history = prompt_context(conversation)
+        else:
+            summary, history = None, counselling_data.conversation_history or []
+
         # Generate counselling response using LLM
-        response = counselling_response(
+        response = await asyncio.to_thread(
+            counselling_response,
             user_message=counselling_data.user_message,
-            conversation_history=counselling_data.conversation_history or [],
+            conversation_history=history,
             user_profile=user_profile,
-            session_context=session_context
+            session_context=session_context,
+            conversation_summary=summary,
+            max_history=len(history) if conversation else 5,
         )
         
         # If the LLM answer is a JSON blob (sometimes Gemini returns JSON as a string), parse and pretty-print
@@ -1024,15 +1381,25 @@ async def counselling_assistant(
 
         combined_text = (body_text + bullet_block + next_step_block).strip()
 
+        # Persist both turns; compact older turns into the summary in the background
+        conversation = await append_counselling_turns(
+            user["uid"], conversation_id,
+            [("user", counselling_data.user_message), ("mentor", combined_text)],
+        )
+        if needs_compaction(conversation):
+            spawn(compact_conversation(user["uid"], conversation_id), name=f"counselling_compact:{conversation_id}")
 
         return {
             "success": True,
+            "conversation_id": conversation_id,
             "text": combined_text,              # Preferred: ready-to-display plain text
             "answer": answer_txt,               # Structured fields kept for flexibility
             "follow_up_question": followup_txt,
             "raw": response.get("raw")
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         # Log full stack for debugging and return a graceful fallback so the UI doesn't break
         import traceback, sys
@@ -1058,7 +1425,9 @@ async def test_create_session(payload: dict, user = Depends(verify_firebase_toke
     """Test route to verify Firestore write operations work correctly"""
     try:
         session_id = str(uuid.uuid4())
-        session_doc = create_session(session_id, user["uid"], payload.get("domain", "test"))
+        await create_session(session_id, user["uid"], payload.get("domain", "test"))
+        # Re-read: the created document still holds SERVER_TIMESTAMP sentinels, which are not JSON-encodable
+        session_doc = await get_session(session_id)
         return {
             "success": True,
             "session_id": session_id,
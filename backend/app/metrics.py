@@ -0,0 +1,362 @@
+# app/metrics.py
+"""
+Request timing, dependency spans and a small Prometheus text exporter.
+
+TimingMiddleware opens a per-request RequestStats in a ContextVar. Code on the
+hot path wraps dependency calls in span()/instrumented() so the time spent in
+token verification, Firestore and Gemini is attributed to the request. Each
+response gets a Server-Timing header, and aggregated histograms/counters are
+exposed in Prometheus text format via render() (served at /metrics).
+
+Metrics are per process; with several uvicorn workers each worker exposes its own.
+"""
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+TOKEN_BUCKETS = (128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        return []
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_num(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self):
+        out = []
+        with self._lock:
+            items = [(k, (list(s[0]), s[1], s[2])) for k, s in self._values.items()]
+        for key, (counts, total, count) in items:
+            for b, c in zip(self.buckets, counts):
+                le = 'le="%s"' % _fmt_num(b)
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {c}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_num(total)}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {count}")
+        return out
+
+
+_REGISTRY: Dict[str, _Metric] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _register(metric: _Metric) -> _Metric:
+    with _REGISTRY_LOCK:
+        existing = _REGISTRY.get(metric.name)
+        if existing is not None:
+            return existing
+        _REGISTRY[metric.name] = metric
+        return metric
+
+
+def counter(name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+    return _register(Counter(name, help_text, labelnames))
+
+
+def gauge(name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+    return _register(Gauge(name, help_text, labelnames))
+
+
+def histogram(name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help_text, labelnames, buckets))
+
+
+def render() -> str:
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY.values())
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REQUEST_LATENCY = histogram("http_request_duration_seconds", "End-to-end request latency", ("route", "method", "status"))
+DEPENDENCY_LATENCY = histogram("dependency_duration_seconds", "Time spent in a downstream dependency call", ("kind", "name"))
+FIRESTORE_OPS_PER_REQUEST = histogram("firestore_ops_per_request", "Firestore operations issued by one request", ("route", "op"), COUNT_BUCKETS)
+FIRESTORE_OPS = counter("firestore_ops_total", "Firestore operations", ("op",))
+LLM_TOKENS = counter("llm_tokens_total", "Gemini tokens consumed", ("function", "type"))
+LLM_PROMPT_TOKENS = histogram("llm_prompt_tokens", "Input tokens per Gemini call", ("function",), TOKEN_BUCKETS)
+
+
+# ----- Per-request state -----
+class RequestStats:
+    """Mutable per-request accumulator shared by everything running in the request's context."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.route: Optional[str] = None
+        self.spans: Dict[str, list] = {}  # kind -> [seconds, calls]
+        self.firestore: Dict[str, int] = {}  # op -> count
+        self.firestore_reads: Dict[str, int] = {}  # document path / query shape -> times read
+        self.llm_tokens: Dict[str, int] = {}  # prompt | output -> count
+
+    def add_span(self, kind: str, seconds: float):
+        cur = self.spans.setdefault(kind, [0.0, 0])
+        cur[0] += seconds
+        cur[1] += 1
+
+    def server_timing(self) -> str:
+        parts = []
+        for kind, (seconds, calls) in self.spans.items():
+            parts.append(f'{kind};dur={seconds * 1000:.1f};desc="{calls} call{"s" if calls != 1 else ""}"')
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+_active_kinds: ContextVar[frozenset] = ContextVar("active_span_kinds", default=frozenset())
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+@contextmanager
+def span(kind: str, name: str):
+    """Time a dependency call. Nested spans of the same kind only count once (outermost wins)."""
+    active = _active_kinds.get()
+    if kind in active:
+        yield
+        return
+    token = _active_kinds.set(active | {kind})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _active_kinds.reset(token)
+        DEPENDENCY_LATENCY.observe(elapsed, kind=kind, name=name)
+        stats = _current.get()
+        if stats is not None:
+            stats.add_span(kind, elapsed)
+
+
+def record_firestore_op(op: str, n: int = 1, key: str | None = None):
+    """Count n Firestore ops. key identifies a document get or query so repeated reads can be flagged."""
+    if n <= 0:
+        return
+    FIRESTORE_OPS.inc(n, op=op)
+    stats = _current.get()
+    if stats is not None:
+        stats.firestore[op] = stats.firestore.get(op, 0) + n
+        if key is not None:
+            stats.firestore_reads[key] = stats.firestore_reads.get(key, 0) + 1
+
+
+def record_llm_usage(function: str, prompt_tokens: int | None, output_tokens: int | None):
+    if prompt_tokens:
+        LLM_PROMPT_TOKENS.observe(prompt_tokens, function=function)
+    for typ, n in (("prompt", prompt_tokens), ("output", output_tokens)):
+        if not n:
+            continue
+        LLM_TOKENS.inc(n, function=function, type=typ)
+        stats = _current.get()
+        if stats is not None:
+            stats.llm_tokens[typ] = stats.llm_tokens.get(typ, 0) + int(n)
+
+
+def instrumented(kind: str, name: str | None = None):
+    """Decorator wrapping a sync or async function in span(kind, name)."""
+    def decorator(fn):
+        label = name or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(kind, label):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Callbacks run with the finished RequestStats (e.g. Firestore budget checks).
+# Exceptions propagate so strict checks can fail tests.
+_request_end_hooks: List[Callable[[RequestStats], None]] = []
+
+
+def on_request_end(hook: Callable[[RequestStats], None]) -> Callable[[RequestStats], None]:
+    if hook not in _request_end_hooks:
+        _request_end_hooks.append(hook)
+    return hook
+
+
+def _run_request_end_hooks(stats: RequestStats):
+    for hook in list(_request_end_hooks):
+        hook(stats)
+
+
+@contextmanager
+def request_scope(route: str = "adhoc"):
+    """Open a RequestStats outside HTTP (tests, scripts). Request-end hooks run on exit."""
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+    stats.route = route
+    _run_request_end_hooks(stats)
+
+
+# ----- ASGI middleware -----
+_route_paths: Dict[Any, str] = {}
+# Task serving each in-flight HTTP request -> its ASGI scope (read by the loop monitor from its own thread)
+_task_scopes: Dict[asyncio.Task, dict] = {}
+
+
+def route_for_task(task: Optional[asyncio.Task]) -> Optional[str]:
+    """Route template of the request a task is serving, or None if it is not serving one."""
+    scope = _task_scopes.get(task) if task is not None else None
+    return _route_label(scope) if scope is not None else None
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        app = scope.get("app")
+        for r in getattr(app, "routes", []) or []:
+            if getattr(r, "endpoint", None) is endpoint:
+                path = r.path
+                break
+        path = path or getattr(endpoint, "__name__", "unknown")
+        _route_paths[endpoint] = path
+    return path
+
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware (no extra task, so ContextVars set here are visible to
+    the endpoint) that records request latency, adds Server-Timing and flushes
+    per-request Firestore counts into the histograms.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        task = asyncio.current_task()
+        _task_scopes[task] = scope
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers") or [])
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_label(scope)
+            stats.route = route
+            REQUEST_LATENCY.observe(time.perf_counter() - stats.started, route=route, method=scope.get("method", ""), status=status_code)
+            for op in ("read", "write", "query"):
+                FIRESTORE_OPS_PER_REQUEST.observe(stats.firestore.get(op, 0), route=route, op=op)
+            _current.reset(token)
+            _task_scopes.pop(task, None)
+        _run_request_end_hooks(stats)
@@ -0,0 +1,156 @@
+# app/prompts.py
+"""
+Static Gemini instructions and token-budgeted prompt assembly for app/llm.py.
+
+The instruction blocks below are passed once as the model's system_instruction
+(llm._get_model caches one GenerativeModel per block) instead of being pasted
+into every prompt. Per-call content is sized against BUDGETS: each profile
+gives an input-token allowance per prompt section, and fit()/fit_recent()
+trim by estimated token count rather than by fixed character or item slices.
+
+Token counts are estimated locally (~4 characters per token for Gemini on
+English text) so assembling a prompt costs no extra round trip; the billed
+prompt_token_count is still recorded per call from usage_metadata.
+"""
+import os
+
+CHARS_PER_TOKEN = 4
+_ELLIPSIS = " …"
+
+# ----- System instructions -----
+EVALUATOR = (
+    "You are an educational evaluator. Given a question and a student's answer, "
+    "analyze correctness, provide concise constructive feedback, and decide whether the student "
+    "has understood the core concept. Output valid JSON only with keys: score (0..1), feedback (string), understood_concept (boolean).\n"
+    "Respond with JSON only, like:\n"
+    '{"score": 0.85, "feedback": "Your steps are correct; minor arithmetic slip in the last step.", "understood_concept": true}'
+)
+
+QUESTION_GENERATOR = """You are a tutoring question generator. Using the provided context and learner state, generate the NEXT question that is pedagogically sound and appropriately difficult. Use the learner's mistakes to craft helpful hints. Respond with strict JSON only.
+
+Output JSON ONLY. Choose ONE of the two formats, using the requested difficulty:
+MCQ format:
+{"question": "...", "options": ["...", "...", "...", "..."], "answer_index": 1, "difficulty": 3, "hint": "..."}
+
+Open-ended format:
+{"question": "...", "expected_answer": "...", "difficulty": 3, "hint": "..."}
+
+"hint" is optional in both formats."""
+
+LEARNER_SUMMARIZER = """You maintain a compact learner model for a tutoring session. Merge the previous summary with the new graded interactions. Keep only what is still relevant; at most 5 items per list, each under 15 words.
+
+Return JSON ONLY:
+{"weak_topics": ["..."], "recurring_mistakes": ["..."]}"""
+
+COUNSELLING_SUMMARIZER = (
+    "You maintain the memory of a career counselling conversation. Merge the previous summary with the "
+    "new turns into one updated summary of at most 150 words. Keep the user's goals, interests, constraints, "
+    "decisions and open questions, and the advice already given. Plain text only, no lists or markup."
+)
+
+TUTOR = "You are a helpful, precise tutor. Provide a clear, concise answer."
+
+TUTOR_WITH_FOLLOWUP = """You are a helpful, precise tutor. Answer the learner's question clearly and concisely, then write ONE follow-up question that checks their understanding of your answer, at the requested difficulty and using the learner state. Respond with strict JSON only.
+
+Output JSON ONLY:
+{"answer": "...", "followup": QUESTION}
+
+QUESTION is ONE of the two formats:
+MCQ format:
+{"question": "...", "options": ["...", "...", "...", "..."], "answer_index": 1, "difficulty": 3, "hint": "..."}
+
+Open-ended format:
+{"question": "...", "expected_answer": "...", "difficulty": 3, "hint": "..."}
+
+"hint" is optional in both formats."""
+
+CAREER_ADVISOR = """You are an AI career advisor. Return STRICT JSON only.
+
+Based on the user's profile and current job market trends, suggest suitable career paths.
+For each career, include:
+- title
+- why_fit
+- required_skills (array)
+- learning_roadmap (array of short actionable steps)
+- future_growth
+- related_roles (array)
+
+Return JSON ONLY:
+{"careers": [{"title": "...", "why_fit": "...", "required_skills": ["..."], "learning_roadmap": ["...", "..."], "future_growth": "...", "related_roles": ["...", "..."]}]}"""
+
+COUNSELLOR = """You are an adaptive counselling assistant specializing in career guidance and personal development. Your role is to:
+
+1. Provide clear, supportive, and detailed answers to the user's questions or concerns
+2. Structure your reply as:
+   - 1-2 short introductory paragraphs
+   - 3-7 concise bullet points (use bullets, not dashes or numbers)
+   - 1 unique, context-aware follow-up question (never generic)
+3. Never use JSON, code blocks, or any markup—output only plain text suitable for direct display in a chat UI.
+4. Maintain a professional yet empathetic counselling tone
+5. Guide the user step-by-step toward deeper understanding
+
+Important guidelines:
+- Be empathetic and non-judgmental
+- Ask open-ended questions that encourage self-reflection
+- Build on previous conversation context
+- Focus on career guidance, personal development, and educational pathways
+- Keep responses conversational yet professional
+- Aim for a thorough response (8-12 sentences + bullets) with concrete, actionable suggestions where appropriate
+- Do NOT use any generic or repeated follow-up questions. Every follow-up must be tailored to the user's message and your answer, and always appear as the last paragraph prefixed with 'Next step:'
+
+Reply in plain text ONLY (no JSON, no code blocks)."""
+
+# ----- Token budgets -----
+# Input-token allowance per prompt section, per llm.py function. LLM_PROMPT_BUDGET_SCALE
+# scales them all (e.g. 0.5 to halve prompt size while load testing).
+BUDGETS = {
+    "evaluate_answer": {"question": 600, "answer": 1200},
+    "generate_next_question": {"history": 700, "last_answer": 125, "last_feedback": 150},
+    "summarize_learner": {"interactions": 900},
+    "summarize_counselling": {"summary": 300, "turns": 2000},
+    "answer_question": {"context": 1500, "query": 500},
+    "answer_with_followup": {"history": 700, "query": 500},
+    "generate_career_paths": {"profile": 400},
+    "counselling_response": {"profile": 150, "summary": 300, "history": 1200, "message": 800},
+}
+_SCALE = float(os.getenv("LLM_PROMPT_BUDGET_SCALE", "1"))
+
+
+def budget(profile: str, section: str) -> int:
+    return max(1, int(BUDGETS[profile][section] * _SCALE))
+
+
+def estimate_tokens(text: str | None) -> int:
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate(text: str | None, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, preferring a word boundary."""
+    text = str(text or "")
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[: max(0, max_tokens * CHARS_PER_TOKEN - len(_ELLIPSIS))]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + _ELLIPSIS
+
+
+def fit(profile: str, section: str, text: str | None) -> str:
+    return truncate(text, budget(profile, section))
+
+
+def fit_recent(profile: str, section: str, blocks: list[str]) -> list[str]:
+    """Keep the most recent blocks (oldest first in, oldest first out) that fit the section budget.
+    The newest block is always kept, truncated if it alone exceeds the budget."""
+    remaining = budget(profile, section)
+    kept: list[str] = []
+    for block in reversed(blocks):
+        cost = estimate_tokens(block) + 1
+        if cost > remaining:
+            if not kept:
+                kept.append(truncate(block, remaining))
+            break
+        kept.append(block)
+        remaining -= cost
+    return kept[::-1]
@@ -0,0 +1,293 @@
+# app/question_bank.py
+"""
+Question bank: generated questions reused across sessions, keyed by (domain, topic, difficulty).
+
+question_bank/{id} holds one complete question (question_text, options + answer_index
+or expected_answer, hint) under bank_key "domain|topic|difficulty" (normalized), with
+quality signals in stats: served, answered, skipped, score_sum and score_hist (counts
+per fifth of the 0..1 score range). The id hashes the key and the normalized text,
+so the same question is banked once and re-banking it keeps its stats.
+
+/next-question calls pick() first. A hit is a banked question the session has not
+been served (sessions/{id}.bank_served, plus the texts of its recent questions) that
+passes the quality gates, preferring questions whose observed mean score is closest
+to the learner's proficiency; it is served without an LLM call. On a miss the handler
+generates with Gemini as before and bank() adds the new question in the background;
+when the key holds fewer than BANK_MIN_SIZE questions, maybe_backfill() also has a
+background task generate up to BANK_BACKFILL more for it.
+
+Quality gates (once a question has _MIN_OBSERVATIONS serves / answers):
+- skip rate at most BANK_MAX_SKIP_RATE (a skip is asking for the next question
+  without answering the banked one);
+- mean score inside _SCORE_RANGE (outside it the answer key is likely wrong or the
+  question is mis-levelled).
+
+Candidates for a key (up to BANK_CANDIDATES, from a random point in id order) are
+cached per worker for BANK_CACHE_TTL seconds, so most picks cost no Firestore reads.
+
+app/calibration.py periodically re-levels banked questions from their responses
+(Rasch difficulty in irt, with difficulty and bank_key moved to the calibrated level); add_bank_questions
+leaves bank_key and difficulty alone on calibrated questions, so re-banking or seeding keeps that level.
+
+    python -m app.question_bank seed    # bank the existing questions_generated documents
+
+Metrics: question_bank_lookups_total{result=hit|miss|empty}, question_bank_added_total{source}.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import secrets
+import time
+from typing import Dict, List, Optional, Tuple
+
+from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+
+from .background import spawn
+from .llm import FALLBACK_QUESTION
+from .metrics import counter
+
+QUESTION_BANK = os.getenv("QUESTION_BANK", "1").strip().lower() not in ("0", "false", "no")
+BANK_CANDIDATES = int(os.getenv("BANK_CANDIDATES", "20"))
+BANK_CACHE_TTL = float(os.getenv("BANK_CACHE_TTL", "60"))
+BANK_MIN_SIZE = int(os.getenv("BANK_MIN_SIZE", "20"))
+BANK_BACKFILL = int(os.getenv("BANK_BACKFILL", "2"))
+BANK_MAX_SKIP_RATE = float(os.getenv("BANK_MAX_SKIP_RATE", "0.4"))
+_MIN_OBSERVATIONS = 10
+_SCORE_RANGE = (0.05, 0.98)
+_PICK_FROM = 5
+_HIST_BUCKETS = 5
+_ID_LENGTH = 32
+
+LOOKUPS = counter("question_bank_lookups_total", "Question bank lookups by /next-question", ("result",))
+ADDED = counter("question_bank_added_total", "Questions added to the question bank", ("source",))
+
+_cache: Dict[str, Tuple[float, List[dict]]] = {}
+_backfilling: set = set()
+
+
+def _normalize(text) -> str:
+    return " ".join(str(text or "").split()).casefold()
+
+
+def bank_key(domain: str | None, topic: str | None, difficulty: int) -> str:
+    return f"{_normalize(domain) or 'general'}|{_normalize(topic)}|{int(difficulty)}"
+
+
+def bank_id(key: str, question_text: str) -> str:
+    return hashlib.sha256(f"{key}\n{_normalize(question_text)}".encode("utf-8")).hexdigest()[:_ID_LENGTH]
+
+
+def _usable(qdata: dict) -> bool:
+    """A complete generated question: an MCQ with a valid answer key or an open question with an expected answer."""
+    text = _normalize(qdata.get("question") or qdata.get("question_text"))
+    if not text or qdata.get("fallback") or "raw_text" in qdata or text == _normalize(FALLBACK_QUESTION):
+        return False  # generate_next_question's fallback when the model output was not JSON
+    options = qdata.get("options")
+    if options:
+        try:
+            return isinstance(options, list) and 0 <= int(qdata.get("answer_index")) < len(options)
+        except (TypeError, ValueError):
+            return False
+    return bool(_normalize(qdata.get("expected_answer")))
+
+
+def bank_document(domain: str | None, topic: str | None, difficulty: int, qdata: dict, source_question_id: str | None = None) -> Optional[Tuple[str, dict]]:
+    """(bank_id, body) for a generated question (generate_next_question shape), or None if it is not bankable."""
+    if not _usable(qdata):
+        return None
+    key = bank_key(domain, topic, difficulty)
+    text = qdata.get("question") or qdata.get("question_text")
+    body = {
+        "bank_key": key,
+        "domain": domain,
+        "topic": topic,
+        "difficulty": int(difficulty),
+        "question_text": text,
+        "updatedAt": SERVER_TIMESTAMP,
+    }
+    for field in ("options", "answer_index", "expected_answer", "hint"):
+        if qdata.get(field) is not None:
+            body[field] = qdata[field]
+    if source_question_id:
+        body["source_question_id"] = source_question_id
+    return bank_id(key, text), body
+
+
+# ----- Quality signals -----
+def _stats(q: dict) -> dict:
+    return q.get("stats") or {}
+
+
+def mean_score(q: dict) -> Optional[float]:
+    stats = _stats(q)
+    answered = stats.get("answered") or 0
+    return (stats.get("score_sum") or 0.0) / answered if answered else None
+
+
+def passes_quality(q: dict) -> bool:
+    stats = _stats(q)
+    served = stats.get("served") or 0
+    if served >= _MIN_OBSERVATIONS and (stats.get("skipped") or 0) / served > BANK_MAX_SKIP_RATE:
+        return False
+    if (stats.get("answered") or 0) >= _MIN_OBSERVATIONS:
+        low, high = _SCORE_RANGE
+        if not low <= mean_score(q) <= high:
+            return False
+    return True
+
+
+async def record_answer(bank_question_id: str, score: float):
+    from .db_async import increment_bank_stats
+
+    score = max(0.0, min(1.0, float(score)))
+    bucket = min(_HIST_BUCKETS - 1, int(score * _HIST_BUCKETS))
+    await increment_bank_stats(bank_question_id, {"answered": 1, "score_sum": score, f"score_hist.{bucket}": 1})
+
+
+async def record_skip(bank_question_id: str):
+    from .db_async import increment_bank_stats
+
+    await increment_bank_stats(bank_question_id, {"skipped": 1})
+
+
+# ----- Lookup -----
+async def _candidates(key: str) -> List[dict]:
+    from .db_async import list_bank_questions
+
+    cached = _cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    # Start from a random id so repeated loads spread over a large key, then wrap around
+    pivot = secrets.token_hex(_ID_LENGTH // 2)
+    docs = await list_bank_questions(key, start_at=pivot, limit=BANK_CANDIDATES)
+    if len(docs) < BANK_CANDIDATES:
+        ids = {d["id"] for d in docs}
+        docs += [d for d in await list_bank_questions(key, limit=BANK_CANDIDATES - len(docs)) if d["id"] not in ids]
+    _cache[key] = (time.monotonic() + BANK_CACHE_TTL, docs)
+    return docs
+
+
+async def pick(session: dict, domain: str | None, topic: str | None, difficulty: int, proficiency: float, recent_questions: List[str]) -> Optional[dict]:
+    """An unseen banked question that fits the learner, or None (the caller generates one)."""
+    key = bank_key(domain, topic, difficulty)
+    candidates = await _candidates(key)
+    served = set(session.get("bank_served") or [])
+    recent = {_normalize(t) for t in recent_questions if t}
+    eligible = [
+        q for q in candidates
+        if q.get("question_text") and q["id"] not in served and _normalize(q["question_text"]) not in recent and passes_quality(q)
+    ]
+    if not eligible:
+        LOOKUPS.inc(result="miss" if candidates else "empty")
+        return None
+    # Unanswered questions count as a fit, so new questions get observed
+    eligible.sort(key=lambda q: abs((mean_score(q) if mean_score(q) is not None else proficiency) - proficiency))
+    LOOKUPS.inc(result="hit")
+    return random.choice(eligible[:_PICK_FROM])
+
+
+# ----- Adding questions -----
+async def bank(questions: List[Tuple[str, dict]], source: str):
+    from .db_async import add_bank_questions
+
+    if not questions:
+        return
+    await add_bank_questions(questions)
+    ADDED.inc(len(questions), source=source)
+    for qid, body in questions:
+        cached = _cache.get(body["bank_key"])
+        if cached is not None and all(d["id"] != qid for d in cached[1]):
+            cached[1].append({**body, "id": qid})
+
+
+def bank_generated(domain: str | None, topic: str | None, difficulty: int, qdata: dict, question_id: str):
+    """Bank a question generated on a miss, in the background."""
+    doc = bank_document(domain, topic, difficulty, qdata, source_question_id=question_id)
+    if doc is not None:
+        spawn(bank([doc], source="miss"), name=f"question_bank:{doc[0]}")
+
+
+def maybe_backfill(domain: str | None, topic: str | None, difficulty: int):
+    """Top up a key that holds fewer than BANK_MIN_SIZE questions with BANK_BACKFILL generated ones."""
+    key = bank_key(domain, topic, difficulty)
+    cached = _cache.get(key)
+    if BANK_BACKFILL <= 0 or key in _backfilling or cached is None:
+        return
+    if len(cached[1]) >= min(BANK_MIN_SIZE, BANK_CANDIDATES):
+        return
+    _backfilling.add(key)
+    spawn(_backfill(key, domain, topic, difficulty, [q.get("question_text") for q in cached[1]]), name=f"question_bank_backfill:{key}")
+
+
+async def _backfill(key: str, domain: str | None, topic: str | None, difficulty: int, known: List[str]):
+    from .llm import generate_next_question
+
+    try:
+        docs = []
+        for _ in range(BANK_BACKFILL):
+            qdata = await asyncio.to_thread(
+                generate_next_question,
+                domain=domain,
+                topic=topic,
+                difficulty=difficulty,
+                proficiency=0.5,
+                history=[{"question_text": t} for t in known[-10:]],
+                last_feedback=None,
+            )
+            doc = bank_document(domain, topic, difficulty, qdata)
+            if doc is not None:
+                docs.append(doc)
+                known.append(doc[1]["question_text"])
+        await bank(docs, source="backfill")
+    finally:
+        _backfilling.discard(key)
+
+
+# ----- Seeding from questions_generated -----
+def seed(page_size: int = 500) -> int:
+    """
+    Bank every usable questions_generated document; returns how many were banked.
+    /ask-followup follow-ups (question_meta.related_to) and fallback questions are skipped.
+    """
+    from .db import add_bank_questions, list_generated_questions
+
+    total, last = 0, None
+    while True:
+        page = list_generated_questions(start_after=last, limit=page_size)
+        if not page:
+            return total
+        last = page[-1]["id"]
+        docs = {}
+        for q in page:
+            meta = q.get("question_meta") or {}
+            if meta.get("related_to") or meta.get("generated_by") == "fallback":
+                continue
+            try:
+                difficulty = int(meta.get("difficulty"))
+            except (TypeError, ValueError):
+                continue
+            doc = bank_document(meta.get("domain"), meta.get("topic"), difficulty, q, source_question_id=q["id"])
+            if doc is not None:
+                docs[doc[0]] = doc[1]
+        add_bank_questions(list(docs.items()))
+        ADDED.inc(len(docs), source="seed")
+        total += len(docs)
+        print(f"[INFO] Banked {total} questions (through questions_generated/{last})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Question bank maintenance")
+    parser.add_argument("command", choices=["seed"], help="seed: bank the existing questions_generated documents")
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+    from .config import STORAGE_BACKEND
+    if STORAGE_BACKEND == "firestore":
+        from . import auth  # noqa: F401  (initializes Firebase)
+    if args.command == "seed":
+        print(f"[INFO] Question bank seeded with {seed(args.page_size)} questions")
+
+
+if __name__ == "__main__":
+    main()
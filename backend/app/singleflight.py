@@ -0,0 +1,124 @@
+# app/singleflight.py
+"""
+Single-flight coalescing for expensive LLM calls from route handlers.
+
+Concurrent calls with the same key (uid + endpoint + normalized inputs, see
+flight_key) share one upstream call and all receive its result:
+
+- within a worker, later callers await the first caller's task;
+- across workers, when REDIS_URL is set and redis.asyncio is importable, the
+  first caller takes a short Redis lock (SET NX PX) and publishes its result
+  under the key; callers in other workers poll for that result instead of
+  calling Gemini themselves. If the leader fails or the lock expires without
+  a result, they fall back to making the call.
+
+call() also runs sync llm.py functions in a worker thread so waiting on
+Gemini does not block the event loop.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict
+
+from .metrics import counter
+
+SINGLEFLIGHT_LOCK_TTL = float(os.getenv("SINGLEFLIGHT_LOCK_TTL", "60"))
+SINGLEFLIGHT_RESULT_TTL = float(os.getenv("SINGLEFLIGHT_RESULT_TTL", "10"))
+_POLL_INTERVAL = 0.05
+_KEY_PREFIX = "sf:v1:"
+
+FLIGHTS = counter("singleflight_requests_total", "Coalescable LLM calls by role", ("endpoint", "role"))
+
+# Optional Redis tier (async client)
+try:
+    import redis.asyncio as aioredis  # type: ignore
+    REDIS_URL = os.getenv("REDIS_URL")
+    _redis = aioredis.from_url(REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5) if REDIS_URL else None
+except Exception:
+    _redis = None
+
+# Release the lock only if we still own it
+_RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def flight_key(endpoint: str, uid: str, inputs: dict) -> str:
+    material = json.dumps(inputs, sort_keys=True, default=str)
+    material = " ".join(material.split())
+    return f"{endpoint}:{uid}:{hashlib.sha256(material.encode('utf-8')).hexdigest()[:32]}"
+
+
+async def _run_shared(key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    endpoint = key.split(":", 1)[0]
+    if _redis is None:
+        FLIGHTS.inc(endpoint=endpoint, role="leader")
+        return await fn()
+    lock_key, result_key = f"{_KEY_PREFIX}lock:{key}", f"{_KEY_PREFIX}result:{key}"
+    token = uuid.uuid4().hex
+    try:
+        acquired = await _redis.set(lock_key, token, nx=True, px=int(SINGLEFLIGHT_LOCK_TTL * 1000))
+    except Exception:
+        acquired = True  # Redis unavailable: behave as a plain per-worker flight
+        lock_key = None
+    if acquired:
+        FLIGHTS.inc(endpoint=endpoint, role="leader")
+        try:
+            result = await fn()
+            if lock_key is not None:
+                try:
+                    await _redis.set(result_key, json.dumps(result, default=str), px=int(SINGLEFLIGHT_RESULT_TTL * 1000))
+                except Exception:
+                    pass
+            return result
+        finally:
+            if lock_key is not None:
+                try:
+                    await _redis.eval(_RELEASE, 1, lock_key, token)
+                except Exception:
+                    pass
+
+    # Another worker is making this call: wait for its published result
+    deadline = time.monotonic() + SINGLEFLIGHT_LOCK_TTL
+    try:
+        while time.monotonic() < deadline:
+            await asyncio.sleep(_POLL_INTERVAL)
+            data = await _redis.get(result_key)
+            if data:
+                FLIGHTS.inc(endpoint=endpoint, role="remote_waiter")
+                return json.loads(data)
+            if not await _redis.exists(lock_key):
+                break
+    except Exception:
+        pass
+    FLIGHTS.inc(endpoint=endpoint, role="leader")
+    return await fn()
+
+
+async def run(key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """Run fn() once for all concurrent callers with this key and return its result to each."""
+    task = _inflight.get(key)
+    if task is not None:
+        FLIGHTS.inc(endpoint=key.split(":", 1)[0], role="local_waiter")
+        return await asyncio.shield(task)
+    # A separate task, so a disconnecting leader does not cancel the call for its waiters
+    task = asyncio.ensure_future(_run_shared(key, fn))
+    _inflight[key] = task
+    task.add_done_callback(functools.partial(_done, key))
+    return await asyncio.shield(task)
+
+
+def _done(key: str, task: asyncio.Task):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()  # mark retrieved; callers that are still waiting re-raise it
+
+
+async def call(endpoint: str, uid: str, fn: Callable[..., Any], **kwargs) -> Any:
+    """Coalesced fn(**kwargs) for a sync llm.py function, run in a worker thread."""
+    return await run(flight_key(endpoint, uid, kwargs), lambda: asyncio.to_thread(fn, **kwargs))
@@ -0,0 +1,85 @@
+# app/storage.py
+"""
+Storage repository interface and backend selection.
+
+REPOSITORY lists the persistence functions every backend provides, with the
+names, arguments and document shapes of db.py (the Firestore implementation).
+STORAGE_BACKEND (app/config.py) picks the implementation:
+
+    firestore  (default) db.py / db_async.py on the Firebase Admin clients
+    sqlite     db_sqlite.py, a local SQLite file at SQLITE_PATH (WAL mode)
+
+db.py and db_async.py install the selected backend's functions over their own
+at import time, so callers keep importing from them as before. Helpers that
+only build documents (_new_session_doc, _tail_update, ...) are shared.
+"""
+import asyncio
+import functools
+from typing import Callable, Dict
+
+from .config import STORAGE_BACKEND
+
+REPOSITORY = {
+    "sessions": (
+        "create_session", "get_session", "update_session", "get_user_sessions",
+        "get_session_proficiency", "set_session_proficiency",
+        "get_session_difficulty", "set_session_difficulty",
+        "append_session_history", "record_session_evaluation", "record_session_evaluations",
+    ),
+    "interactions": (
+        "store_interaction", "get_interaction", "update_interaction", "get_last_interaction",
+        "get_recent_interactions", "get_session_interactions",
+        "create_question_interaction", "create_answer_interaction", "create_interactions",
+    ),
+    "responses": ("store_response", "store_generated_question", "get_generated_question", "write_documents"),
+    "skill_state": ("update_skill_state", "get_skill_state"),
+    "users": ("create_user_profile", "get_user_profile"),
+    "opportunities": ("create_opportunity", "list_opportunities", "get_opportunity_by_id"),
+    "saved_items": (
+        "save_opportunity_for_user", "unsave_opportunity_for_user", "list_saved_opportunities",
+        "mark_applied_opportunity", "list_applied_opportunities",
+    ),
+    "counselling": (
+        "save_counselling_session", "get_counselling_session", "get_latest_counselling_session",
+        "set_counselling_career_paths", "append_counselling_turns", "update_counselling_summary",
+    ),
+    "idempotency": (
+        "create_idempotency_record", "claim_idempotency_record", "get_idempotency_record",
+        "set_idempotency_record", "delete_idempotency_record",
+    ),
+    "source_logs": ("create_source_log",),
+    "question_bank": (
+        "list_bank_questions", "add_bank_questions", "create_bank_question_interaction",
+        "increment_bank_stats", "list_generated_questions",
+    ),
+    "calibration": ("list_response_scores",),
+}
+
+BACKENDS = ("firestore", "sqlite")
+
+
+def repository_functions() -> tuple:
+    return tuple(name for names in REPOSITORY.values() for name in names)
+
+
+def _as_async(fn: Callable) -> Callable:
+    # Writes can wait up to the busy timeout for the SQLite write lock, which must not block
+    # the event loop; db_sqlite keeps one connection per thread, so worker threads are safe
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return wrapper
+
+
+def backend_functions(asynchronous: bool = False) -> Dict[str, Callable]:
+    """Repository functions of the configured non-Firestore backend, as coroutines if `asynchronous`."""
+    if STORAGE_BACKEND not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}; expected one of {', '.join(BACKENDS)}")
+    from . import db_sqlite as backend
+    missing = [name for name in repository_functions() if not callable(getattr(backend, name, None))]
+    if missing:
+        raise RuntimeError(f"Storage backend {STORAGE_BACKEND} is missing: {', '.join(missing)}")
+    fns = {name: getattr(backend, name) for name in repository_functions()}
+    if asynchronous:
+        fns = {name: _as_async(fn) for name, fn in fns.items()}
+    return fns
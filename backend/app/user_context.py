@@ -0,0 +1,65 @@
+# app/user_context.py
+"""
+Request-scoped user context: profile (users/{uid}) and latest counselling session.
+
+Inject with `ctx: UserContext = Depends(get_user_context)`. FastAPI caches
+dependencies per request, so every consumer in a request shares one
+UserContext; the first `await ctx.profile()` / `await ctx.counselling()` loads
+both documents concurrently and later calls reuse the result. A short per-worker
+TTL cache (USER_CONTEXT_TTL seconds, default 30) also spans requests; handlers
+that write either document call invalidate_user_context(uid).
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends
+
+from .auth import get_current_user
+from .db_async import get_latest_counselling_session, get_user_profile
+
+USER_CONTEXT_TTL = float(os.getenv("USER_CONTEXT_TTL", "30"))
+
+# uid -> (expires_at, profile, latest_counselling)
+_cache: Dict[str, Tuple[float, dict, dict]] = {}
+
+
+def invalidate_user_context(uid: str) -> None:
+    _cache.pop(uid, None)
+
+
+class UserContext:
+    def __init__(self, uid: str):
+        self.uid = uid
+        self._task: Optional[asyncio.Task] = None
+
+    async def _load(self) -> Tuple[dict, dict]:
+        hit = _cache.get(self.uid)
+        if hit and hit[0] > time.monotonic():
+            return hit[1], hit[2]
+        profile, latest = await asyncio.gather(
+            get_user_profile(self.uid),
+            get_latest_counselling_session(self.uid),
+        )
+        profile, latest = profile or {}, latest or {}
+        if USER_CONTEXT_TTL > 0:
+            _cache[self.uid] = (time.monotonic() + USER_CONTEXT_TTL, profile, latest)
+        return profile, latest
+
+    async def load(self) -> Tuple[dict, dict]:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._load())
+        return await asyncio.shield(self._task)
+
+    async def profile(self) -> dict:
+        """users/{uid} document ({} if missing)."""
+        return (await self.load())[0]
+
+    async def counselling(self) -> dict:
+        """Latest counselling session ({} if none)."""
+        return (await self.load())[1]
+
+
+async def get_user_context(user: dict = Depends(get_current_user)) -> UserContext:
+    return UserContext(user["uid"])
@@ -0,0 +1,230 @@
+# app/write_behind.py
+"""
+Write-behind buffer for audit/analytics documents the response does not depend on
+(responses/{id} from /evaluate-answer, questions_generated/{id} from question generation).
+
+store_response() / store_generated_question() queue the document and return at
+once; a flusher task on the event loop commits queued documents with
+db_async.write_documents every WRITE_BEHIND_FLUSH_MS or as soon as
+WRITE_BEHIND_BATCH are waiting. createdAt is the enqueue time, not the flush time.
+
+- Failed flushes are retried with backoff, up to WRITE_BEHIND_RETRIES attempts
+  per document; documents that still fail are appended to WRITE_BEHIND_SPOOL.
+- On graceful shutdown stop() flushes everything; whatever cannot be written is
+  spooled, and start() re-queues the spool on the next startup.
+- pending(collection, id) serves documents this worker has queued but not yet
+  written (the MCQ answer key in questions_generated is read back by
+  /evaluate-answer's fallback grading).
+
+Metrics: write_behind_documents_total{collection, result=queued|written|retried|spooled},
+write_behind_pending, write_behind_flush_seconds.
+"""
+import asyncio
+import contextvars
+import datetime as dt
+import json
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from .config import BASE_DIR
+from .metrics import LATENCY_BUCKETS, counter, gauge, histogram
+
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "200"))
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "100"))
+WRITE_BEHIND_RETRIES = int(os.getenv("WRITE_BEHIND_RETRIES", "5"))
+WRITE_BEHIND_SPOOL = os.getenv("WRITE_BEHIND_SPOOL", str(BASE_DIR / "data" / "write_behind.jsonl"))
+_MAX_BACKOFF = 30.0
+
+DOCUMENTS = counter("write_behind_documents_total", "Write-behind documents by outcome", ("collection", "result"))
+PENDING = gauge("write_behind_pending", "Documents queued for write-behind")
+FLUSH_LATENCY = histogram("write_behind_flush_seconds", "Time to commit one write-behind batch", (), LATENCY_BUCKETS)
+
+
+class _Entry:
+    __slots__ = ("collection", "doc_id", "body", "attempts")
+
+    def __init__(self, collection: str, doc_id: str, body: dict, attempts: int = 0):
+        self.collection = collection
+        self.doc_id = doc_id
+        self.body = body
+        self.attempts = attempts
+
+
+def _encode(value):
+    if isinstance(value, dt.datetime):
+        return {"__datetime__": value.isoformat()}
+    return str(value)
+
+
+def _decode(obj: dict):
+    if len(obj) == 1 and "__datetime__" in obj:
+        return dt.datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+class WriteBehind:
+    def __init__(self):
+        self._queue: Deque[_Entry] = deque()
+        self._index: Dict[Tuple[str, str], _Entry] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._backoff = 0.0
+        self._stopping = False
+
+    # ----- Producer side -----
+    def enqueue(self, collection: str, doc_id: str, body: dict):
+        entry = _Entry(collection, doc_id, body)
+        self._queue.append(entry)
+        self._index[(collection, doc_id)] = entry
+        DOCUMENTS.inc(collection=collection, result="queued")
+        PENDING.set(len(self._queue))
+        self._ensure_started()
+        if self._wake is not None and len(self._queue) >= WRITE_BEHIND_BATCH:
+            self._wake.set()
+
+    def pending(self, collection: str, doc_id: str) -> Optional[dict]:
+        entry = self._index.get((collection, doc_id))
+        return dict(entry.body) if entry is not None else None
+
+    # ----- Lifecycle -----
+    def _ensure_started(self):
+        if self._stopping or (self._task is not None and not self._task.done()):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no loop yet; start() or the next enqueue from a handler starts the flusher
+        self._wake = asyncio.Event()
+        # Fresh context: flushes are not counted against the request that happened to start the flusher
+        self._task = loop.create_task(self._run(), name="write_behind_flusher", context=contextvars.Context())
+
+    async def start(self):
+        """Re-queue documents spooled by a previous shutdown and start the flusher."""
+        for entry in self._read_spool():
+            self._queue.append(entry)
+            self._index[(entry.collection, entry.doc_id)] = entry
+        PENDING.set(len(self._queue))
+        self._ensure_started()
+
+    async def stop(self):
+        """Flush everything still queued; spool what cannot be written."""
+        # Let the flusher finish its current batch rather than cancelling a write mid-flight
+        self._stopping = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            self._task = None
+        while self._queue:
+            if not await self._flush_once(final=True):
+                break
+        if self._queue:
+            self._spool(list(self._queue))
+            self._queue.clear()
+            self._index.clear()
+            PENDING.set(0)
+
+    # ----- Flushing -----
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=WRITE_BEHIND_FLUSH_MS / 1000.0 + self._backoff)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while self._queue and not self._stopping:
+                if not await self._flush_once():
+                    break
+                if len(self._queue) < WRITE_BEHIND_BATCH:
+                    break
+
+    async def _flush_once(self, final: bool = False) -> bool:
+        """Commit one batch from the head of the queue. False if the write failed."""
+        from .db_async import write_documents
+
+        batch: List[_Entry] = [self._queue.popleft() for _ in range(min(WRITE_BEHIND_BATCH, len(self._queue)))]
+        start = time.perf_counter()
+        try:
+            await write_documents([(e.collection, e.doc_id, e.body) for e in batch])
+        except Exception as e:
+            failed: List[_Entry] = []
+            for entry in batch:
+                entry.attempts += 1
+                if entry.attempts >= WRITE_BEHIND_RETRIES and not final:
+                    failed.append(entry)
+                    self._index.pop((entry.collection, entry.doc_id), None)
+                else:
+                    DOCUMENTS.inc(collection=entry.collection, result="retried")
+            retry = [entry for entry in batch if entry not in failed]
+            self._queue.extendleft(reversed(retry))
+            if failed:
+                self._spool(failed)
+            self._backoff = min(_MAX_BACKOFF, max(0.5, self._backoff * 2))
+            PENDING.set(len(self._queue))
+            print(f"[WARN] Write-behind flush of {len(batch)} documents failed: {e}")
+            return False
+        FLUSH_LATENCY.observe(time.perf_counter() - start)
+        self._backoff = 0.0
+        for entry in batch:
+            if self._index.get((entry.collection, entry.doc_id)) is entry:
+                del self._index[(entry.collection, entry.doc_id)]
+            DOCUMENTS.inc(collection=entry.collection, result="written")
+        PENDING.set(len(self._queue))
+        return True
+
+    # ----- Spool (documents that could not be written) -----
+    def _spool(self, entries: List[_Entry]):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(WRITE_BEHIND_SPOOL)), exist_ok=True)
+            with open(WRITE_BEHIND_SPOOL, "a", encoding="utf-8") as f:
+                for e in entries:
+                    f.write(json.dumps({"collection": e.collection, "id": e.doc_id, "body": e.body}, default=_encode) + "\n")
+            for e in entries:
+                DOCUMENTS.inc(collection=e.collection, result="spooled")
+            print(f"[WARN] Spooled {len(entries)} write-behind documents to {WRITE_BEHIND_SPOOL}")
+        except Exception as ex:
+            print(f"[ERROR] Failed to spool {len(entries)} write-behind documents: {ex}")
+
+    def _read_spool(self) -> List[_Entry]:
+        if not os.path.exists(WRITE_BEHIND_SPOOL):
+            return []
+        entries = []
+        try:
+            with open(WRITE_BEHIND_SPOOL, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line, object_hook=_decode)
+                    except ValueError:
+                        continue
+                    entries.append(_Entry(rec["collection"], rec["id"], rec["body"]))
+            os.remove(WRITE_BEHIND_SPOOL)
+        except OSError as e:
+            print(f"[WARN] Failed to read write-behind spool {WRITE_BEHIND_SPOOL}: {e}")
+        if entries:
+            print(f"[INFO] Re-queued {len(entries)} spooled write-behind documents")
+        return entries
+
+
+buffer = WriteBehind()
+
+
+def _now() -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc)
+
+
+# Drop-in for db_async.store_response / store_generated_question (same document shapes)
+def store_response(response_id: str, payload: dict) -> dict:
+    payload = {**payload, "createdAt": _now()}
+    buffer.enqueue("responses", response_id, payload)
+    return payload
+
+
+def store_generated_question(question_id: str, payload: dict) -> dict:
+    payload = {**payload, "createdAt": _now()}
+    buffer.enqueue("questions_generated", question_id, payload)
+    return payload
+
+
+def pending(collection: str, doc_id: str) -> Optional[dict]:
+    return buffer.pending(collection, doc_id)
@@ -0,0 +1,423 @@
+"""
+End-to-end API benchmark: the FastAPI app against the Firestore emulator with
+the fake LLM backend and stubbed token verification.
+
+    gcloud emulators firestore start --host-port=localhost:8080
+    cd backend
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m bench.api_bench \
+        --concurrency 16 --duration 60 --mix tutoring=6,counselling=2,search=2 \
+        --llm-latency lognormal:800,0.5 --json bench-results.json
+
+The app runs in-process under uvicorn on a local port and is driven over real
+HTTP by --concurrency workers for --duration seconds (after --warmup seconds
+whose requests are not counted). Each worker plays one seeded user and picks
+a scenario per iteration from --mix:
+
+    tutoring     POST /next-question, POST /evaluate-answer, POST /ask-followup, POST /ask
+    counselling  POST /counselling (x2, same conversation), GET /career-paths
+    search       POST /api/opportunities/search (x2 pages), GET /api/users/{uid}/recommended
+
+Reported per route: p50/p95/p99 latency, requests/s, error count and Firestore
+ops per request (from the app's firestore_ops_per_request histogram); overall:
+throughput and event-loop lag (how late a 10 ms timer on the app's loop fires).
+The app's loop monitor (app/loop_monitor.py) is on for the run; blocks it
+records are listed by route and call site, and --fail-on-block makes the run
+exit 1 if any occurred, so a new blocking call fails a CI benchmark.
+Tokens are "bench-<uid>" and are accepted without Firebase verification.
+With STORAGE_BACKEND=sqlite (and SQLITE_PATH pointing at a scratch file) no
+emulator is needed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+SCENARIOS = ("tutoring", "counselling", "search")
+TOPICS = ["fractions", "photosynthesis", "newton's laws", "python loops", "supply and demand"]
+DOMAINS = ["Technology", "Science", "Business", "Design", "Healthcare"]
+OPPORTUNITY_TYPES = ["Internship", "Job", "Competition", "Scholarship"]
+QUERIES = ["data", "design", "research", "software", "marketing", ""]
+
+_LAG_INTERVAL = 0.01
+_METRIC_LINE = re.compile(r'^firestore_ops_per_request_(sum|count)\{route="([^"]*)",op="([^"]*)"\} (\S+)$')
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of samples (q in 0..100)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(q / 100.0 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}; expected one of {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("--mix needs at least one scenario with a positive weight")
+    return mix
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+# ----- App under test -----
+class LoopLag:
+    """Samples how late a short timer fires on the app's event loop."""
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self.recording = False
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(_LAG_INTERVAL)
+            if self.recording:
+                self.samples.append(max(0.0, loop.time() - start - _LAG_INTERVAL))
+
+
+def start_app(port: int, lag: LoopLag):
+    import uvicorn
+    from fastapi import HTTPException, Request
+
+    from app.auth import verify_firebase_token
+    from app.main import app
+
+    async def bench_token(request: Request):
+        token = (request.headers.get("Authorization") or "").split(" ")[-1]
+        if not token.startswith("bench-"):
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        uid = token[len("bench-"):]
+        return {"uid": uid, "email": f"{uid}@bench.local", "name": uid, "email_verified": True}
+
+    app.dependency_overrides[verify_firebase_token] = bench_token
+
+    async def start_lag_probe():
+        asyncio.get_running_loop().create_task(lag.run(), name="bench_loop_lag")
+
+    app.router.on_startup.append(start_lag_probe)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("App failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ----- Load generation -----
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, path: str, **kwargs) -> Any:
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, path, **kwargs)
+            status = resp.status_code
+        except httpx.HTTPError:
+            resp, status = None, 0
+        elapsed = time.perf_counter() - start
+        if self.recording:
+            self.latencies[route].append(elapsed)
+            self.statuses[route][status] += 1
+            if status == 0 or status >= 500:
+                self.errors[route] += 1
+        if resp is None or status >= 400:
+            return None
+        try:
+            return resp.json()
+        except ValueError:
+            return None
+
+
+class User:
+    def __init__(self, uid: str, rng: random.Random):
+        self.uid = uid
+        self.rng = rng
+        self.session_id: str | None = None
+        self.conversation_id: str | None = None
+        self.headers = {"Authorization": f"Bearer bench-{uid}"}
+
+
+async def tutoring(rec: Recorder, client: httpx.AsyncClient, user: User):
+    r = user.rng
+    topic = r.choice(TOPICS)
+    q = await rec.request(client, "POST /next-question", "POST", "/next-question", headers=user.headers,
+                          json={"session_id": user.session_id, "topic": topic})
+    if q and q.get("interaction_id"):
+        question = q.get("question") or {}
+        options = question.get("options") or []
+        answer = r.choice(options) if options else f"My understanding of {topic} is that it depends on the definition."
+        await rec.request(client, "POST /evaluate-answer", "POST", "/evaluate-answer", headers=user.headers,
+                          json={"session_id": user.session_id, "interaction_id": q["interaction_id"], "answer_text": answer})
+    if r.random() < 0.5:
+        await rec.request(client, "POST /ask-followup", "POST", "/ask-followup", headers=user.headers,
+                          json={"session_id": user.session_id, "query": f"Can you explain {topic} with an example?"})
+    else:
+        await rec.request(client, "POST /ask", "POST", "/ask", headers=user.headers,
+                          json={"query": f"What is {topic}?", "session_id": user.session_id})
+
+
+async def counselling(rec: Recorder, client: httpx.AsyncClient, user: User):
+    for message in ("I like solving problems but I'm not sure which career fits.", "What should I learn first?"):
+        resp = await rec.request(client, "POST /counselling", "POST", "/counselling", headers=user.headers,
+                                 json={"user_message": message, "conversation_id": user.conversation_id})
+        if resp and resp.get("conversation_id"):
+            user.conversation_id = resp["conversation_id"]
+    await rec.request(client, "GET /career-paths", "GET", "/career-paths", headers=user.headers)
+    if user.rng.random() < 0.2:
+        user.conversation_id = None  # start a fresh conversation now and then
+
+
+async def search(rec: Recorder, client: httpx.AsyncClient, user: User):
+    r = user.rng
+    body = {"q": r.choice(QUERIES), "type": r.choice(OPPORTUNITY_TYPES + ["All"]), "page": 1, "page_size": 10}
+    for page in (1, 2):
+        body["page"] = page
+        await rec.request(client, "POST /api/opportunities/search", "POST", "/api/opportunities/search",
+                          headers=user.headers, json=body)
+    await rec.request(client, "GET /api/users/{uid}/recommended", "GET", f"/api/users/{user.uid}/recommended",
+                      headers=user.headers)
+
+
+_SCENARIO_FUNCS = {"tutoring": tutoring, "counselling": counselling, "search": search}
+
+
+async def seed(client: httpx.AsyncClient, users: List[User], opportunities: int):
+    admin = {"Authorization": "Bearer bench-admin"}
+    rng = random.Random(0)
+    for i in range(opportunities):
+        resp = await client.post("/opportunities", headers=admin, json={
+            "title": f"Bench {rng.choice(QUERIES) or 'general'} opportunity {i}",
+            "type": rng.choice(OPPORTUNITY_TYPES),
+            "education_level": [rng.choice(["School", "College", "Graduate"])],
+            "domain": [rng.choice(DOMAINS)],
+            "skills_required": ["communication", rng.choice(["python", "design", "research"])],
+            "location": rng.choice(["Remote", "Bengaluru", "Delhi"]),
+            "deadline": f"2099-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        })
+        resp.raise_for_status()
+    for user in users:
+        resp = await client.post("/test-create-session", headers=user.headers, json={"domain": user.rng.choice(DOMAINS)})
+        resp.raise_for_status()
+        user.session_id = resp.json()["session_id"]
+        resp = await client.post("/counselling/save", headers=user.headers, json={
+            "interests": user.rng.sample(TOPICS, 2),
+            "preferred_skills": ["problem solving"],
+            "chosen_domain": user.rng.choice(DOMAINS),
+            "difficulty_preference": "medium",
+        })
+        resp.raise_for_status()
+
+
+async def drive(base_url: str, args, mix: Dict[str, float], rec: Recorder, lag: LoopLag) -> Tuple[float, int, dict]:
+    from app.loop_monitor import monitor as loop_monitor
+
+    names, weights = list(mix), list(mix.values())
+    run_id = f"{int(time.time())}"
+    users = [User(f"u{run_id}-{i}", random.Random(args.seed + i)) for i in range(args.concurrency)]
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await seed(client, users, args.opportunities)
+        before = await firestore_ops(client)
+        stop_at = time.monotonic() + args.warmup + args.duration
+        iterations = 0
+
+        async def worker(user: User):
+            nonlocal iterations
+            while time.monotonic() < stop_at:
+                await _SCENARIO_FUNCS[user.rng.choices(names, weights)[0]](rec, client, user)
+                iterations += 1
+
+        async def start_recording():
+            await asyncio.sleep(args.warmup)
+            loop_monitor.reset()
+            rec.recording = lag.recording = True
+
+        started = asyncio.get_running_loop().time()
+        await asyncio.gather(start_recording(), *(worker(u) for u in users))
+        elapsed = asyncio.get_running_loop().time() - started - args.warmup
+        rec.recording = lag.recording = False
+        after = await firestore_ops(client)
+    return elapsed, iterations, diff_ops(before, after)
+
+
+async def firestore_ops(client: httpx.AsyncClient) -> Dict[Tuple[str, str, str], float]:
+    resp = await client.get("/metrics")
+    resp.raise_for_status()
+    out = {}
+    for line in resp.text.splitlines():
+        m = _METRIC_LINE.match(line)
+        if m:
+            out[(m.group(1), m.group(2), m.group(3))] = float(m.group(4))
+    return out
+
+
+def diff_ops(before: dict, after: dict) -> Dict[str, Dict[str, float]]:
+    """route template -> op -> average ops per request over the run (includes warmup requests)."""
+    per_route: Dict[str, Dict[str, float]] = defaultdict(dict)
+    for (kind, route, op), total in after.items():
+        if kind != "sum":
+            continue
+        count = after.get(("count", route, op), 0) - before.get(("count", route, op), 0)
+        if count > 0:
+            per_route[route][op] = round((total - before.get(("sum", route, op), 0)) / count, 2)
+    return per_route
+
+
+def summarize_blocks(blocks: List[dict]) -> List[Dict[str, Any]]:
+    grouped: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for b in blocks:
+        g = grouped.setdefault((b["route"], b["site"]), {"route": b["route"], "site": b["site"], "count": 0, "max_ms": 0.0, "stack": b["stack"]})
+        g["count"] += 1
+        g["max_ms"] = max(g["max_ms"], b["blocked_ms"])
+    return sorted(grouped.values(), key=lambda g: -g["count"])
+
+
+def summarize(rec: Recorder, elapsed: float, ops: dict, lag: LoopLag) -> Dict[str, Any]:
+    from app.loop_monitor import monitor as loop_monitor
+
+    routes = {}
+    total = 0
+    for route, samples in sorted(rec.latencies.items()):
+        total += len(samples)
+        template = route.split(" ", 1)[1]
+        routes[route] = {
+            "requests": len(samples),
+            "errors": rec.errors.get(route, 0),
+            "status": {str(k): v for k, v in sorted(rec.statuses[route].items())},
+            "rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(samples, 50) * 1000, 1),
+            "p95_ms": round(percentile(samples, 95) * 1000, 1),
+            "p99_ms": round(percentile(samples, 99) * 1000, 1),
+            "max_ms": round(max(samples) * 1000, 1),
+            "firestore_ops_per_request": ops.get(template, {}),
+        }
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2),
+        "errors": sum(rec.errors.values()),
+        "loop_lag_ms": {
+            "samples": len(lag.samples),
+            "p50": round(percentile(lag.samples, 50) * 1000, 2),
+            "p99": round(percentile(lag.samples, 99) * 1000, 2),
+            "max": round(max(lag.samples, default=0.0) * 1000, 2),
+        },
+        "loop_blocks": summarize_blocks(loop_monitor.recent_blocks()),
+        "routes": routes,
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the API against the Firestore emulator with a fake LLM")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=60, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the run")
+    parser.add_argument("--mix", default="tutoring=6,counselling=2,search=2", help="scenario weights")
+    parser.add_argument("--opportunities", type=int, default=200, help="opportunities to seed")
+    parser.add_argument("--llm-latency", help="LLM_FAKE_LATENCY for the fake backend (default: its own default)")
+    parser.add_argument("--llm-error-rate", type=float, help="LLM_FAKE_ERROR_RATE")
+    parser.add_argument("--timeout", type=float, default=60, help="client timeout per request (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fail-on-block", action="store_true", help="exit 1 if the event loop was blocked past LOOP_BLOCK_THRESHOLD_MS")
+    parser.add_argument("--json", dest="json_out", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    storage = os.getenv("STORAGE_BACKEND", "firestore").strip().lower()
+    if storage == "firestore" and not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        print("[ERROR] FIRESTORE_EMULATOR_HOST is not set; refusing to benchmark against a real Firestore project.", file=sys.stderr)
+        return 2
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Read at import time by the app, so set them before importing it
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    os.environ.setdefault("SCRAPER_ON_STARTUP", "0")
+    os.environ.setdefault("LOOP_MONITOR", "1")
+    if args.llm_latency:
+        os.environ["LLM_FAKE_LATENCY"] = args.llm_latency
+    if args.llm_error_rate is not None:
+        os.environ["LLM_FAKE_ERROR_RATE"] = str(args.llm_error_rate)
+
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    lag = LoopLag()
+    rec = Recorder()
+    port = free_port()
+    server, thread = start_app(port, lag)
+    try:
+        elapsed, iterations, ops = asyncio.run(drive(f"http://127.0.0.1:{port}", args, mix, rec, lag))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    result = summarize(rec, max(elapsed, 1e-9), ops, lag)
+    result["scenario_iterations"] = iterations
+    for route, r in result["routes"].items():
+        print(
+            f"[BENCH] {route:<36} n={r['requests']:>6} rps={r['rps']:>8} p50={r['p50_ms']:>8}ms "
+            f"p95={r['p95_ms']:>8}ms p99={r['p99_ms']:>8}ms err={r['errors']} fs={r['firestore_ops_per_request']}"
+        )
+    print(
+        f"[BENCH] total rps={result['throughput_rps']} requests={result['requests']} errors={result['errors']} "
+        f"loop lag p99={result['loop_lag_ms']['p99']}ms max={result['loop_lag_ms']['max']}ms"
+    )
+    for b in result["loop_blocks"]:
+        print(f"[BENCH] loop blocked x{b['count']} (max {b['max_ms']}ms) in {b['route']} at {b['site']}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": git_commit(),
+                "started_at": started_at,
+                "config": {**vars(args), "llm_backend": os.getenv("LLM_BACKEND"), "llm_latency": os.getenv("LLM_FAKE_LATENCY")},
+                "results": result,
+            }, f, indent=2)
+    if args.fail_on_block and result["loop_blocks"]:
+        print(f"[ERROR] Event loop was blocked at {len(result['loop_blocks'])} call site(s)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
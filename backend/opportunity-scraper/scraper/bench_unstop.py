@@ -0,0 +1,90 @@
+"""
+Throughput benchmark for fetch_and_store() against the local fake Unstop API.
+
+Writes go to the Firestore emulator, so FIRESTORE_EMULATOR_HOST must be set:
+    gcloud emulators firestore start --host-port=localhost:8080
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m scraper.bench_unstop \
+        --concurrency 1,4,8 --pages 10 --latency-ms 80 --rate-429 0.02
+
+For each concurrency level the same (category, page) workload is fetched with a
+thread pool and pages/s, items/s and Firestore writes/s are reported.
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from .fake_unstop import add_config_args, config_from_args, start_server
+
+CATEGORIES = ["HACKATHON", "COMPETITION", "INTERNSHIP", "JOB", "SCHOLARSHIP"]
+
+
+def run_level(scraper, server, concurrency: int, pages: int, per_page: int) -> Dict[str, Any]:
+    tasks = [(cat, page) for cat in CATEGORIES for page in range(1, pages + 1)]
+    server.reset_stats()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        stored = list(pool.map(lambda t: scraper.fetch_and_store(t[0], page=t[1], per_page=per_page), tasks))
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    stats = server.snapshot_stats()
+    writes = sum(stored)
+    return {
+        "concurrency": concurrency,
+        "pages_requested": len(tasks),
+        "pages_ok": stats["ok"],
+        "throttled_429": stats["throttled_429"],
+        "errors_5xx": stats["errors_5xx"],
+        "items_served": stats["items"],
+        "writes": writes,
+        "elapsed_s": round(elapsed, 3),
+        "pages_per_s": round(stats["ok"] / elapsed, 2),
+        "items_per_s": round(stats["items"] / elapsed, 2),
+        "writes_per_s": round(writes / elapsed, 2),
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Unstop scraper against a local fake API")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma-separated worker counts")
+    parser.add_argument("--pages", type=int, default=5, help="pages per category")
+    parser.add_argument("--per-page", type=int, default=24)
+    parser.add_argument("--json", dest="json_out", help="write results to this file")
+    add_config_args(parser)
+    args = parser.parse_args(argv)
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        print("[ERROR] FIRESTORE_EMULATOR_HOST is not set; refusing to benchmark against a real Firestore project.", file=sys.stderr)
+        return 2
+
+    logging.basicConfig(level=logging.WARNING)
+    server = start_server(config_from_args(args))
+    # API_URL is read at import time, so point the scraper at the fake server first
+    os.environ["UNSTOP_API_URL"] = server.url
+    scraper = importlib.import_module("scraper.unstop_scraper")
+
+    results = []
+    try:
+        for level in [int(x) for x in args.concurrency.split(",") if x.strip()]:
+            res = run_level(scraper, server, max(1, level), args.pages, args.per_page)
+            results.append(res)
+            print(
+                f"[BENCH] c={res['concurrency']:>3} pages/s={res['pages_per_s']:>8} items/s={res['items_per_s']:>9} "
+                f"writes/s={res['writes_per_s']:>9} ok={res['pages_ok']}/{res['pages_requested']} "
+                f"429={res['throttled_429']} 5xx={res['errors_5xx']} t={res['elapsed_s']}s"
+            )
+    finally:
+        server.shutdown()
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
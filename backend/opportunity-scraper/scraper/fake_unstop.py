@@ -0,0 +1,244 @@
+"""
+Local stand-in for Unstop's public search endpoint
+(https://unstop.com/api/public/opportunity/search-result).
+
+Serves deterministic, paginated opportunity listings in the response shapes
+fetch_and_store() understands ({data: [...]}, {data: {data: [...]}} and
+{results: [...]}) with configurable latency, 5xx/429 error rates and catalog
+size, so the scraper and ingest pipeline can be load tested without touching
+the real site.
+
+Run standalone:
+    python -m scraper.fake_unstop --port 8765 --latency-ms 80 --rate-429 0.05
+then point the scraper at it:
+    UNSTOP_API_URL=http://127.0.0.1:8765/api/public/opportunity/search-result
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PATH = "/api/public/opportunity/search-result"
+SHAPES = ("data", "nested", "results")
+
+
+class FakeUnstopConfig:
+    def __init__(
+        self,
+        catalog_size: int = 500,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        rate_429: float = 0.0,
+        rps_limit: float = 0.0,
+        shape: str = "mixed",
+        seed: int = 42,
+    ):
+        self.catalog_size = max(0, int(catalog_size))  # items per opportunity type
+        self.latency_ms = max(0.0, float(latency_ms))
+        self.jitter_ms = max(0.0, float(jitter_ms))
+        self.error_rate = max(0.0, min(1.0, float(error_rate)))
+        self.rate_429 = max(0.0, min(1.0, float(rate_429)))
+        self.rps_limit = max(0.0, float(rps_limit))  # 0 disables the token bucket
+        self.shape = shape  # data | nested | results | mixed (rotates per page)
+        self.seed = int(seed)
+
+
+def make_item(opportunity: str, idx: int) -> Dict[str, Any]:
+    """Build one listing. Field names rotate so every fallback in fetch_and_store is exercised."""
+    slug = f"{opportunity or 'all'}-{idx}"
+    item: Dict[str, Any] = {"id": idx}
+    variant = idx % 3
+    if variant == 0:
+        item["title"] = f"Fake {opportunity} #{idx}"
+        item["organization"] = {"name": f"Org {idx % 97}"}
+        item["seo_url"] = f"/{opportunity}/{slug}"
+        item["end_date"] = f"2030-{(idx % 12) + 1:02d}-{(idx % 28) + 1:02d}T23:59:00+05:30"
+    elif variant == 1:
+        item["name"] = f"Fake {opportunity} #{idx}"
+        item["organization_name"] = f"Org {idx % 97}"
+        item["public_url"] = f"https://unstop.com/{opportunity}/{slug}"
+        item["deadline"] = f"2030-{(idx % 12) + 1:02d}-{(idx % 28) + 1:02d}"
+    else:
+        item["opportunity_title"] = f"Fake {opportunity} #{idx}"
+        item["company_name"] = f"Org {idx % 97}"
+        item["slug"] = slug
+    return item
+
+
+class _TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+
+class FakeUnstopServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: FakeUnstopConfig):
+        super().__init__(address, _Handler)
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.rng_lock = threading.Lock()
+        self.bucket = _TokenBucket(config.rps_limit) if config.rps_limit else None
+        self.stats_lock = threading.Lock()
+        self.stats: Dict[str, int] = {}
+        self.reset_stats()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{SEARCH_PATH}"
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {"requests": 0, "ok": 0, "items": 0, "errors_5xx": 0, "throttled_429": 0, "not_found": 0}
+
+    def snapshot_stats(self) -> Dict[str, int]:
+        with self.stats_lock:
+            return dict(self.stats)
+
+    def bump(self, key: str, n: int = 1):
+        with self.stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + n
+
+    def roll(self) -> float:
+        with self.rng_lock:
+            return self.rng.random()
+
+    def page(self, opportunity: str, page: int, per_page: int) -> Dict[str, Any]:
+        start = (max(1, page) - 1) * per_page
+        end = min(self.config.catalog_size, start + per_page)
+        items: List[Dict[str, Any]] = [make_item(opportunity, i) for i in range(start, end)]
+        shape = self.config.shape
+        if shape not in SHAPES:
+            shape = SHAPES[(page - 1) % len(SHAPES)]
+        if shape == "nested":
+            body: Dict[str, Any] = {"data": {"data": items, "current_page": page, "per_page": per_page, "total": self.config.catalog_size}}
+        elif shape == "results":
+            body = {"results": items, "page": page, "count": self.config.catalog_size}
+        else:
+            body = {"data": items, "page": page, "total": self.config.catalog_size}
+        return body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeUnstopServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # keep benchmark output clean
+        logger.debug("fake_unstop: " + fmt, *args)
+
+    def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        srv = self.server
+        cfg = srv.config
+        srv.bump("requests")
+        parts = urlsplit(self.path)
+        if parts.path != SEARCH_PATH:
+            srv.bump("not_found")
+            self._send(404, {"message": "not found"})
+            return
+
+        delay = cfg.latency_ms + (srv.roll() * 2 - 1) * cfg.jitter_ms
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+        if (srv.bucket and not srv.bucket.take()) or (cfg.rate_429 and srv.roll() < cfg.rate_429):
+            srv.bump("throttled_429")
+            self._send(429, {"message": "Too Many Requests"}, {"Retry-After": "1"})
+            return
+        if cfg.error_rate and srv.roll() < cfg.error_rate:
+            srv.bump("errors_5xx")
+            self._send(503, {"message": "Service Unavailable"})
+            return
+
+        qs = parse_qs(parts.query)
+        opportunity = (qs.get("opportunity") or [""])[0]
+        try:
+            page = int((qs.get("page") or ["1"])[0])
+            per_page = max(1, min(100, int((qs.get("per_page") or ["24"])[0])))
+        except ValueError:
+            self._send(400, {"message": "invalid pagination"})
+            return
+        body = srv.page(opportunity, page, per_page)
+        items = body.get("data") if isinstance(body.get("data"), list) else (body.get("data") or {}).get("data") or body.get("results") or []
+        srv.bump("ok")
+        srv.bump("items", len(items))
+        self._send(200, body)
+
+
+def start_server(config: FakeUnstopConfig, host: str = "127.0.0.1", port: int = 0) -> FakeUnstopServer:
+    """Start the fake API on a background thread. port=0 picks a free port; see server.url."""
+    server = FakeUnstopServer((host, port), config)
+    thread = threading.Thread(target=server.serve_forever, name="fake-unstop", daemon=True)
+    thread.start()
+    return server
+
+
+def add_config_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--catalog-size", type=int, default=500, help="items per opportunity type")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of a 503")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="probability of a 429")
+    parser.add_argument("--rps-limit", type=float, default=0.0, help="token-bucket limit; excess requests get 429")
+    parser.add_argument("--shape", choices=SHAPES + ("mixed",), default="mixed")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeUnstopConfig:
+    return FakeUnstopConfig(
+        catalog_size=args.catalog_size,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_429=args.rate_429,
+        rps_limit=args.rps_limit,
+        shape=args.shape,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a fake Unstop search API for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_args(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    srv = start_server(config_from_args(args), args.host, args.port)
+    print(f"[INFO] Fake Unstop API listening on {srv.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -68,7 +68,13 @@ MIN_DELAY = _env_float("SCRAPER_MIN_DELAY", 1.0)
 MAX_DELAY = _env_float("SCRAPER_MAX_DELAY", 3.0)
 MAX_PAGES = _env_int("UNSTOP_MAX_PAGES", 3)
 
-if not firebase_admin._apps:
+# FIRESTORE_EMULATOR_HOST (e.g. "localhost:8080") lets local benchmarks run
+# without a service account; the Firestore client routes to the emulator.
+EMULATOR_HOST = os.getenv("FIRESTORE_EMULATOR_HOST", "").strip()
+
+if not firebase_admin._apps and EMULATOR_HOST and not SA_PATH:
+    firebase_admin.initialize_app(options={"projectId": PROJECT_ID or "demo-pace"})
+elif not firebase_admin._apps:
     if not SA_PATH:
         searched = [p for p in _candidate_paths if p]
         raise RuntimeError(
@@ -80,7 +86,8 @@ if not firebase_admin._apps:
 
 db = firestore.client()
 
-API_URL = "https://unstop.com/api/public/opportunity/search-result"
+# Overridable so the scraper can be pointed at scraper/fake_unstop.py for load tests
+API_URL = os.getenv("UNSTOP_API_URL", "https://unstop.com/api/public/opportunity/search-result")
 
 # Logger
 logger = logging.getLogger(__name__)
@@ -0,0 +1,45 @@
+# tests/conftest.py
+"""
+Shared fixtures.
+
+    cd backend
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m pytest -q    # also the emulator tests
+
+Tests marked requires_emulator run the app against the Firestore emulator
+(FIRESTORE_EMULATOR_HOST, as for bench/api_bench.py) and are skipped without it.
+app.main is imported lazily: importing it initializes Firebase.
+"""
+import os
+import uuid
+
+import pytest
+
+requires_emulator = pytest.mark.skipif(
+    not os.getenv("FIRESTORE_EMULATOR_HOST") or os.getenv("STORAGE_BACKEND", "firestore").strip().lower() != "firestore",
+    reason="needs the Firestore emulator (FIRESTORE_EMULATOR_HOST) and STORAGE_BACKEND=firestore",
+)
+
+
+@pytest.fixture
+def uid() -> str:
+    return f"test-{uuid.uuid4().hex[:12]}"
+
+
+@pytest.fixture
+def client(uid):
+    """TestClient for app.main with token verification replaced by a fixed test user."""
+    from fastapi.testclient import TestClient
+
+    from app.auth import verify_firebase_token
+    from app.main import app
+
+    async def test_token():
+        return {"uid": uid, "email": f"{uid}@test.local", "name": uid, "email_verified": True}
+
+    app.dependency_overrides[verify_firebase_token] = test_token
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(verify_firebase_token, None)
@@ -0,0 +1,241 @@
+"""SQLite repository (app/db_sqlite.py) against the document semantics of db.py.
+
+Each test runs against db_sqlite on a temporary SQLITE_PATH and, with the
+Firestore emulator, against db.py itself, so the expectations below are the
+ones Firestore enforces.
+"""
+import datetime as dt
+import inspect
+import threading
+import uuid
+
+import pytest
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+
+from app.storage import repository_functions
+
+from .conftest import requires_emulator
+
+UTC = dt.timezone.utc
+
+
+@pytest.fixture(params=["sqlite", pytest.param("firestore", marks=requires_emulator)])
+def store(request, tmp_path, monkeypatch):
+    if request.param == "firestore":
+        from app.auth import initialize_firebase
+        initialize_firebase()
+        from app import db
+        return db
+    from app import db_sqlite
+    monkeypatch.setattr(db_sqlite, "SQLITE_PATH", str(tmp_path / "pace.sqlite3"))
+    monkeypatch.setattr(db_sqlite, "_local", threading.local())
+    return db_sqlite
+
+
+def _id(prefix: str) -> str:
+    return f"{prefix}-{uuid.uuid4().hex[:12]}"
+
+
+def _without(doc: dict, *keys) -> dict:
+    return {k: v for k, v in doc.items() if k not in keys}
+
+
+def test_repository_signatures_match():
+    from app import db, db_async, db_sqlite
+    for name in repository_functions():
+        expected = list(inspect.signature(getattr(db, name)).parameters)
+        assert list(inspect.signature(getattr(db_sqlite, name)).parameters) == expected, name
+        assert list(inspect.signature(getattr(db_async, name)).parameters) == expected, name
+
+
+def test_session_round_trip_resolves_server_timestamps(store):
+    from app.db import _new_session_doc
+    sid = _id("s")
+    before = dt.datetime.now(UTC) - dt.timedelta(seconds=5)
+    store.create_session(sid, "u1", "math", {"topic": "algebra"})
+    doc = store.get_session(sid)
+    expected = _new_session_doc(sid, "u1", "math", {"topic": "algebra"})
+    assert _without(doc, "createdAt", "updatedAt") == _without(expected, "createdAt", "updatedAt")
+    for key in ("createdAt", "updatedAt"):
+        assert isinstance(doc[key], dt.datetime) and doc[key].tzinfo is not None
+        assert doc[key] >= before
+    assert store.get_session(_id("missing")) is None
+
+
+def test_update_of_missing_document_raises_not_found(store):
+    with pytest.raises(NotFound):
+        store.update_session(_id("missing"), {"status": "done"})
+    with pytest.raises(NotFound):
+        store.set_counselling_career_paths(_id("u"), _id("missing"), {"careers": []})
+
+
+def test_update_dotted_and_backticked_paths(store):
+    sid = _id("s")
+    store.create_session(sid, "u1", "math", {"topic": "algebra", "level": 2})
+    quoted = FieldPath("metadata", "a.b-c").to_api_repr()
+    store.update_session(sid, {"metadata.topic": "geometry", quoted: 1, "status": "paused"})
+    doc = store.get_session(sid)
+    assert doc["metadata"] == {"topic": "geometry", "level": 2, "a.b-c": 1}
+    assert doc["status"] == "paused"
+
+    store.update_session(sid, {quoted: firestore.DELETE_FIELD, "metadata.level": firestore.DELETE_FIELD})
+    assert store.get_session(sid)["metadata"] == {"topic": "geometry"}
+
+
+def test_array_union_skips_existing_values(store):
+    sid = _id("s")
+    store.create_session(sid, "u1", "math")
+    for score in (0.5, 0.5, 0.75):
+        store.append_session_history(sid, "scores", score)
+    history = store.get_session(sid)["history"]
+    assert history["scores"] == [0.5, 0.75]
+    assert history["questions"] == []
+
+
+def test_increment_and_merge_keep_existing_fields(store):
+    bank_id = _id("b")
+    store.add_bank_questions([(bank_id, {"bank_key": "math|algebra|3", "question_text": "Q1"})])
+    for _ in range(2):
+        store.increment_bank_stats(bank_id, {"served": 1, "score_sum": 0.25, "score_hist.2": 1})
+    store.add_bank_questions([(bank_id, {"bank_key": "math|algebra|3", "question_text": "Q1 (edited)"})])
+    [stored] = [q for q in store.list_bank_questions("math|algebra|3", limit=50) if q["id"] == bank_id]
+    assert stored["question_text"] == "Q1 (edited)"
+    assert stored["stats"] == {"served": 2, "score_sum": 0.5, "score_hist": {"2": 2}}
+    assert isinstance(stored["updatedAt"], dt.datetime)
+
+
+def test_rebanking_keeps_calibrated_level(store):
+    bank_id = _id("b")
+    generated = {"bank_key": "math|algebra|3", "difficulty": 3, "question_text": "Q1"}
+    store.add_bank_questions([(bank_id, generated)])
+    store.add_bank_questions([(bank_id, {"bank_key": "math|algebra|4", "difficulty": 4, "irt": {"b": 1.1, "n": 30}})])
+    store.add_bank_questions([(bank_id, {**generated, "question_text": "Q1 (edited)"})])  # seed() re-run
+
+    assert store.list_bank_questions("math|algebra|3") == []
+    [stored] = store.list_bank_questions("math|algebra|4")
+    assert (stored["difficulty"], stored["question_text"], stored["irt"]["b"]) == (4, "Q1 (edited)", 1.1)
+
+    store.add_bank_questions([(bank_id, {"bank_key": "math|algebra|2", "difficulty": 2, "irt": {"b": -0.9, "n": 60}})])
+    assert [q["id"] for q in store.list_bank_questions("math|algebra|2")] == [bank_id]
+
+
+def test_interaction_writes_merge_recent_tail(store):
+    sid = _id("s")
+    store.create_session(sid, "u1", "math")
+    store.create_question_interaction(sid, "i1", {"question_text": "What is 2+2?"})
+    first = store.get_session(sid)["recent_tail"]["i1"]
+    store.update_interaction(sid, "i1", {"answer_text": "4"})
+
+    entry = store.get_session(sid)["recent_tail"]["i1"]
+    assert entry == {**first, "answer_text": "4"}
+    interaction = store.get_interaction(sid, "i1")
+    assert interaction["question_text"] == "What is 2+2?" and interaction["answer_text"] == "4"
+    assert interaction["type"] == "question"
+    [recent] = store.get_recent_interactions(sid)
+    assert (recent["id"], recent["question_text"], recent["answer_text"]) == ("i1", "What is 2+2?", "4")
+
+
+def test_created_at_ordering_requires_the_field(store):
+    uid = _id("u")
+    saved = store.save_counselling_session(uid, {"chosen_domain": "engineering"})
+    conversation = _id("c")
+    store.append_counselling_turns(uid, conversation, [("user", "hi"), ("assistant", "hello")])
+    fields = store.append_counselling_turns(uid, conversation, [("user", "next")])
+    assert [t["idx"] for t in fields["recent"]] == [0, 1, 2] and fields["turn_count"] == 3
+
+    # the conversation doc is newer but only has startedAt
+    latest = store.get_latest_counselling_session(uid)
+    assert latest["sessionId"] == saved and latest["chosen_domain"] == "engineering"
+
+    base = dt.datetime(2024, 5, 1, 12, 0, 0, tzinfo=UTC)
+    sid = _id("s")
+    store.write_documents([
+        ("sessions", f"{sid}-b", {"userId": uid, "createdAt": base + dt.timedelta(seconds=1)}),
+        ("sessions", f"{sid}-a", {"userId": uid, "createdAt": base + dt.timedelta(microseconds=500_000)}),
+        ("sessions", f"{sid}-c", {"userId": uid, "startedAt": base + dt.timedelta(hours=1)}),
+        ("sessions", f"{sid}-d", {"userId": uid, "createdAt": base}),
+    ])
+    assert [s["id"] for s in store.get_user_sessions(uid)] == [f"{sid}-b", f"{sid}-a", f"{sid}-d"]
+
+
+def test_recent_interactions_query_when_session_has_no_tail(store):
+    sid = _id("s")
+    base = dt.datetime(2024, 5, 1, 12, 0, 0, tzinfo=UTC)
+    store.write_documents([
+        (f"sessions/{sid}/interactions", iid, {"type": "question", "createdAt": base + dt.timedelta(milliseconds=ms)})
+        for iid, ms in (("i3", 1000), ("i1", 0), ("i2", 500))
+    ])
+    assert [i["id"] for i in store.get_recent_interactions(sid, 2, session={})] == ["i2", "i3"]
+    assert [i["id"] for i in store.get_session_interactions(sid)] == ["i1", "i2", "i3"]
+    assert store.get_last_interaction(sid)["createdAt"] == base + dt.timedelta(seconds=1)
+
+
+def test_datetimes_round_trip_and_order_by_instant(store):
+    uid = _id("u")
+    collection = f"users/{uid}/saved_opportunities"
+    values = {
+        "whole-second": dt.datetime(2024, 5, 1, 12, 0, 0, tzinfo=UTC),
+        "fraction": dt.datetime(2024, 5, 1, 12, 0, 0, 250_000, tzinfo=UTC),
+        "offset": dt.datetime(2024, 5, 1, 13, 30, 0, tzinfo=dt.timezone(dt.timedelta(hours=2))),
+        "naive": dt.datetime(2024, 5, 1, 12, 0, 1),  # stored as UTC
+    }
+    store.write_documents([(collection, key, {"opportunityId": key, "savedAt": value}) for key, value in values.items()])
+
+    saved = store.list_saved_opportunities(uid)
+    assert [s["id"] for s in saved] == ["naive", "fraction", "whole-second", "offset"]
+    for item in saved:
+        value = values[item["id"]]
+        expected = value.replace(tzinfo=UTC) if value.tzinfo is None else value
+        assert item["savedAt"] == expected
+
+
+def _opportunity(source: str, name: str, **fields) -> tuple[str, dict]:
+    body = {"source": source, "title": name, "archived": False, "type": "internship", **fields}
+    return f"{source}-{name}", body
+
+
+def test_list_opportunities_filters_order_and_offset(store):
+    source = _id("src")
+    docs = [
+        _opportunity(source, "a", tags=["python", "ml"], deadline="2025-03-01", posted_at="2025-01-05", country="IN"),
+        _opportunity(source, "b", tags=["python"], deadline="2025-01-15", posted_at="2025-01-01", type="job"),
+        _opportunity(source, "c", tags=["design"], deadline="2025-02-01", posted_at="2025-01-10", country="IN"),
+        _opportunity(source, "d", tags=["python"], posted_at="2025-01-20"),  # no deadline
+        _opportunity(source, "e", tags=["python"], deadline="2025-02-20", archived=True),
+        _opportunity(source, "f", tags=["python"], deadline="2025-02-10", archived=None),
+    ]
+    f_id, f_body = docs.pop()
+    for doc_id, body in docs:
+        store.create_opportunity(doc_id, body)
+    store.create_opportunity(f_id, _without(f_body, "archived"))  # missing archived never matches archived == False
+
+    def ids(filters=None, **kwargs):
+        return [o["id"].rsplit("-", 1)[1] for o in store.list_opportunities({"source": source, **(filters or {})}, **kwargs)]
+
+    assert ids() == ["a", "b", "c", "d"]
+    assert ids({"archived": True}) == ["e"]
+    assert ids({"tags": "python"}) == ["a", "b", "d"]
+    assert ids({"type": "internship", "country": "IN"}) == ["a", "c"]
+    assert ids({"deadline_from": "2025-02-01"}) == ["a", "c"]
+    assert ids({"deadline_to": "2025-02-01"}) == ["b", "c"]
+    assert ids({"posted_after": "2025-01-05", "tags": "python"}) == ["a", "d"]
+    assert ids(order_by="deadline") == ["b", "c", "a"]
+    assert ids(order_by="deadline", descending=True, offset=1, limit=1) == ["c"]
+    assert ids(order_by="posted_at", descending=True, limit=2) == ["d", "c"]
+    assert ids(limit=2, offset=3) == ["d"]
+
+    stored = store.get_opportunity_by_id(f"{source}-a")
+    assert stored["id"] == f"{source}-a" and stored["tags"] == ["python", "ml"]
+    assert isinstance(stored["createdAt"], dt.datetime)
+
+
+def test_claim_idempotency_record_compares_the_claim(store):
+    record_id = _id("idem")
+    stale = {"status": "pending", "claimedAt": 100}
+    assert store.create_idempotency_record(record_id, stale)
+    assert not store.create_idempotency_record(record_id, stale)
+    assert store.claim_idempotency_record(record_id, {"status": "pending", "claimedAt": 200}, stale)
+    assert not store.claim_idempotency_record(record_id, {"status": "pending", "claimedAt": 300}, stale)
+    assert store.get_idempotency_record(record_id)["claimedAt"] == 200
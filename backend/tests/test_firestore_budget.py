@@ -0,0 +1,79 @@
+# tests/test_firestore_budget.py
+"""Firestore read-amplification guardrails (app/firestore_ops.py)."""
+import pytest
+
+from app import firestore_ops
+from app.firestore_ops import FirestoreBudgetExceeded, firestore_budget, summarize
+from app.metrics import _request_end_hooks, record_firestore_op, request_scope
+
+from .conftest import requires_emulator
+
+
+def test_budget_within_limits():
+    with firestore_budget(reads=2, queries=1) as stats:
+        record_firestore_op("query", key="query:users")
+        record_firestore_op("read", key="doc:users/a")
+    assert summarize(stats)["reads"] == 1
+
+
+def test_budget_exceeded():
+    with pytest.raises(FirestoreBudgetExceeded, match="reads>1"):
+        with firestore_budget(reads=1):
+            record_firestore_op("read", key="doc:users/a")
+            record_firestore_op("read", key="doc:users/b")
+
+
+def test_budget_flags_repeated_reads():
+    with pytest.raises(FirestoreBudgetExceeded, match="duplicate_reads"):
+        with firestore_budget():
+            record_firestore_op("read", key="doc:users/a")
+            record_firestore_op("read", key="doc:users/a")
+
+
+def test_strict_raises_at_request_end(monkeypatch):
+    monkeypatch.setattr(firestore_ops, "STRICT", True)
+    monkeypatch.setattr(firestore_ops, "WRITE_BUDGET", 1)
+    with pytest.raises(FirestoreBudgetExceeded, match="writes>1"):
+        with request_scope("/strict"):
+            record_firestore_op("write")
+            record_firestore_op("write")
+
+
+@pytest.fixture
+def strict_requests(monkeypatch):
+    """STRICT budgets for requests made through TestClient; yields the summaries of finished requests."""
+    monkeypatch.setattr(firestore_ops, "STRICT", True)
+    summaries = []
+
+    def capture(stats):
+        summaries.append(summarize(stats))
+
+    _request_end_hooks.insert(0, capture)
+    try:
+        yield summaries
+    finally:
+        _request_end_hooks.remove(capture)
+
+
+@requires_emulator
+def test_career_paths_for_session_reads_one_document(client, uid, strict_requests):
+    from app import db
+    from app.career_paths import career_inputs, inputs_hash
+
+    sid = db.save_counselling_session(uid, {
+        "interests": ["robotics"],
+        "preferred_skills": ["python"],
+        "chosen_domain": "engineering",
+        "difficulty_preference": "medium",
+    })
+    digest = inputs_hash(career_inputs(db.get_counselling_session(uid, sid)))
+    careers = [{"title": "Robotics Engineer"}]
+    db.set_counselling_career_paths(uid, sid, {"careers": careers, "inputs_hash": digest})
+
+    response = client.get("/career-paths", params={"session_id": sid})
+
+    assert response.status_code == 200
+    assert response.json()["careers"] == careers
+    [summary] = [s for s in strict_requests if s["route"] == "/career-paths"]
+    assert (summary["reads"], summary["queries"], summary["writes"]) == (1, 0, 0)
+    assert not summary["duplicate_reads"]
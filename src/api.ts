@@ -123,6 +123,7 @@ export async function getRecommended(idToken: string, uid: string): Promise<{ su
 export interface CounsellingRequest {
   user_message: string;
   session_id?: string;
+  conversation_id?: string; // server-side memory; history is only needed for a new conversation
   conversation_history?: Array<{
     sender: "user" | "mentor";
     content: string;
@@ -138,6 +139,7 @@ export interface CounsellingRequest {
 
 export interface CounsellingResponse {
   success: boolean;
+  conversation_id?: string;
   text?: string; // preferred, ready-to-display
   answer: string;
   follow_up_question: string;
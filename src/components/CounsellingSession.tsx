@@ -38,6 +38,7 @@ export function CounsellingSession({ profile, onComplete, onBack }: CounsellingS
   const [conversationStage, setConversationStage] = useState(0);
   const scrollAreaRef = useRef<HTMLDivElement>(null);
   const inputRef = useRef<HTMLInputElement>(null);
+  const conversationIdRef = useRef<string | undefined>(undefined);
 
   // Timer countdown
   useEffect(() => {
@@ -94,9 +95,11 @@ export function CounsellingSession({ profile, onComplete, onBack }: CounsellingS
         timestamp: msg.timestamp
       }));
 
+      // Once the backend has issued a conversation_id it keeps the history itself
       const request: CounsellingRequest = {
         user_message: userMessage,
-        conversation_history: historyForAPI,
+        conversation_id: conversationIdRef.current,
+        conversation_history: conversationIdRef.current ? undefined : historyForAPI,
         user_profile: {
           name: profile.name,
           age: profile.age,
@@ -106,6 +109,9 @@ export function CounsellingSession({ profile, onComplete, onBack }: CounsellingS
       };
 
       const response = await getCounsellingResponse(idToken, request);
+      if (response.conversation_id) {
+        conversationIdRef.current = response.conversation_id;
+      }
       // Prefer the backend-provided plain text field for professional formatting
       return response.text || response.answer;
     } catch (error) {